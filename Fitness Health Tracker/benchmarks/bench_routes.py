@@ -0,0 +1,117 @@
+"""
+Route-level microbenchmarks with the Flask test client (no HTTP server, one thread),
+against the database configured in config.py. Each scenario rotates through the
+seeded users, runs warm-up requests first, and reports latency percentiles.
+
+Scenarios:
+    dashboard_warm      GET /dashboard with the dashboard cache in play
+    dashboard_cold      GET /dashboard with the user's cache entry dropped first
+    summary_day         GET /api/summary/<id>?granularity=day (full history)
+    summary_month       GET /api/summary/<id>?granularity=month
+    summary_304         GET /api/summary/<id> with If-None-Match from the previous response
+    add_food            POST /add_food (writes rows; reseed with --reset afterwards)
+    add_exercise        POST /add_exercise (writes rows)
+
+Usage:
+    python bench_routes.py
+    python bench_routes.py --iterations 500 --only dashboard_cold,summary_day --output before.json
+"""
+
+import argparse
+import itertools
+import time
+
+from benchlib import latency_stats, load_manifest, save_results
+
+from app import app
+from cache import dashboard_cache
+from config import pool_config, write_behind_config
+
+
+def _dashboard_cold(client, user):
+    dashboard_cache.invalidate(user['id'])
+    return client.get('/dashboard')
+
+
+def _summary_304(client, user):
+    etag = user.get('etag')
+    response = client.get(f"/api/summary/{user['id']}", headers={'If-None-Match': etag} if etag else {})
+    user['etag'] = response.headers.get('ETag', etag)
+    return response
+
+
+SCENARIOS = {
+    'dashboard_warm': lambda client, user: client.get('/dashboard'),
+    'dashboard_cold': _dashboard_cold,
+    'summary_day': lambda client, user: client.get(f"/api/summary/{user['id']}?granularity=day"),
+    'summary_month': lambda client, user: client.get(f"/api/summary/{user['id']}?granularity=month"),
+    'summary_304': _summary_304,
+    'add_food': lambda client, user: client.post('/add_food', data={'food_name': 'apple', 'quantity': '1'}),
+    'add_exercise': lambda client, user: client.post('/add_exercise', data={'activity': 'walking', 'duration': '30'}),
+}
+WRITE_SCENARIOS = ('add_food', 'add_exercise')
+
+
+def logged_in_client(user):
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user['id']
+        sess['user_name'] = user['email']
+    return client
+
+
+def run_scenario(name, users, iterations, warmup):
+    request = SCENARIOS[name]
+    clients = [(logged_in_client(user), dict(user)) for user in users]
+    rotation = itertools.cycle(clients)
+    for _ in range(warmup):
+        client, user = next(rotation)
+        request(client, user)
+
+    samples = []
+    statuses = {}
+    started = time.perf_counter()
+    for _ in range(iterations):
+        client, user = next(rotation)
+        t0 = time.perf_counter()
+        response = request(client, user)
+        samples.append(time.perf_counter() - t0)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    elapsed = time.perf_counter() - started
+
+    stats = latency_stats(samples)
+    stats['requests_per_second'] = round(iterations / elapsed, 1) if elapsed else 0.0
+    stats['status_codes'] = {str(code): count for code, count in sorted(statuses.items())}
+    stats['errors'] = sum(count for code, count in statuses.items() if code >= 400)
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Flask test-client microbenchmarks for the main routes")
+    parser.add_argument('--iterations', type=int, default=200, help="measured requests per scenario")
+    parser.add_argument('--warmup', type=int, default=20, help="unmeasured requests per scenario")
+    parser.add_argument('--users', type=int, default=20, help="seeded users to rotate through")
+    parser.add_argument('--only', help="comma separated scenario names (default: all)")
+    parser.add_argument('--skip-writes', action='store_true', help="skip add_food / add_exercise")
+    parser.add_argument('--output', help="results file (default: results/routes-<git>-<time>.json)")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.only.split(',')] if args.only else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+    if args.skip_writes:
+        names = [name for name in names if name not in WRITE_SCENARIOS]
+
+    users = load_manifest()[:args.users]
+    results = {}
+    for name in names:
+        results[name] = run_scenario(name, users, args.iterations, args.warmup)
+        stats = results[name]
+        print(f"{name:16} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+              f"p99 {stats['p99_ms']:8.2f} ms  {stats['requests_per_second']:8.1f} req/s  "
+              f"errors {stats['errors']}")
+
+    settings = {'iterations': args.iterations, 'warmup': args.warmup, 'users': len(users),
+                'pool_size': pool_config['pool_size'], 'write_behind': write_behind_config['enabled']}
+    print(f"Results written to {save_results('routes', results, settings, args.output)}")
@@ -0,0 +1,89 @@
+"""
+Shared helpers for the benchmark scripts: backend import path, seed manifest,
+latency statistics and JSON result files.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCH_DIR), 'fitness_health_tracker_backend')
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+MANIFEST_PATH = os.path.join(RESULTS_DIR, 'seed-manifest.json')
+
+# Benchmark users all share this password so the load driver can log in
+BENCH_PASSWORD = 'benchmark'
+BENCH_EMAIL = 'bench{n}@example.com'
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def latency_stats(samples):
+    """Latency summary in milliseconds from a list of durations in seconds."""
+    values = sorted(sample * 1000.0 for sample in samples)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': round(sum(values) / len(values), 3),
+        'min_ms': round(values[0], 3),
+        'p50_ms': round(percentile(values, 50), 3),
+        'p95_ms': round(percentile(values, 95), 3),
+        'p99_ms': round(percentile(values, 99), 3),
+        'max_ms': round(values[-1], 3),
+    }
+
+
+def git_revision():
+    try:
+        revision = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BENCH_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{revision}-dirty" if dirty else revision
+
+
+def save_results(kind, results, settings, path=None):
+    """Write a results file that compare.py can diff against another run; returns its path."""
+    revision = git_revision()
+    payload = {
+        'kind': kind,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'git': revision,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': settings,
+        'results': results,
+    }
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, f"{kind}-{revision}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2)
+    return path
+
+
+def load_manifest():
+    """Seeded users written by seed_data.py: [{'id', 'email'}, ...]."""
+    if not os.path.exists(MANIFEST_PATH):
+        raise SystemExit(f"No seed manifest at {MANIFEST_PATH}; run seed_data.py first")
+    with open(MANIFEST_PATH, encoding='utf-8') as f:
+        return json.load(f)['users']
@@ -0,0 +1,67 @@
+"""
+Compare two benchmark result files (from bench_routes.py or load_test.py).
+Prints p50/p95/p99 and throughput per scenario with the relative change, and exits
+with status 1 when any p95 got slower than --threshold percent (for CI use).
+
+Usage:
+    python compare.py results/routes-abc123-....json results/routes-def456-....json
+    python compare.py before.json after.json --threshold 10
+"""
+
+import argparse
+import json
+import sys
+
+METRICS = ('p50_ms', 'p95_ms', 'p99_ms', 'requests_per_second')
+
+
+def scenarios(payload):
+    results = payload['results']
+    if payload['kind'] == 'load':
+        return dict(results['routes'], overall=results['overall'])
+    return results
+
+
+def change(before, after):
+    if not before:
+        return None
+    return (after - before) / before * 100.0
+
+
+def compare(before, after, threshold):
+    regressions = []
+    print(f"before: {before['git']} ({before['created_at']})   after: {after['git']} ({after['created_at']})\n")
+    print(f"{'scenario':16} {'metric':20} {'before':>10} {'after':>10} {'change':>9}")
+    old, new = scenarios(before), scenarios(after)
+    for name in sorted(set(old) & set(new)):
+        if not old[name].get('count') or not new[name].get('count'):
+            continue
+        for metric in METRICS:
+            delta = change(old[name][metric], new[name][metric])
+            shown = f"{delta:+8.1f}%" if delta is not None else '       -'
+            print(f"{name:16} {metric:20} {old[name][metric]:10.2f} {new[name][metric]:10.2f} {shown}")
+            if metric == 'p95_ms' and delta is not None and delta > threshold:
+                regressions.append(f"{name} p95 {delta:+.1f}%")
+    for name in sorted(set(old) ^ set(new)):
+        print(f"{name:16} only in {'before' if name in old else 'after'}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff two benchmark result files")
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=10.0, help="p95 regression threshold in percent")
+    args = parser.parse_args()
+
+    with open(args.before, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(args.after, encoding='utf-8') as f:
+        after = json.load(f)
+    if before['kind'] != after['kind']:
+        sys.exit(f"Cannot compare a {before['kind']} run with a {after['kind']} run")
+
+    regressions = compare(before, after, args.threshold)
+    if regressions:
+        print(f"\nRegressions over {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
@@ -0,0 +1,163 @@
+"""
+Concurrent HTTP load driver for a running server (app.py, or gunicorn for multi-worker
+numbers). Each thread is a virtual user that logs in as one of the seeded users and
+then sends requests picked from a weighted mix until the duration is over.
+Reports p50/p95/p99 latency and throughput per route and overall.
+
+Uses only the standard library, so it can run from another machine; it needs the seed
+manifest (results/seed-manifest.json) for the users' ids and emails.
+
+Usage:
+    python load_test.py --base-url http://127.0.0.1:5000 --concurrency 16 --duration 30
+    python load_test.py --mix dashboard=50,summary=30,add_food=15,add_exercise=5 --output after.json
+"""
+
+import argparse
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from benchlib import BENCH_PASSWORD, latency_stats, load_manifest, save_results
+
+DEFAULT_MIX = 'dashboard=60,summary=25,add_food=10,add_exercise=5'
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Measure the route itself, not the page it redirects to."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+ROUTES = {
+    'dashboard': lambda user: ('GET', '/dashboard', None),
+    'summary': lambda user: ('GET', f"/api/summary/{user['id']}?granularity=day", None),
+    'summary_month': lambda user: ('GET', f"/api/summary/{user['id']}?granularity=month", None),
+    'add_food': lambda user: ('POST', '/add_food', {'food_name': random.choice(['apple', 'banana', 'mango']),
+                                                    'quantity': '1'}),
+    'add_exercise': lambda user: ('POST', '/add_exercise', {'activity': 'walking', 'duration': '30'}),
+}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ROUTES:
+            raise ValueError(f"unknown route {name.strip()!r} (expected one of {', '.join(ROUTES)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, base_url, user, mix, stop_at, measure_from, timeout):
+        super().__init__(daemon=True)
+        self.base_url = base_url.rstrip('/')
+        self.user = user
+        self.mix = mix
+        self.stop_at = stop_at
+        self.measure_from = measure_from
+        self.timeout = timeout
+        self.samples = {name: [] for name in mix}
+        self.statuses = {}
+        self.errors = 0
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(CookieJar()), _NoRedirect())
+
+    def request(self, method, path, form=None):
+        data = urllib.parse.urlencode(form).encode('utf-8') if form is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method)
+        try:
+            with self.opener.open(req, timeout=self.timeout) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code  # includes the 302s from login / add_* (redirects are not followed)
+
+    def run(self):
+        status = self.request('POST', '/login', {'email': self.user['email'], 'password': BENCH_PASSWORD})
+        if status != 302:
+            self.statuses['login_failed'] = 1
+            return
+        names = list(self.mix)
+        weights = [self.mix[name] for name in names]
+        while time.monotonic() < self.stop_at:
+            name = random.choices(names, weights=weights)[0]
+            method, path, form = ROUTES[name](self.user)
+            t0 = time.monotonic()
+            try:
+                status = self.request(method, path, form)
+            except (urllib.error.URLError, OSError):
+                status = 'connection_error'
+            elapsed = time.monotonic() - t0
+            if t0 < self.measure_from:
+                continue
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == 'connection_error' or status >= 400:
+                self.errors += 1
+            else:
+                self.samples[name].append(elapsed)
+
+
+def run_load(base_url, users, concurrency, duration, warmup, mix, timeout=30.0):
+    start = time.monotonic()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+    threads = [VirtualUser(base_url, users[i % len(users)], mix, stop_at, measure_from, timeout)
+               for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    results = {'routes': {}, 'status_codes': {}}
+    all_samples = []
+    for name in mix:
+        samples = [sample for thread in threads for sample in thread.samples[name]]
+        all_samples.extend(samples)
+        stats = latency_stats(samples)
+        stats['requests_per_second'] = round(len(samples) / duration, 1)
+        results['routes'][name] = stats
+    for thread in threads:
+        for status, count in thread.statuses.items():
+            results['status_codes'][str(status)] = results['status_codes'].get(str(status), 0) + count
+    results['overall'] = latency_stats(all_samples)
+    results['overall']['requests_per_second'] = round(len(all_samples) / duration, 1)
+    results['errors'] = sum(thread.errors for thread in threads)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent HTTP load test against a running server")
+    parser.add_argument('--base-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, default=8, help="virtual users (threads)")
+    parser.add_argument('--duration', type=float, default=30, help="measured seconds")
+    parser.add_argument('--warmup', type=float, default=5, help="unmeasured seconds before measuring")
+    parser.add_argument('--users', type=int, default=50, help="seeded users to log in as")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"route weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--seed', type=int, default=1, help="random seed for the request mix")
+    parser.add_argument('--output', help="results file (default: results/load-<git>-<time>.json)")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+    random.seed(args.seed)
+
+    users = load_manifest()[:args.users]
+    results = run_load(args.base_url, users, args.concurrency, args.duration, args.warmup, mix)
+    for name, stats in list(results['routes'].items()) + [('overall', results['overall'])]:
+        if stats['count']:
+            print(f"{name:14} {stats['count']:7} req  p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                  f"p99 {stats['p99_ms']:8.2f} ms  {stats['requests_per_second']:8.1f} req/s")
+    print(f"Errors: {results['errors']}  status codes: {results['status_codes']}")
+
+    settings = {'base_url': args.base_url, 'concurrency': args.concurrency, 'duration': args.duration,
+                'warmup': args.warmup, 'users': len(users), 'mix': mix, 'seed': args.seed}
+    print(f"Results written to {save_results('load', results, settings, args.output)}")
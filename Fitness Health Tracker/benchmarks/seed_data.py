@@ -0,0 +1,195 @@
+"""
+Seed a database with synthetic users and N days of food / exercise / environment logs
+for the benchmarks. Data is deterministic for a given --seed, and logs are written
+through the storage repository's write_batch so daily_summary rollups match the raw
+logs. STORAGE_BACKEND=sqlite seeds the embedded database instead of MySQL.
+
+Distributions (per user per day):
+    meals       Poisson(4) food logs at breakfast / lunch / snack / dinner times,
+                mostly known fruits (quantity 1-3), some free-text foods with calories
+    exercise    55% chance of a session, 10% chance of a second one; walking is the
+                most common activity; durations are log-normal around 35 minutes
+    profiles    age 18-70, height ~ N(170, 10) cm, weight ~ N(75, 14) kg, 3% left blank
+
+Usage:
+    python seed_data.py --users 200 --days 90
+    python seed_data.py --users 1000 --days 365 --seed 7 --reset
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from benchlib import BENCH_EMAIL, BENCH_PASSWORD, MANIFEST_PATH, RESULTS_DIR
+
+from werkzeug.security import generate_password_hash
+
+from bulk_import import prepare_food
+from storage import StorageError, get_repository
+
+FRUITS = ['apple', 'banana', 'orange', 'mango', 'grapes', 'strawberries', 'blueberries', 'pineapple',
+          'watermelon', 'kiwi', 'pear', 'peach', 'avocado', 'papaya', 'pomegranate', 'cherries']
+FRUIT_WEIGHTS = [16, 15, 10, 8, 8, 6, 5, 5, 5, 4, 4, 4, 3, 3, 2, 2]
+OTHER_FOODS = ['oatmeal', 'chicken salad', 'rice and dal', 'pasta', 'sandwich', 'omelette',
+               'paneer tikka', 'protein shake', 'vegetable soup', 'burrito']
+
+ACTIVITIES = ['walking', 'running', 'cycling', 'yoga', 'weight lifting', 'swimming', 'jogging',
+              'walking fast', 'dancing', 'aerobics', 'hiking', 'tennis', 'basketball', 'jumping rope']
+ACTIVITY_WEIGHTS = [30, 12, 10, 9, 9, 5, 5, 4, 4, 3, 3, 2, 2, 2]
+
+MEAL_HOURS = [(7, 9), (12, 14), (15, 17), (18, 21)]
+
+BENCH_EMAIL_PATTERN = BENCH_EMAIL.format(n='%')
+
+
+def poisson(rng, lam):
+    # Knuth's method; fine for the small rates used here
+    limit = math.exp(-lam)
+    k, p = 0, 1.0
+    while True:
+        p *= rng.random()
+        if p <= limit:
+            return k
+        k += 1
+
+
+def random_profile(rng):
+    if rng.random() < 0.03:
+        return None, None, None
+    age = rng.randint(18, 70)
+    height = round(min(max(rng.gauss(170, 10), 145), 205), 1)
+    weight = round(min(max(rng.gauss(75, 14), 42), 160), 1)
+    return age, height, weight
+
+
+def day_logs(rng, user_id, day):
+    """(food_rows, exercise_rows) in write_batch's prepared-row format for one user-day."""
+    food_rows = []
+    for _ in range(poisson(rng, 4)):
+        start, end = rng.choice(MEAL_HOURS)
+        log_date = datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=rng.randint(start, end - 1), minutes=rng.randint(0, 59), seconds=rng.randint(0, 59))
+        quantity = rng.choices([1, 2, 3], weights=[70, 20, 10])[0]
+        if rng.random() < 0.85:
+            # Calories come from the fruit table, as in add_food
+            record = {'food_name': rng.choices(FRUITS, weights=FRUIT_WEIGHTS)[0], 'quantity': quantity}
+        else:
+            record = {'food_name': rng.choice(OTHER_FOODS), 'quantity': quantity,
+                      'calories': round(max(rng.gauss(450, 150), 80))}
+        food_rows.append(prepare_food(record, user_id, log_date))
+
+    exercise_rows = []
+    sessions = (1 if rng.random() < 0.55 else 0) + (1 if rng.random() < 0.10 else 0)
+    for _ in range(sessions):
+        log_date = datetime.combine(day, datetime.min.time()) + timedelta(
+            hours=rng.randint(6, 20), minutes=rng.randint(0, 59))
+        activity = rng.choices(ACTIVITIES, weights=ACTIVITY_WEIGHTS)[0]
+        duration = int(min(max(rng.lognormvariate(math.log(35), 0.4), 5), 180))
+        exercise_rows.append((user_id, activity, duration, log_date))
+    return food_rows, exercise_rows
+
+
+def reset(conn):
+    """Delete previously seeded benchmark users and everything they logged."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT id FROM users WHERE email LIKE %s", (BENCH_EMAIL_PATTERN,))
+    ids = [row[0] for row in cursor.fetchall()]
+    for start in range(0, len(ids), 1000):
+        chunk = ids[start:start + 1000]
+        placeholders = ', '.join(['%s'] * len(chunk))
+        for table in ('food_log', 'exercise_log', 'environment_log', 'daily_summary',
+                      'weekly_summary', 'monthly_summary', 'user_streaks',
+                      'user_counters', 'user_badges', 'leaderboard_scores', 'user_versions'):
+            cursor.execute(f"DELETE FROM {table} WHERE user_id IN ({placeholders})", chunk)
+        cursor.execute(f"DELETE FROM users WHERE id IN ({placeholders})", chunk)
+        conn.commit()
+    cursor.close()
+    return len(ids)
+
+
+def create_users(conn, rng, count):
+    """Insert benchmark users (skipping existing emails); returns [{'id', 'email'}] in order."""
+    password = generate_password_hash(BENCH_PASSWORD)
+    emails = [BENCH_EMAIL.format(n=n) for n in range(1, count + 1)]
+    cursor = conn.cursor()
+    cursor.execute("SELECT email FROM users WHERE email LIKE %s", (BENCH_EMAIL_PATTERN,))
+    existing = {row[0] for row in cursor.fetchall()}
+    rows = [(f"Bench User {n}", email, password) + random_profile(rng)
+            for n, email in enumerate(emails, start=1) if email not in existing]
+    if rows:
+        cursor.executemany(
+            "INSERT INTO users (name, email, password, age, height, weight) VALUES (%s, %s, %s, %s, %s, %s)",
+            rows
+        )
+        conn.commit()
+    placeholders = ', '.join(['%s'] * len(emails))
+    cursor.execute(f"SELECT id, email FROM users WHERE email IN ({placeholders})", emails)
+    ids = dict((email, user_id) for user_id, email in cursor.fetchall())
+    cursor.close()
+    return [{'id': ids[email], 'email': email} for email in emails]
+
+
+def seed(conn, writer, users=100, days=90, seed_value=42, batch_rows=5000):
+    """Create the users on conn and write their logs with writer(food_rows, exercise_rows)."""
+    rng = random.Random(seed_value)
+    started = time.time()
+    manifest = create_users(conn, rng, users)
+    first_day = date.today() - timedelta(days=days - 1)
+
+    food_count = exercise_count = 0
+    food_batch, exercise_batch = [], []
+    for user in manifest:
+        for offset in range(days):
+            food_rows, exercise_rows = day_logs(rng, user['id'], first_day + timedelta(days=offset))
+            food_batch.extend(food_rows)
+            exercise_batch.extend(exercise_rows)
+        if len(food_batch) + len(exercise_batch) >= batch_rows:
+            food_count += len(food_batch)
+            exercise_count += len(exercise_batch)
+            writer(food_batch, exercise_batch)
+            food_batch, exercise_batch = [], []
+    if food_batch or exercise_batch:
+        food_count += len(food_batch)
+        exercise_count += len(exercise_batch)
+        writer(food_batch, exercise_batch)
+
+    return manifest, {
+        'users': len(manifest),
+        'days': days,
+        'seed': seed_value,
+        'food_rows': food_count,
+        'exercise_rows': exercise_count,
+        'seconds': round(time.time() - started, 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed synthetic users and logs for the benchmarks")
+    parser.add_argument('--users', type=int, default=100, help="number of benchmark users")
+    parser.add_argument('--days', type=int, default=90, help="days of history per user, ending today")
+    parser.add_argument('--seed', type=int, default=42, help="random seed (same seed -> same data)")
+    parser.add_argument('--batch-rows', type=int, default=5000, help="rows per write transaction")
+    parser.add_argument('--reset', action='store_true', help="delete earlier benchmark users and logs first")
+    args = parser.parse_args()
+
+    repo = get_repository()
+    conn = repo.connect_direct()
+    try:
+        if args.reset:
+            print(f"Removed {reset(conn)} benchmark user(s)")
+        manifest, summary = seed(conn, repo.write_batch, users=args.users, days=args.days, seed_value=args.seed,
+                                 batch_rows=args.batch_rows)
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+            json.dump({'summary': summary, 'users': manifest}, f, indent=2)
+        print(f"Seeded {summary['users']} user(s) x {summary['days']} day(s): {summary['food_rows']} food, "
+              f"{summary['exercise_rows']} exercise log(s) in {summary['seconds']}s")
+        print(f"Manifest written to {MANIFEST_PATH}")
+    except repo.errors + (StorageError,) as e:
+        print(f"Error: {e}")
+    finally:
+        conn.close()
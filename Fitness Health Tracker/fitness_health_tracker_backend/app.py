@@ -1,8 +1,24 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify
-import mysql.connector
-from config import db_config
+from flask import Flask, Response, render_template, request, redirect, url_for, session, jsonify
+from config import admin_config, entries_config, leaderboard_config, slow_query_config
+from storage import StorageError, get_repository
+from async_reads import current_reader as current_async_reader, get_async_reader
+from dashboard_data import DashboardData
+from badges import badge_view
+from leaderboard import BOARDS as LEADERBOARD_BOARDS, PERIODS as LEADERBOARD_PERIODS, snapshots as leaderboard_snapshots
+from cache import dashboard_cache, profile_cache
+from calories import get_fruit_calories
+from bulk_import import MAX_INT, MAX_NAME_LENGTH, detect_format, import_stream
+from export import export_stream, parse_resume_token, parse_types
+from timeranges import parse_day
+from profiles import bmi
+from summary import GRANULARITIES
+from write_queue import QueueFull, current_write_queue, get_write_queue
+from compaction import get_compaction_scheduler
+from metrics import gauge_lines, init_app as init_metrics, worker_stats
+from slow_queries import slow_query_log, summarize as summarize_slow_queries
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
+import hashlib
 import random
 import math
 
@@ -10,180 +26,233 @@ app = Flask(__name__, static_url_path='/static', static_folder='static')
 app.secret_key = 'your_secret_key_here'  # Change this to any random strong string
 
 
-# ------------------ DATABASE CONNECTION ------------------
-def get_db_connection():
-    conn = mysql.connector.connect(**db_config)
-    return conn
-
-
-# ------------------ CALORIE CALCULATION FUNCTIONS ------------------
-
-# Fruit calories per 100g (scientific values from USDA)
-FRUIT_CALORIES = {
-    'apple': 52, 'apples': 52,
-    'banana': 89, 'bananas': 89,
-    'orange': 47, 'oranges': 47,
-    'mango': 60, 'mangos': 60, 'mangoes': 60,
-    'grapes': 69, 'grape': 69,
-    'watermelon': 30, 'watermelons': 30,
-    'strawberry': 32, 'strawberries': 32,
-    'blueberry': 57, 'blueberries': 57,
-    'pineapple': 50, 'pineapples': 50,
-    'papaya': 43, 'papayas': 43,
-    'kiwi': 61, 'kiwis': 61, 'kiwi fruit': 61,
-    'pear': 57, 'pears': 57,
-    'peach': 39, 'peaches': 39,
-    'plum': 46, 'plums': 46,
-    'cherry': 50, 'cherries': 50,
-    'avocado': 160, 'avocados': 160,
-    'guava': 68, 'guavas': 68,
-    'pomegranate': 83, 'pomegranates': 83,
-    'dragon fruit': 60, 'dragonfruit': 60,
-    'lychee': 66, 'lychees': 66,
-    'coconut': 354, 'coconuts': 354,
-    'cranberry': 46, 'cranberries': 46,
-    'raspberry': 52, 'raspberries': 52,
-    'blackberry': 43, 'blackberries': 43,
-    'lemon': 29, 'lemons': 29,
-    'lime': 30, 'limes': 30,
-    'grapefruit': 42, 'grapefruits': 42,
-    'apricot': 48, 'apricots': 48,
-    'fig': 74, 'figs': 74,
-    'date': 282, 'dates': 282,
-}
-
-def get_fruit_calories(food_name, portion_weight_g=100):
-    """
-    Get calories for fruit based on name.
-    Returns calories per portion_weight_g (default 100g).
-    For average serving sizes, we'll use standard portions:
-    - Apple/Orange: ~150g
-    - Banana: ~120g
-    - Small fruits (berries): ~100g
-    """
-    food_lower = food_name.lower().strip()
-    
-    # Check exact match first
-    if food_lower in FRUIT_CALORIES:
-        calories_per_100g = FRUIT_CALORIES[food_lower]
-        return round(calories_per_100g * (portion_weight_g / 100), 1)
-    
-    # Check if fruit name is contained in the string
-    for fruit, calories_per_100g in FRUIT_CALORIES.items():
-        if fruit in food_lower:
-            # Adjust portion based on fruit type
-            if fruit in ['apple', 'apples', 'orange', 'oranges', 'pear', 'pears']:
-                portion = 150  # Medium fruit ~150g
-            elif fruit in ['banana', 'bananas']:
-                portion = 120  # Medium banana ~120g
-            elif fruit in ['avocado', 'avocados']:
-                portion = 150  # Medium avocado ~150g
-            elif fruit in ['strawberry', 'strawberries', 'blueberry', 'blueberries', 
-                          'raspberry', 'raspberries', 'blackberry', 'blackberries']:
-                portion = 100  # Cup of berries ~100g
-            else:
-                portion = portion_weight_g  # Use default or provided portion
-            
-            return round(calories_per_100g * (portion / 100), 1)
-    
-    return None  # Not a known fruit
-
-
-# MET (Metabolic Equivalent of Task) values for exercises
-# MET value * weight(kg) * duration(hours) = calories burned
-EXERCISE_MET_VALUES = {
-    'walking': 3.5,  # Walking at moderate pace
-    'walking slow': 2.0,
-    'walking fast': 5.0,
-    'running': 11.0,  # Running at 8 km/h
-    'running slow': 8.0,  # Jogging
-    'running fast': 13.0,  # Running at 10+ km/h
-    'swimming': 8.0,  # Swimming general
-    'swimming slow': 6.0,
-    'swimming fast': 10.0,
-    'cycling': 8.0,  # Cycling moderate effort
-    'cycling slow': 4.0,
-    'cycling fast': 10.0,
-    'jogging': 7.0,
-    'jumping rope': 12.0,
-    'dancing': 6.0,
-    'yoga': 3.0,
-    'weight lifting': 6.0,
-    'aerobics': 7.0,
-    'tennis': 7.0,
-    'basketball': 8.0,
-    'soccer': 7.0,
-    'hiking': 6.0,
-    'climbing': 8.0,
-}
-
-def calculate_calories_burned(activity, duration_minutes, weight_kg, height_cm=None, age=None, gender=None):
+# ------------------ METRICS ------------------
+def pool_and_cache_metrics():
+    lines = gauge_lines('fitness_db_pool', "Connection pool / storage engine state for this worker",
+                        get_repository().stats(), label='stat')
+    for name, cache in (('dashboard', dashboard_cache), ('profile', profile_cache)):
+        lines.extend(gauge_lines(f'fitness_{name}_cache', f"{name} cache counters for this worker",
+                                 cache.stats()['local'], label='stat'))
+    lines.extend(gauge_lines('fitness_leaderboard_snapshots', "leaderboard snapshot cache counters for this worker",
+                             leaderboard_snapshots.stats(), label='stat'))
+    lines.extend(gauge_lines('fitness_worker', "Memory and startup time of this worker process",
+                             worker_stats(), label='stat'))
+    async_reader = current_async_reader()
+    if async_reader is not None:
+        lines.extend(gauge_lines('fitness_async_reads', "Concurrent read pool and query outcomes for this worker",
+                                 async_reader.stats(), label='stat'))
+    write_queue = current_write_queue()
+    if write_queue is not None:
+        lines.extend(gauge_lines('fitness_write_queue', "Write-behind queue depth, lag and outcomes for this worker",
+                                 write_queue.stats(), label='stat'))
+    return lines
+
+
+def is_admin():
+    return session.get('user_id') in admin_config['user_ids']
+
+
+# Server-Timing header, request/query histograms and /metrics (admins and METRICS_TOKEN scrapers)
+init_metrics(app, extra_metrics=pool_and_cache_metrics, authorize=is_admin)
+
+
+# ------------------ WRITE-BEHIND ------------------
+def invalidate_dashboards(user_ids):
+    for user_id in user_ids:
+        dashboard_cache.invalidate(user_id)
+
+
+def enqueue_log(kind, row):
     """
-    Calculate calories burned during exercise using MET values.
-    Formula: MET * weight(kg) * time(hours) = calories burned
-    
-    For more accuracy with BMR adjustment (optional):
-    - Uses Harris-Benedict or Mifflin-St Jeor equation
-    - But MET values are simpler and widely used
-    
-    Args:
-        activity: Exercise type (e.g., 'walking', 'running')
-        duration_minutes: Exercise duration in minutes
-        weight_kg: User's weight in kg
-        height_cm: User's height in cm (optional, for BMR adjustment)
-        age: User's age (optional, for BMR adjustment)
-        gender: 'male' or 'female' (optional, for BMR adjustment)
-    
-    Returns:
-        Calories burned (float)
+    Hand a prepared log row to the write-behind queue when WRITE_BEHIND=1.
+    Returns None when write-behind is off (caller writes synchronously), otherwise the response.
     """
-    activity_lower = activity.lower().strip()
-    
-    # Get MET value
-    met_value = None
-    for key, value in EXERCISE_MET_VALUES.items():
-        if key in activity_lower:
-            met_value = value
-            break
-    
-    # Default MET if not found
-    if met_value is None:
-        met_value = 5.0  # Moderate activity default
-    
-    # Convert duration to hours
-    duration_hours = duration_minutes / 60.0
-    
-    # Basic calculation: MET * weight * time
-    calories = met_value * weight_kg * duration_hours
-    
-    # Optional: Adjust based on height and age for more accuracy
-    # This is a simplified adjustment factor
-    if height_cm and age:
-        # BMI factor adjustment (optional refinement)
-        height_m = height_cm / 100.0
-        bmi = weight_kg / (height_m ** 2)
-        
-        # Slight adjustment: heavier people burn slightly more per MET unit
-        # This is a simplified approximation
-        if bmi > 25:
-            calories *= 1.05  # Slight increase for higher BMI
-        elif bmi < 18.5:
-            calories *= 0.95  # Slight decrease for lower BMI
-    
-    return round(calories, 1)
+    write_queue = get_write_queue(get_repository().write_batch, on_commit=invalidate_dashboards)
+    if write_queue is None:
+        return None
+    try:
+        write_queue.submit(kind, row)
+    except QueueFull:
+        return "Too many logs are being saved right now, please try again in a moment.", 503, {'Retry-After': '5'}
+    return redirect(url_for('dashboard'))
 
 
-def calculate_tracking_streak(report_entries):
+# ------------------ ROLLUP COMPACTION ------------------
+@app.before_request
+def start_compaction_scheduler():
+    # Per worker process, started lazily so it survives pre-fork servers; no-op unless COMPACTION_SCHEDULER=1
+    get_compaction_scheduler()
+
+
+# ------------------ DASHBOARD VIEW-MODEL ------------------
+DASHBOARD_QUOTES = [
+    "Consistency beats intensity. Keep showing up!",
+    "Every healthy choice is a vote for the future you want.",
+    "You don’t have to be extreme, just consistent.",
+    "Strong body, stronger mind—one step at a time.",
+    "Fuel your body, focus your mind, follow your plan."
+]
+
+
+def build_dashboard_view(data):
     """
-    Calculate consecutive days (from most recent) with any logged activity.
+    Compute the dashboard view-model (weekly report, badges, streak, tips) from DashboardData.
+    The result is cached per user, so it must only depend on data.
     """
-    streak = 0
-    for entry in reversed(report_entries):
-        if entry['calories_in'] or entry['calories_out'] or entry['exercise_minutes']:
-            streak += 1
-        else:
-            break
-    return streak
+    today_burned = data.today.calories_burned
+    today_net = data.today.calories_in - today_burned
+    today_co2_saved = data.today.carbon_saved
+    recent_foods = data.recent_foods
+
+    weekly_report = []
+    weekly_summary = {
+        'calories_in': 0,
+        'calories_burned': 0,
+        'minutes': 0,
+        'distance': 0,
+        'sessions': 0,
+        'average_in': 0,
+        'average_burned': 0,
+        'calorie_balance': 0,
+        'days_logged': 0,
+        'days_active': 0
+    }
+
+    ai_suggestions = {
+        'quote': None,  # picked per page view
+        'diet': "Log your meals every day to build a clear picture of your intake.",
+        'workout': "Aim for at least 150 minutes of activity spread across the week."
+    }
+
+    totals = {
+        'calories_in': 0.0,
+        'calories_burned': 0.0,
+        'minutes': 0.0,
+        'distance': 0.0,
+        'sessions': 0
+    }
+
+    for day_summary in data.week:
+        consumed = round(day_summary.calories_in)
+        burned = round(day_summary.calories_burned)
+        duration = day_summary.minutes
+        sessions = day_summary.sessions
+        distance = day_summary.distance
+
+        weekly_report.append({
+            'date_label': day_summary.day.strftime('%a %d %b'),
+            'calories_in': int(consumed),
+            'calories_out': int(burned),
+            'exercise_minutes': duration,
+            'sessions': sessions,
+            'distance': round(distance, 2),
+            'exercises': data.exercises.get(day_summary.day, [])
+        })
+
+        totals['calories_in'] += consumed
+        totals['calories_burned'] += burned
+        totals['minutes'] += duration
+        totals['distance'] += distance
+        totals['sessions'] += sessions
+
+    logged_days = sum(1 for entry in weekly_report if entry['calories_in'] or entry['calories_out'])
+    active_days = sum(1 for entry in weekly_report if entry['exercise_minutes'] > 0)
+
+    if weekly_report:
+        weekly_summary['calories_in'] = int(round(totals['calories_in']))
+        weekly_summary['calories_burned'] = int(round(totals['calories_burned']))
+        weekly_summary['minutes'] = int(round(totals['minutes']))
+        weekly_summary['distance'] = round(totals['distance'], 2)
+        weekly_summary['sessions'] = totals['sessions']
+        weekly_summary['average_in'] = int(round(totals['calories_in'] / len(weekly_report)))
+        weekly_summary['average_burned'] = int(round(totals['calories_burned'] / len(weekly_report)))
+        weekly_summary['calorie_balance'] = weekly_summary['calories_in'] - weekly_summary['calories_burned']
+        weekly_summary['days_logged'] = logged_days
+        weekly_summary['days_active'] = active_days
+
+    # Whole-history streaks maintained on every write (streaks.py), not just this week
+    tracking_streak = data.current_streak
+    longest_streak = max(data.longest_streak, tracking_streak)
+    # Awards persisted by the badge engine (badges.py) as logs are written
+    badges = badge_view(data.badges)
+
+    smart_suggestions = []
+    if today_net > 500:
+        smart_suggestions.append({
+            'title': 'Balance reminder',
+            'message': 'You are in a calorie surplus today. Add a light cardio session or swap sugary snacks.',
+            'type': 'reminder'
+        })
+    else:
+        smart_suggestions.append({
+            'title': 'Great balance',
+            'message': 'Your calorie balance looks on track. Keep meals colorful and hydrated.',
+            'type': 'positive'
+        })
+
+    if tracking_streak < 3:
+        smart_suggestions.append({
+            'title': 'Build your streak',
+            'message': 'Log something tomorrow to push your streak higher and unlock badges.',
+            'type': 'tip'
+        })
+    else:
+        smart_suggestions.append({
+            'title': 'Streak booster',
+            'message': f'You are on a {tracking_streak}-day streak. Schedule tomorrow’s meal log now.',
+            'type': 'positive'
+        })
+
+    avg_in = weekly_summary.get('average_in', 0)
+    balance = weekly_summary.get('calorie_balance', 0)
+    total_minutes = weekly_summary.get('minutes', 0)
+    active_days = weekly_summary.get('days_active', 0)
+    logged_days = weekly_summary.get('days_logged', 0)
+
+    if logged_days == 0:
+        diet_tip = "Start logging your meals this week so we can tailor suggestions for you."
+    elif avg_in > 2200:
+        diet_tip = f"You're averaging {avg_in} kcal per day. Consider lighter meals with lean protein and veggies to balance your intake."
+    elif avg_in < 1600:
+        diet_tip = f"Your daily intake averages {avg_in} kcal. Make sure you're fueling enough with whole grains, healthy fats, and protein."
+    else:
+        diet_tip = "Your calorie intake sits in a steady range—keep focusing on whole foods, hydration, and consistency."
+
+    if total_minutes == 0:
+        workout_tip = "No workouts recorded yet. Schedule three short sessions this week to get moving."
+    elif total_minutes < 150:
+        shortfall = 150 - total_minutes
+        workout_tip = f"You logged {total_minutes} workout minutes this week. Add {shortfall} more minutes with brisk walks or quick home sessions to hit the 150-minute goal."
+    else:
+        workout_tip = f"Great job! {total_minutes} workout minutes logged this week. Maintain the streak with mix of strength and mobility."
+
+    if balance > 500 and logged_days > 0:
+        diet_tip += " Try dialing back sugary snacks to help close the calorie gap."
+    elif balance < -300 and logged_days > 0:
+        diet_tip += " You're running a calorie deficit—ensure you're recovering well and getting enough nutrients."
+
+    if active_days < 3 and total_minutes >= 0:
+        workout_tip += " Aim to be active on at least 3 days next week to build momentum."
+
+    ai_suggestions['diet'] = diet_tip
+    ai_suggestions['workout'] = workout_tip
+
+    return {
+        'partial': bool(data.missing),
+        'today_total_calories': data.today.calories_in,
+        'today_food_count': data.today.food_items,
+        'today_burned': today_burned,
+        'today_net': today_net,
+        'today_co2_saved': today_co2_saved,
+        'recent_foods': recent_foods,
+        'weekly_report': weekly_report,
+        'weekly_summary': weekly_summary,
+        'ai_suggestions': ai_suggestions,
+        'badges': badges,
+        'tracking_streak': tracking_streak,
+        'longest_streak': longest_streak,
+        'smart_suggestions': smart_suggestions
+    }
 
 
 # ------------------ HOME PAGE ------------------
@@ -216,26 +285,14 @@ def register():
         # Hash password before storing
         hashed_password = generate_password_hash(password)
 
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        repo = get_repository()
 
         # Check if email already exists
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        existing_user = cursor.fetchone()
-
-        if existing_user:
-            cursor.close()
-            conn.close()
+        if repo.find_user_by_email(email):
             return "Email already registered. Please login instead."
 
         # Insert new user with profile data
-        cursor.execute(
-            "INSERT INTO users (name, email, password, age, height, weight) VALUES (%s, %s, %s, %s, %s, %s)",
-            (name, email, hashed_password, age, height, weight)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        repo.create_user(name, email, hashed_password, age, height, weight)
 
         # Redirect to login page after successful registration
         return redirect(url_for('login'))
@@ -250,12 +307,7 @@ def login():
         email = request.form['email'].strip()
         password = request.form['password'].strip()
 
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
-        cursor.close()
-        conn.close()
+        user = get_repository().find_user_by_email(email)
 
         is_valid = False
         if user:
@@ -284,364 +336,81 @@ def login():
 def dashboard():
     if 'user_id' in session:
         user_name = session['user_name']
-
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
-        # Today's totals
-        try:
-            cursor.execute("""
-                SELECT IFNULL(SUM(calories), 0) AS total_calories, COUNT(*) AS items
-                FROM food_log
-                WHERE user_id = %s AND DATE(log_date) = CURDATE()
-            """, (session['user_id'],))
-            today = cursor.fetchone() or {"total_calories": 0, "items": 0}
-        except mysql.connector.Error:
-            cursor.execute("""
-                SELECT IFNULL(SUM(calories), 0) AS total_calories, COUNT(*) AS items
-                FROM food_log
-                WHERE user_id = %s
-            """, (session['user_id'],))
-            today = cursor.fetchone() or {"total_calories": 0, "items": 0}
-
-        # Today's burned calories
-        try:
-            cursor.execute("""
-                SELECT IFNULL(SUM(calories_burned), 0) AS total_burned
-                FROM exercise_log
-                WHERE user_id = %s AND DATE(log_date) = CURDATE()
-            """, (session['user_id'],))
-            today_burned_row = cursor.fetchone() or {"total_burned": 0}
-        except mysql.connector.Error:
-            cursor.execute("""
-                SELECT IFNULL(SUM(calories_burned), 0) AS total_burned
-                FROM exercise_log
-                WHERE user_id = %s
-            """, (session['user_id'],))
-            today_burned_row = cursor.fetchone() or {"total_burned": 0}
-
-        # Today's CO2 saved (kg)
-        try:
-            cursor.execute("""
-                SELECT IFNULL(SUM(carbon_saved), 0) AS co2_saved
-                FROM environment_log
-                WHERE user_id = %s AND DATE(log_date) = CURDATE()
-            """, (session['user_id'],))
-            today_env_row = cursor.fetchone() or {"co2_saved": 0}
-        except mysql.connector.Error:
-            today_env_row = {"co2_saved": 0}
-
-        today_burned = today_burned_row.get('total_burned', 0) or 0
-        today_net = (today.get('total_calories', 0) or 0) - today_burned
-        today_co2_saved = today_env_row.get('co2_saved', 0) or 0
-
-        # Recent foods
-        try:
-            cursor.execute("""
-                SELECT food_name, quantity, calories, log_date AS created_at
-                FROM food_log
-                WHERE user_id = %s
-                ORDER BY log_date DESC
-                LIMIT 10
-            """, (session['user_id'],))
-            recent_foods = cursor.fetchall() or []
-        except mysql.connector.Error:
-            cursor.execute("""
-                SELECT food_name, quantity, calories
-                FROM food_log
-                WHERE user_id = %s
-                ORDER BY id DESC
-                LIMIT 10
-            """, (session['user_id'],))
-            recent_foods = cursor.fetchall() or []
-            for item in recent_foods:
-                item['created_at'] = ''
-
-        for item in recent_foods:
-            date_val = item.get('created_at')
-            if date_val and hasattr(date_val, 'strftime'):
-                item['created_at_display'] = date_val.strftime('%d %b %Y, %I:%M %p')
-            elif date_val:
-                item['created_at_display'] = str(date_val)
-            else:
-                item['created_at_display'] = '--'
-
-        quotes = [
-            "Consistency beats intensity. Keep showing up!",
-            "Every healthy choice is a vote for the future you want.",
-            "You don’t have to be extreme, just consistent.",
-            "Strong body, stronger mind—one step at a time.",
-            "Fuel your body, focus your mind, follow your plan."
-        ]
-
-        weekly_report = []
-        weekly_summary = {
-            'calories_in': 0,
-            'calories_burned': 0,
-            'minutes': 0,
-            'distance': 0,
-            'sessions': 0,
-            'average_in': 0,
-            'average_burned': 0,
-            'calorie_balance': 0,
-            'days_logged': 0,
-            'days_active': 0
-        }
-
-        ai_suggestions = {
-            'quote': random.choice(quotes),
-            'diet': "Log your meals every day to build a clear picture of your intake.",
-            'workout': "Aim for at least 150 minutes of activity spread across the week."
-        }
-
+        user_id = session['user_id']
         today_date = datetime.now().date()
-        week_dates = [today_date - timedelta(days=delta) for delta in range(6, -1, -1)]
-        week_start = week_dates[0]
-        week_end = week_dates[-1]
-
-        def safe_float(value):
-            try:
-                return float(value)
-            except (TypeError, ValueError):
-                return 0.0
 
+        # Serve the cached view-model unless a write (through any worker) changed the user's
+        # versions or the day rolled over
+        repo = get_repository()
         try:
-            cursor.execute("""
-                SELECT DATE(log_date) AS day, IFNULL(SUM(calories), 0) AS total_calories
-                FROM food_log
-                WHERE user_id = %s AND DATE(log_date) BETWEEN %s AND %s
-                GROUP BY day
-            """, (session['user_id'], week_start, week_end))
-            food_rows = cursor.fetchall() or []
-
-            cursor.execute("""
-                SELECT DATE(log_date) AS day,
-                       IFNULL(SUM(calories_burned), 0) AS total_burned,
-                       IFNULL(SUM(duration), 0) AS total_duration,
-                       COUNT(*) AS sessions
-                FROM exercise_log
-                WHERE user_id = %s AND DATE(log_date) BETWEEN %s AND %s
-                GROUP BY day
-            """, (session['user_id'], week_start, week_end))
-            exercise_rows = cursor.fetchall() or []
-
-            cursor.execute("""
-                SELECT DATE(log_date) AS day,
-                       activity,
-                       duration,
-                       calories_burned
-                FROM exercise_log
-                WHERE user_id = %s AND DATE(log_date) BETWEEN %s AND %s
-                ORDER BY log_date DESC
-            """, (session['user_id'], week_start, week_end))
-            exercise_detail_rows = cursor.fetchall() or []
-
+            versions = repo.versions(user_id)
+        except StorageError:
+            versions = None
+        view = dashboard_cache.get(user_id, versions, today_date) if versions is not None else None
+        if view is None:
+            async_reader = get_async_reader(repo)
             try:
-                cursor.execute("""
-                    SELECT DATE(log_date) AS day,
-                           IFNULL(SUM(distance_walked), 0) AS total_distance
-                    FROM environment_log
-                    WHERE user_id = %s AND DATE(log_date) BETWEEN %s AND %s
-                    GROUP BY day
-                """, (session['user_id'], week_start, week_end))
-                env_rows = cursor.fetchall() or []
-            except mysql.connector.Error:
-                env_rows = []
-
-            food_map = {}
-            for row in food_rows:
-                day = row.get('day')
-                if day:
-                    key = day.isoformat() if hasattr(day, 'isoformat') else str(day)
-                    food_map[key] = safe_float(row.get('total_calories'))
-
-            exercise_map = {}
-            for row in exercise_rows:
-                day = row.get('day')
-                if day:
-                    key = day.isoformat() if hasattr(day, 'isoformat') else str(day)
-                    exercise_map[key] = {
-                        'burned': safe_float(row.get('total_burned')),
-                        'duration': safe_float(row.get('total_duration')),
-                        'sessions': int(row.get('sessions') or 0)
-                    }
-
-            exercise_detail_map = {}
-            for row in exercise_detail_rows:
-                day = row.get('day')
-                if day:
-                    key = day.isoformat() if hasattr(day, 'isoformat') else str(day)
-                    entry = {
-                        'activity': row.get('activity') or 'Session',
-                        'duration': int(round(safe_float(row.get('duration')))),
-                        'calories_burned': int(round(safe_float(row.get('calories_burned'))))
-                    }
-                    exercise_detail_map.setdefault(key, []).append(entry)
-
-            env_map = {}
-            for row in env_rows:
-                day = row.get('day')
-                if day:
-                    key = day.isoformat() if hasattr(day, 'isoformat') else str(day)
-                    env_map[key] = safe_float(row.get('total_distance'))
-
-            totals = {
-                'calories_in': 0.0,
-                'calories_burned': 0.0,
-                'minutes': 0.0,
-                'distance': 0.0,
-                'sessions': 0
-            }
-
-            for day in week_dates:
-                key = day.isoformat()
-                consumed = round(food_map.get(key, 0.0))
-                exercise_data = exercise_map.get(key, {'burned': 0.0, 'duration': 0.0, 'sessions': 0})
-                burned = round(exercise_data['burned'])
-                duration = int(round(exercise_data['duration']))
-                sessions = exercise_data['sessions']
-                distance = env_map.get(key, 0.0)
-
-                weekly_report.append({
-                    'date_label': day.strftime('%a %d %b'),
-                    'calories_in': int(consumed),
-                    'calories_out': int(burned),
-                    'exercise_minutes': duration,
-                    'sessions': sessions,
-                    'distance': round(distance, 2),
-                    'exercises': exercise_detail_map.get(key, [])
-                })
-
-                totals['calories_in'] += consumed
-                totals['calories_burned'] += burned
-                totals['minutes'] += duration
-                totals['distance'] += distance
-                totals['sessions'] += sessions
-
-            logged_days = sum(1 for entry in weekly_report if entry['calories_in'] or entry['calories_out'])
-            active_days = sum(1 for entry in weekly_report if entry['exercise_minutes'] > 0)
-
-            if weekly_report:
-                weekly_summary['calories_in'] = int(round(totals['calories_in']))
-                weekly_summary['calories_burned'] = int(round(totals['calories_burned']))
-                weekly_summary['minutes'] = int(round(totals['minutes']))
-                weekly_summary['distance'] = round(totals['distance'], 2)
-                weekly_summary['sessions'] = totals['sessions']
-                weekly_summary['average_in'] = int(round(totals['calories_in'] / len(weekly_report)))
-                weekly_summary['average_burned'] = int(round(totals['calories_burned'] / len(weekly_report)))
-                weekly_summary['calorie_balance'] = weekly_summary['calories_in'] - weekly_summary['calories_burned']
-                weekly_summary['days_logged'] = logged_days
-                weekly_summary['days_active'] = active_days
-
-        except mysql.connector.Error:
-            pass
-
-        tracking_streak = calculate_tracking_streak(weekly_report)
-        badges = [
-            {
-                'title': 'First 1 km walk',
-                'earned': weekly_summary.get('distance', 0) >= 1,
-                'detail': 'Walk a total of 1 km to unlock',
-                'icon': '🚶'
-            },
-            {
-                'title': '7-day tracking streak',
-                'earned': tracking_streak >= 7,
-                'detail': 'Log meals or workouts every day for a week',
-                'icon': '🔥'
-            },
-            {
-                'title': '2000 calories burned',
-                'earned': weekly_summary.get('calories_burned', 0) >= 2000,
-                'detail': 'Burn 2000 kcal through workouts',
-                'icon': '🏅'
-            }
-        ]
-
-        smart_suggestions = []
-        if today_net > 500:
-            smart_suggestions.append({
-                'title': 'Balance reminder',
-                'message': 'You are in a calorie surplus today. Add a light cardio session or swap sugary snacks.',
-                'type': 'reminder'
-            })
-        else:
-            smart_suggestions.append({
-                'title': 'Great balance',
-                'message': 'Your calorie balance looks on track. Keep meals colorful and hydrated.',
-                'type': 'positive'
-            })
-
-        if tracking_streak < 3:
-            smart_suggestions.append({
-                'title': 'Build your streak',
-                'message': 'Log something tomorrow to push your streak higher and unlock badges.',
-                'type': 'tip'
-            })
-        else:
-            smart_suggestions.append({
-                'title': 'Streak booster',
-                'message': f'You are on a {tracking_streak}-day streak. Schedule tomorrow’s meal log now.',
-                'type': 'positive'
-            })
-
-        avg_in = weekly_summary.get('average_in', 0)
-        balance = weekly_summary.get('calorie_balance', 0)
-        total_minutes = weekly_summary.get('minutes', 0)
-        active_days = weekly_summary.get('days_active', 0)
-        logged_days = weekly_summary.get('days_logged', 0)
-
-        if logged_days == 0:
-            diet_tip = "Start logging your meals this week so we can tailor suggestions for you."
-        elif avg_in > 2200:
-            diet_tip = f"You're averaging {avg_in} kcal per day. Consider lighter meals with lean protein and veggies to balance your intake."
-        elif avg_in < 1600:
-            diet_tip = f"Your daily intake averages {avg_in} kcal. Make sure you're fueling enough with whole grains, healthy fats, and protein."
-        else:
-            diet_tip = "Your calorie intake sits in a steady range—keep focusing on whole foods, hydration, and consistency."
-
-        if total_minutes == 0:
-            workout_tip = "No workouts recorded yet. Schedule three short sessions this week to get moving."
-        elif total_minutes < 150:
-            shortfall = 150 - total_minutes
-            workout_tip = f"You logged {total_minutes} workout minutes this week. Add {shortfall} more minutes with brisk walks or quick home sessions to hit the 150-minute goal."
-        else:
-            workout_tip = f"Great job! {total_minutes} workout minutes logged this week. Maintain the streak with mix of strength and mobility."
-
-        if balance > 500 and logged_days > 0:
-            diet_tip += " Try dialing back sugary snacks to help close the calorie gap."
-        elif balance < -300 and logged_days > 0:
-            diet_tip += " You're running a calorie deficit—ensure you're recovering well and getting enough nutrients."
-
-        if active_days < 3 and total_minutes >= 0:
-            workout_tip += " Aim to be active on at least 3 days next week to build momentum."
-
-        ai_suggestions['diet'] = diet_tip
-        ai_suggestions['workout'] = workout_tip
-
-        cursor.close()
-        conn.close()
+                if async_reader is not None:
+                    # Queries run concurrently on the reader's loop while this thread reads the profile
+                    pending = async_reader.submit(async_reader.dashboard(user_id, today_date))
+                    user_profile = repo.get_profile(user_id, versions)
+                    data = pending.result()
+                else:
+                    # Everything the page needs in one round trip (the profile is usually cached)
+                    data = repo.fetch_dashboard(user_id, today_date)
+                    user_profile = repo.get_profile(user_id, versions)
+            except StorageError:
+                data = user_profile = None
+
+            if data is None:
+                view = build_dashboard_view(DashboardData.empty(today_date))
+                view['bmi'] = None
+            else:
+                view = build_dashboard_view(data)
+                view['bmi'] = bmi(user_profile)
+                # A partial page (a query timed out) is shown but not kept
+                if not data.missing and versions is not None:
+                    dashboard_cache.set(user_id, view, versions, today_date)
 
+        ai_suggestions = dict(view['ai_suggestions'], quote=random.choice(DASHBOARD_QUOTES))
         return render_template(
             'dashboard.html',
             user_name=user_name,
-            user_id=session['user_id'],
-            today_total_calories=today.get('total_calories', 0),
-            today_food_count=today.get('items', 0),
-            today_burned=today_burned,
-            today_net=today_net,
-            today_co2_saved=today_co2_saved,
-            recent_foods=recent_foods,
-            weekly_report=weekly_report,
-            weekly_summary=weekly_summary,
-            ai_suggestions=ai_suggestions,
-            badges=badges,
-            tracking_streak=tracking_streak,
-            smart_suggestions=smart_suggestions
+            user_id=user_id,
+            **dict(view, ai_suggestions=ai_suggestions)
         )
     else:
         return redirect(url_for('login'))
 
 
+# ------------------ PROFILE ------------------
+@app.route('/profile', methods=['GET', 'POST'])
+def profile():
+    if 'user_id' not in session:
+        return redirect(url_for('login'))
+    user_id = session['user_id']
+    repo = get_repository()
+
+    if request.method == 'POST':
+        name = request.form.get('name', '').strip() or session['user_name']
+        try:
+            age = int(request.form['age']) if request.form.get('age', '').strip() else None
+            height = float(request.form['height']) if request.form.get('height', '').strip() else None
+            weight = float(request.form['weight']) if request.form.get('weight', '').strip() else None
+        except ValueError:
+            return "Age, height and weight must be numbers.", 400
+
+        # Commits, then drops the cached profile
+        repo.update_profile(user_id, name, age, height, weight)
+        dashboard_cache.invalidate(user_id)
+        session['user_name'] = name
+        return redirect(url_for('dashboard'))
+
+    user_profile = repo.get_profile(user_id)
+
+    return render_template('profile.html', user_name=session['user_name'], profile=user_profile or {})
+
+
 # ------------------ ADD FOOD LOG ------------------
 @app.route('/add_food', methods=['POST'])
 def add_food():
@@ -655,6 +424,12 @@ def add_food():
         quantity = max(int(quantity_raw), 1)
     except ValueError:
         quantity = 1
+
+    # Checked here so a row the columns would reject never reaches the write-behind queue
+    if len(food_name) > MAX_NAME_LENGTH:
+        return f"Error adding food log. Food name must be at most {MAX_NAME_LENGTH} characters.", 400
+    if quantity > MAX_INT:
+        return f"Error adding food log. Quantity must be at most {MAX_INT}.", 400
     
     # Auto-calculate calories from fruit name
     calories_per_unit = get_fruit_calories(food_name)
@@ -672,49 +447,17 @@ def add_food():
             # Default if no fruit match and no manual input
             calories = 0
 
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    row = (session['user_id'], food_name, quantity, calories, datetime.now())
+    queued = enqueue_log('food', row)
+    if queued is not None:
+        return queued
+
+    # Food row and rollup commit together
     try:
-        cursor.execute(
-            "INSERT INTO food_log (user_id, food_name, quantity, calories) VALUES (%s, %s, %s, %s)",
-            (session['user_id'], food_name, quantity, calories)
-        )
-        conn.commit()
-    except mysql.connector.Error as e:
-        # Handle the case where a database trigger references a non-existent user_summary table
-        error_msg = str(e).lower()
-        if "user_summary" in error_msg and "doesn't exist" in error_msg:
-            # Rollback and try to disable/ignore trigger errors
-            try:
-                conn.rollback()
-                # Try inserting again - if trigger fails, the insert might still work
-                # This is a workaround for triggers that reference missing tables
-                cursor.execute(
-                    "INSERT INTO food_log (user_id, food_name, quantity, calories) VALUES (%s, %s, %s, %s)",
-                    (session['user_id'], food_name, quantity, calories)
-                )
-                try:
-                    conn.commit()
-                except mysql.connector.Error:
-                    # If commit fails due to trigger, the data might still be inserted
-                    # Try a simple commit without checking for trigger errors
-                    conn.commit()
-            except mysql.connector.Error:
-                # If all else fails, just rollback and show error
-                conn.rollback()
-                cursor.close()
-                conn.close()
-                return f"Error adding food log. Please check database triggers. Original error: {str(e)}"
-        else:
-            # For other errors, raise normally
-            conn.rollback()
-            cursor.close()
-            conn.close()
-            raise
-    
-    cursor.close()
-    conn.close()
+        get_repository().write_batch([row], [])
+    except StorageError as e:
+        return f"Error adding food log. {e}"
+    dashboard_cache.invalidate(session['user_id'])
 
     return redirect(url_for('dashboard'))
 
@@ -733,72 +476,228 @@ def add_exercise():
     except ValueError:
         duration_min = 0
 
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    
-    # Get user's profile data (weight, height, age) for accurate calorie calculation
-    cursor.execute("SELECT weight, height, age FROM users WHERE id = %s", (session['user_id'],))
-    user_data = cursor.fetchone()
-    
-    weight_kg = user_data.get('weight') if user_data and user_data.get('weight') else 70.0  # Default 70kg
-    height_cm = user_data.get('height') if user_data and user_data.get('height') else 170.0  # Default 170cm
-    age = user_data.get('age') if user_data and user_data.get('age') else 30  # Default 30 years
-    
-    # Auto-calculate calories burned using MET formula based on user's stats
-    calories_burned_val = calculate_calories_burned(
-        activity=activity,
-        duration_minutes=duration_min,
-        weight_kg=weight_kg,
-        height_cm=height_cm,
-        age=age
-    )
-    
-    cursor.execute(
-        "INSERT INTO exercise_log (user_id, activity, duration, calories_burned) VALUES (%s, %s, %s, %s)",
-        (session['user_id'], activity, duration_min, calories_burned_val)
-    )
-    conn.commit()
+    if len(activity) > MAX_NAME_LENGTH:
+        return f"Error adding exercise log. Activity must be at most {MAX_NAME_LENGTH} characters.", 400
+    if not 0 <= duration_min <= MAX_INT:
+        return f"Error adding exercise log. Duration must be between 0 and {MAX_INT} minutes.", 400
 
-    # Environment impact for walking only (distance + CO2 saved)
-    # Assume 5 km/h => 0.0833 km/min; CO2 saved ≈ 0.21 kg per km not driven
-    if activity.lower() == 'walking':
-        distance_km = duration_min * (5.0 / 60.0)
-        carbon_saved_kg = distance_km * 0.21
-        try:
-            cursor.execute(
-                "INSERT INTO environment_log (user_id, distance_walked, carbon_saved) VALUES (%s, %s, %s)",
-                (session['user_id'], distance_km, carbon_saved_kg)
-            )
-            conn.commit()
-        except mysql.connector.Error:
-            pass
+    # Calories burned (MET formula with the user's cached profile) and the walking
+    # distance / CO2 saved are computed at write time, by the queue worker in write-behind mode
+    row = (session['user_id'], activity, duration_min, datetime.now())
+    queued = enqueue_log('exercise', row)
+    if queued is not None:
+        return queued
 
-    cursor.close()
-    conn.close()
+    # Exercise, environment and rollup rows commit together
+    try:
+        get_repository().write_batch([], [row])
+    except StorageError as e:
+        return f"Error adding exercise log. {e}"
+    dashboard_cache.invalidate(session['user_id'])
 
     return redirect(url_for('dashboard'))
 
 
+# ------------------ BULK IMPORT ------------------
+@app.route('/api/import', methods=['POST'])
+def bulk_import_api():
+    """
+    Import the logged-in user's food/exercise logs from CSV or NDJSON.
+    Send a multipart upload in the 'file' field, or the raw file as the request body
+    (?format=csv|ndjson) to stream it without spooling. ?type=food|exercise sets the
+    record type for files without a type column. Row errors are reported, not fatal.
+    """
+    if 'user_id' not in session:
+        return jsonify({'error': 'login required'}), 401
+
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'error': "missing 'file' upload"}), 400
+        stream = upload.stream
+        fmt = request.form.get('format') or detect_format(upload.filename)
+        record_type = request.form.get('type')
+    else:
+        stream = request.stream
+        fmt = request.args.get('format') or ('ndjson' if 'json' in request.mimetype else 'csv')
+        record_type = request.args.get('type')
+
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': f"unsupported format {fmt!r}"}), 400
+
+    report = import_stream(get_repository().write_batch, stream, fmt=fmt, user_id=session['user_id'],
+                           default_type=record_type)
+    dashboard_cache.invalidate(session['user_id'])
+
+    return jsonify(report.as_dict())
+
+
+# ------------------ EXPORT ------------------
+def export_response(user_id=None):
+    """
+    Stream logs as CSV or NDJSON. Query parameters:
+    format=csv|ndjson, type=all|food,exercise,environment, from/to=YYYY-MM-DD (inclusive),
+    after=<type>:<id> to resume, gzip=1 (or Accept-Encoding: gzip) to compress.
+    """
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': f"unsupported format {fmt!r}"}), 400
+    try:
+        types = parse_types(request.args.get('type'))
+        after = request.args.get('after')
+        parse_resume_token(after, types)
+        start_day = parse_day(request.args.get('from'), 'from')
+        end_day = parse_day(request.args.get('to'), 'to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    compress = request.args.get('gzip') == '1' or 'gzip' in request.headers.get('Accept-Encoding', '')
+    body = export_stream(
+        get_repository().connect_direct, fmt=fmt, compress=compress,
+        types=types, user_id=user_id, start_day=start_day, end_day=end_day, after=after
+    )
+
+    filename = f"fitness_export_{user_id if user_id is not None else 'all'}.{fmt}"
+    response = Response(body, mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson')
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+@app.route('/api/export/<int:user_id>')
+def export_user_api(user_id):
+    if 'user_id' not in session:
+        return jsonify({'error': 'login required'}), 401
+    if session['user_id'] != user_id and not is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    return export_response(user_id)
+
+
+@app.route('/api/export')
+def export_all_api():
+    if not is_admin():
+        return jsonify({'error': 'admin only'}), 403
+    return export_response()
 
 
 # ------------------ API (For Mobile App - Later) ------------------
 @app.route('/api/summary/<int:user_id>')
 def summary_api(user_id):
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
+    """
+    Totals per bucket from the daily rollups.
+    ?from=YYYY-MM-DD&to=YYYY-MM-DD (inclusive, default: all history) &granularity=day|week|month.
+    Responses carry an ETag / Last-Modified from the user's latest write, so polling
+    clients get 304 Not Modified without the aggregation running.
+    """
+    granularity = request.args.get('granularity', 'day')
+    if granularity not in GRANULARITIES:
+        return jsonify({'error': f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+    try:
+        start_day = parse_day(request.args.get('from'), 'from')
+        end_day = parse_day(request.args.get('to'), 'to')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    repo = get_repository()
+    async_reader = get_async_reader(repo)
+    body = None
+    if async_reader is not None and not (request.if_none_match or request.if_modified_since):
+        # Nothing to revalidate: read the version and the buckets at the same time
+        try:
+            last_modified, body = async_reader.submit(
+                async_reader.summary(user_id, start_day, end_day, granularity)
+            ).result()
+        except StorageError as e:
+            return jsonify({'error': str(e)}), 503
+    else:
+        last_modified = repo.last_modified(user_id)
+    version = last_modified.isoformat() if last_modified else 'empty'
+    etag = hashlib.sha1(
+        f"{user_id}|{version}|{start_day}|{end_day}|{granularity}".encode()
+    ).hexdigest()
+
+    if request.if_none_match.contains(etag) or (
+        not request.if_none_match and last_modified and request.if_modified_since
+        and last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= request.if_modified_since
+    ):
+        response = Response(status=304)
+    else:
+        response = jsonify(body if body is not None else repo.summary(user_id, start_day, end_day, granularity))
 
-    cursor.execute("""
-        SELECT 
-            IFNULL(SUM(calories), 0) AS total_calories_consumed
-        FROM food_log
-        WHERE user_id = %s
-    """, (user_id,))
+    response.set_etag(etag)
+    # updated_at is in the database's time zone; it is only ever compared with values we sent
+    if last_modified:
+        response.last_modified = last_modified.replace(tzinfo=timezone.utc)
+    response.cache_control.no_cache = True  # always revalidate
+    return response
 
-    summary = cursor.fetchone()
-    cursor.close()
-    conn.close()
 
-    return jsonify(summary)
+@app.route('/api/leaderboard/<board>')
+def leaderboard_api(board):
+    """
+    Top users of a board (calories_burned, distance_walked, carbon_saved).
+    ?period=week|month (default week) &date=YYYY-MM-DD (any day in the period, default
+    today) &limit=N (default 10, at most LEADERBOARD_TOP_K). Logged-in users also get
+    their own score and rank under "me".
+    """
+    period = request.args.get('period', 'week')
+    if board not in LEADERBOARD_BOARDS or period not in LEADERBOARD_PERIODS:
+        return jsonify({'error': f"board must be one of {', '.join(LEADERBOARD_BOARDS)} "
+                                 f"and period one of {', '.join(LEADERBOARD_PERIODS)}"}), 400
+    try:
+        day = parse_day(request.args.get('date'), 'date') or datetime.now().date()
+        limit = int(request.args.get('limit', 10))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    limit = min(max(limit, 1), leaderboard_config['top_k'])
+    try:
+        board_data = get_repository().leaderboard(board, period, day, limit, user_id=session.get('user_id'))
+    except StorageError as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify(board_data)
+
+
+# Operational detail (database path, queue depth, hit counts) is admin-only, like /metrics
+@app.route('/api/pool_stats')
+def pool_stats_api():
+    if not is_admin():
+        return jsonify({'error': 'admin only'}), 403
+    return jsonify(get_repository().stats())
+
+
+@app.route('/api/cache_stats')
+def cache_stats_api():
+    if not is_admin():
+        return jsonify({'error': 'admin only'}), 403
+    return jsonify({'dashboard': dashboard_cache.stats(), 'profile': profile_cache.stats(),
+                    'leaderboard': leaderboard_snapshots.stats()})
+
+
+@app.route('/api/write_queue_stats')
+def write_queue_stats_api():
+    if not is_admin():
+        return jsonify({'error': 'admin only'}), 403
+    write_queue = get_write_queue(get_repository().write_batch, on_commit=invalidate_dashboards)
+    return jsonify(write_queue.stats() if write_queue is not None else {'enabled': False})
+
+
+@app.route('/admin/slow_queries')
+def slow_queries_admin():
+    if not is_admin():
+        return "Admin only.", 403
+    entries = slow_query_log.recent() if slow_query_log is not None else []
+    return render_template(
+        'slow_queries.html',
+        enabled=slow_query_log is not None,
+        threshold_ms=slow_query_config['threshold_ms'],
+        path=slow_query_config['path'],
+        dropped=slow_query_log.dropped if slow_query_log is not None else 0,
+        entries=entries,
+        groups=summarize_slow_queries(entries),
+    )
 
 
 # ------------------ LOGOUT ------------------
@@ -809,31 +708,73 @@ def logout():
 
 
 # ------------------ ENTRIES (All DB rows) ------------------
+def parse_cursor(value):
+    """Keyset cursor from ?after=<id>; None means start from the newest row."""
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+def page_size_arg():
+    try:
+        limit = int(request.args.get('limit', entries_config['page_size']))
+    except ValueError:
+        limit = entries_config['page_size']
+    return min(max(limit, 1), entries_config['max_page_size'])
+
+
 @app.route('/entries')
 def entries():
     if 'user_id' not in session:
         return redirect(url_for('login'))
 
-    conn = get_db_connection()
-    cursor = conn.cursor(dictionary=True)
-    cursor.execute("SELECT id, name, email FROM users ORDER BY id DESC")
-    users = cursor.fetchall() or []
+    limit = page_size_arg()
+    users_after = parse_cursor(request.args.get('users_after'))
+    foods_after = parse_cursor(request.args.get('foods_after'))
+    food_user_id = parse_cursor(request.args.get('user_id'))
+
+    repo = get_repository()
+    users, users_next = repo.users_page(users_after, limit)
     try:
-        cursor.execute("""
-            SELECT id, user_id, food_name, quantity, calories, log_date AS created_at
-            FROM food_log
-            ORDER BY id DESC
-            LIMIT 200
-        """)
-        foods = cursor.fetchall() or []
-    except mysql.connector.Error:
-        foods = []
-    cursor.close()
-    conn.close()
+        foods, foods_next = repo.foods_page(foods_after, limit, food_user_id)
+    except StorageError:
+        foods, foods_next = [], None
+
+    return render_template(
+        'entries.html',
+        users=users,
+        foods=foods,
+        users_next=users_next,
+        foods_next=foods_next,
+        users_after=users_after,
+        foods_after=foods_after,
+        food_user_id=food_user_id,
+        limit=limit
+    )
+
+
+@app.route('/api/entries/<kind>')
+def entries_api(kind):
+    """JSON variant of /entries: kind is users or foods; ?after=<id>, ?limit=, ?user_id= (foods)."""
+    if 'user_id' not in session:
+        return jsonify({'error': 'login required'}), 401
+    if kind not in ('users', 'foods'):
+        return jsonify({'error': f"unknown list {kind!r}"}), 404
+
+    limit = page_size_arg()
+    after = parse_cursor(request.args.get('after'))
+
+    repo = get_repository()
+    if kind == 'users':
+        rows, next_cursor = repo.users_page(after, limit)
+    else:
+        rows, next_cursor = repo.foods_page(after, limit, parse_cursor(request.args.get('user_id')))
 
-    return render_template('entries.html', users=users, foods=foods)
+    return jsonify({'items': rows, 'next_after': next_cursor, 'limit': limit})
 
 
 # ------------------ RUN SERVER ------------------
+# Development server with the debugger and reloader; use serve.py in production
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,206 @@
+"""
+Concurrent reads for the dashboard and /api/summary on aiomysql (ASYNC_READS=1, MySQL only).
+
+The dashboard's branches (dashboard_data.DASHBOARD_QUERIES) and the summary's
+statements do not depend on each other. The single-query path sends them as one
+statement that MySQL runs branch after branch. Here each goes out on its own
+connection at the same time, so a page waits about as long as its slowest query
+instead of the sum of all of them.
+
+- Each worker process runs one asyncio event loop on a daemon thread with its own
+  aiomysql pool of ASYNC_POOL_SIZE connections (recreated after a fork). Routes stay
+  synchronous: they hand a coroutine to the loop and wait for its result, so this
+  works with every serve.py worker class.
+- Every query has its own ASYNC_QUERY_TIMEOUT. A dashboard branch that fails or
+  times out is left empty and listed in DashboardData.missing; the page renders with
+  the rest and is not cached. A summary needs all of its buckets and raises
+  StorageError instead; only its version lookup (ETag) and the compaction mark
+  (which only lets it read fewer rows) may be skipped.
+- A timed-out query's connection is closed instead of going back to the pool, since
+  its result may still be on the way.
+
+With ASYNC_READS=0 (the default) or on the SQLite engine, the routes use the
+repository's single-query path.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+from config import async_config, db_config, pool_config
+from compaction import COMPACTED_THROUGH_SQL, JOB_NAME
+from dashboard_data import DASHBOARD_QUERIES, DashboardData, apply_rows, dashboard_params
+from metrics import record_query
+from storage import StorageError
+from summary import LAST_MODIFIED_SQL, PERIOD_TABLES, assemble_summary, summary_queries
+from timeranges import as_date, as_datetime
+
+try:
+    import aiomysql
+except ImportError:
+    aiomysql = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncReader:
+    """An event loop on a daemon thread, with an aiomysql pool used only from that loop."""
+
+    def __init__(self, config, pool_size=10, query_timeout=2.0):
+        self.config = dict(config)
+        self.pool_size = max(int(pool_size), 1)
+        self.query_timeout = float(query_timeout)
+        self.loop = asyncio.new_event_loop()
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+        self._counters = {'queries': 0, 'timeouts': 0, 'errors': 0, 'partial_dashboards': 0}
+        self._thread = threading.Thread(target=self.loop.run_forever, name='async-reads', daemon=True)
+        self._thread.start()
+
+    def submit(self, coro):
+        """Schedule coro on the loop; returns a concurrent.futures.Future the caller can wait on."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    # ---- pool and queries (loop thread) ----
+    async def _get_pool(self):
+        async with self._pool_lock:
+            if self._pool is None:
+                self._pool = await aiomysql.create_pool(
+                    host=self.config.get('host', 'localhost'),
+                    port=int(self.config.get('port', 3306)),
+                    user=self.config.get('user'),
+                    password=self.config.get('password', ''),
+                    db=self.config.get('database'),
+                    minsize=self.pool_size,
+                    maxsize=self.pool_size,
+                    autocommit=True,
+                    connect_timeout=self.query_timeout,
+                    pool_recycle=pool_config['recycle'] or -1,
+                )
+        return self._pool
+
+    async def _query(self, name, sql, params):
+        pool = await self._get_pool()
+        started = time.perf_counter()
+        conn = await pool.acquire()
+        try:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                rows = await cursor.fetchall()
+        except BaseException:
+            # Failed or cancelled mid-statement: do not hand the connection to the next query
+            conn.close()
+            raise
+        finally:
+            pool.release(conn)  # the pool drops closed connections
+        record_query(name, time.perf_counter() - started)
+        return rows
+
+    async def query(self, name, sql, params):
+        """Rows (dicts) of one statement within query_timeout; raises StorageError."""
+        self._counters['queries'] += 1
+        try:
+            return await asyncio.wait_for(self._query(name, sql, params), self.query_timeout)
+        except asyncio.TimeoutError:
+            self._counters['timeouts'] += 1
+            raise StorageError(f"{name} timed out after {self.query_timeout}s")
+        except (aiomysql.Error, OSError) as e:
+            self._counters['errors'] += 1
+            raise StorageError(f"{name}: {e}") from e
+
+    async def warm(self):
+        """Open the pool's connections now instead of on the first request; returns how many are open."""
+        try:
+            pool = await asyncio.wait_for(self._get_pool(), self.query_timeout * self.pool_size)
+        except asyncio.TimeoutError:
+            raise StorageError(f"async pool not ready after {self.query_timeout * self.pool_size}s")
+        except (aiomysql.Error, OSError) as e:
+            raise StorageError(str(e)) from e
+        return pool.size
+
+    async def dashboard(self, user_id, today_date):
+        """DashboardData from every branch that answered in time; the others are in data.missing."""
+        data = DashboardData.empty(today_date)
+        params = dashboard_params(user_id, data.week[0].day, today_date)
+        results = await asyncio.gather(
+            *(self.query(f'dashboard_{kind}', sql, params[kind]) for kind, sql in DASHBOARD_QUERIES.items()),
+            return_exceptions=True
+        )
+        rows = []
+        missing = []
+        for kind, result in zip(DASHBOARD_QUERIES, results):
+            if isinstance(result, StorageError):
+                missing.append(kind)
+                logger.warning("dashboard for user %s without %s: %s", user_id, kind, result)
+            elif isinstance(result, BaseException):
+                raise result
+            else:
+                rows.extend(result)
+        if len(missing) == len(DASHBOARD_QUERIES):
+            raise StorageError("every dashboard query failed")
+        if missing:
+            self._counters['partial_dashboards'] += 1
+        data.missing = tuple(missing)
+        return apply_rows(data, rows, today_date)
+
+    async def summary(self, user_id, start_day, end_day, granularity):
+        """(last_modified or None, /api/summary body) with the version and bucket queries run together."""
+        version = asyncio.ensure_future(self.query('summary_last_modified', LAST_MODIFIED_SQL, (user_id,) * 3))
+        try:
+            compacted_through = None
+            if granularity in PERIOD_TABLES:
+                try:
+                    rows = await self.query('compacted_through', COMPACTED_THROUGH_SQL, (JOB_NAME,))
+                    compacted_through = as_date(rows[0]['compacted_through']) if rows else None
+                except StorageError as e:
+                    # Daily rows alone give the same totals, just from more rows
+                    logger.warning("summary without the compaction mark: %s", e)
+            row_lists = await asyncio.gather(*(
+                self.query('summary', sql, params)
+                for sql, params in summary_queries(user_id, start_day, end_day, granularity,
+                                                   compacted_through=compacted_through)
+            ))
+        except BaseException:
+            version.cancel()
+            raise
+        try:
+            rows = await version
+            last_modified = as_datetime(rows[0]['last_modified']) if rows else None
+        except StorageError:
+            last_modified = None  # served without an ETag
+        return last_modified, assemble_summary(user_id, start_day, end_day, granularity, row_lists)
+
+    def stats(self):
+        stats = dict(self._counters, pid=os.getpid(), pool_size=self.pool_size)
+        if self._pool is not None:
+            stats.update(pool_open=self._pool.size, pool_free=self._pool.freesize)
+        return stats
+
+
+_reader = None
+_reader_pid = None
+_reader_lock = threading.Lock()
+
+
+def get_async_reader(repo):
+    """The process-wide reader when ASYNC_READS=1 on the MySQL engine (recreated after a fork), else None."""
+    global _reader, _reader_pid
+    if not async_config['enabled'] or repo.name != 'mysql':
+        return None
+    if aiomysql is None:
+        raise RuntimeError("ASYNC_READS=1 but the 'aiomysql' package is not installed")
+    pid = os.getpid()
+    if _reader is None or _reader_pid != pid:
+        with _reader_lock:
+            if _reader is None or _reader_pid != pid:
+                # The loop thread of a parent process does not survive fork()
+                _reader = AsyncReader(db_config, async_config['pool_size'], async_config['query_timeout'])
+                _reader_pid = pid
+    return _reader
+
+
+def current_reader():
+    """The reader this process has started, if any (for /metrics)."""
+    return _reader if _reader_pid == os.getpid() else None
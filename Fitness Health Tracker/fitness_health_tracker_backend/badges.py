@@ -0,0 +1,264 @@
+"""
+Badges: declarative rules evaluated incrementally as logs are written.
+
+Each Badge is awarded once its counter reaches a threshold. Counters are the
+user's lifetime totals in user_counters (the daily_summary columns summed over all
+days) plus longest_streak from user_streaks (streaks.py).
+
+- Repository.write_batch calls update_badges() in the same transaction as the
+  logs. It adds the batch's totals to user_counters and awards the badges whose
+  threshold was crossed by this batch. No history is read.
+- Awards are kept in user_badges with their time. The dashboard reads them through
+  the (user_id, badge) key in its single query, so an earned badge stays earned.
+- replay() evaluates the rules over the existing history in one streaming pass
+  over daily_summary. It resets the counters and adds any missing awards, dated
+  to the day the threshold was crossed. Run it after migrating, after
+  rollups.py rebuild or recompute_calories.py, and after adding a rule.
+
+Usage:
+    python badges.py replay
+    python badges.py replay --user-id 7
+    python badges.py show 7
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from rollups import SUMMARY_COLUMNS, upsert_params
+from storage import StorageError, get_repository
+from streaks import advance, empty_state
+from timeranges import as_date, as_datetime
+
+STREAK_COUNTER = 'longest_streak'
+REPLAY_FLUSH_USERS = 500  # users per replay write transaction
+REPLAY_FETCH_ROWS = 5000
+
+
+@dataclass(frozen=True)
+class Badge:
+    key: str
+    title: str
+    icon: str
+    detail: str
+    counter: str       # a user_counters column, or STREAK_COUNTER
+    threshold: float
+
+    def crossed(self, before, after):
+        return before < self.threshold <= after
+
+
+# Keys are stored in user_badges: rename a title freely, never a key
+BADGES = (
+    Badge('walk_1km', 'First 1 km walk', '🚶', 'Walk a total of 1 km to unlock', 'total_distance_walked', 1),
+    Badge('streak_7', '7-day tracking streak', '🔥', 'Log meals or workouts every day for a week',
+          STREAK_COUNTER, 7),
+    Badge('burned_2000', '2000 calories burned', '🏅', 'Burn 2000 kcal through workouts',
+          'total_calories_burned', 2000),
+    Badge('streak_30', '30-day tracking streak', '🏆', 'Log meals or workouts every day for a month',
+          STREAK_COUNTER, 30),
+    Badge('meals_100', '100 meals logged', '🥗', 'Log 100 meals or snacks', 'food_items', 100),
+    Badge('minutes_1000', '1000 workout minutes', '⏱️', 'Work out for 1000 minutes in total', 'exercise_minutes', 1000),
+    Badge('walk_42km', 'Marathon walker', '🏃', 'Walk a total of 42.2 km', 'total_distance_walked', 42.195),
+)
+
+
+def counter_deltas(rollups):
+    """(user_id, day, totals_dict) rollup rows -> {user_id: [delta per SUMMARY_COLUMNS]}."""
+    deltas = {}
+    for user_id, _, *values in upsert_params(rollups):
+        totals = deltas.setdefault(user_id, [0] * len(SUMMARY_COLUMNS))
+        for i, value in enumerate(values):
+            totals[i] += value
+    return deltas
+
+
+def write_counters(repo, cursor, counters, additive):
+    """Upsert {user_id: [value per SUMMARY_COLUMNS]}: add to the stored totals, or replace them."""
+    if not counters:
+        return
+    sql = (
+        f"INSERT INTO user_counters (user_id, {', '.join(SUMMARY_COLUMNS)}) "
+        f"VALUES (%s, {', '.join(['%s'] * len(SUMMARY_COLUMNS))}) "
+        + repo.upsert_clause(('user_id',), SUMMARY_COLUMNS, additive=additive)
+    )
+    # Key order keeps concurrent writers from deadlocking
+    cursor.executemany(sql, [(user_id,) + tuple(values) for user_id, values in sorted(counters.items())])
+
+
+def write_awards(repo, cursor, awards):
+    """Insert (user_id, badge_key, awarded_at) rows; a badge already awarded keeps its first time."""
+    if not awards:
+        return
+    cursor.executemany(
+        "INSERT INTO user_badges (user_id, badge, awarded_at) VALUES (%s, %s, %s) "
+        + repo.upsert_clause(('user_id', 'badge'), ('badge',)),
+        sorted(awards)
+    )
+
+
+def update_badges(repo, cursor, rollups, streak_changes=None, awarded_at=None):
+    """
+    Add a written batch to user_counters and award the badges it unlocks, on cursor
+    (a tuple cursor inside the write's transaction); no commit. streak_changes is
+    update_streaks()' {user_id: (old_state, new_state)}. Returns the awards.
+    """
+    deltas = counter_deltas(rollups)
+    if not deltas:
+        return []
+    write_counters(repo, cursor, deltas, additive=True)
+    user_ids = sorted(deltas)
+    cursor.execute(
+        f"SELECT user_id, {', '.join(SUMMARY_COLUMNS)} FROM user_counters "
+        f"WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})",
+        user_ids
+    )
+    totals = {row[0]: row[1:] for row in cursor.fetchall()}
+
+    awarded_at = awarded_at or datetime.now()
+    awards = []
+    for user_id, delta in deltas.items():
+        after = dict(zip(SUMMARY_COLUMNS, totals.get(user_id, delta)))
+        before = {column: after[column] - change for column, change in zip(SUMMARY_COLUMNS, delta)}
+        old_streak, new_streak = (streak_changes or {}).get(user_id, (empty_state(), empty_state()))
+        before[STREAK_COUNTER] = old_streak['longest_streak']
+        after[STREAK_COUNTER] = new_streak['longest_streak']
+        for badge in BADGES:
+            if badge.crossed(before[badge.counter], after[badge.counter]):
+                awards.append((user_id, badge.key, awarded_at))
+    write_awards(repo, cursor, awards)
+    return awards
+
+
+def fetch_badges(cursor, user_id):
+    """{badge key: awarded_at} (dictionary cursor)."""
+    cursor.execute("SELECT badge, awarded_at FROM user_badges WHERE user_id = %s", (user_id,))
+    return {row['badge']: as_datetime(row['awarded_at']) for row in cursor.fetchall()}
+
+
+class _Replay:
+    """Counters, streak and awards of one user while their days stream past."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.totals = dict.fromkeys(SUMMARY_COLUMNS, 0)
+        self.totals[STREAK_COUNTER] = 0
+        self.streak = empty_state()
+        self.awards = []
+
+    def add_day(self, day, values):
+        before = dict(self.totals)
+        values = {column: value or 0 for column, value in zip(SUMMARY_COLUMNS, values)}
+        for column, value in values.items():
+            self.totals[column] += value
+        if values['food_items'] > 0 or values['exercise_sessions'] > 0:
+            self.streak = advance(self.streak, [day]) or self.streak
+            self.totals[STREAK_COUNTER] = self.streak['longest_streak']
+        for badge in BADGES:
+            if badge.crossed(before[badge.counter], self.totals[badge.counter]):
+                self.awards.append((self.user_id, badge.key, datetime.combine(day, datetime.min.time())))
+
+
+def replay(repo, user_id=None):
+    """
+    Re-evaluate every rule over daily_summary in one pass ordered by (user_id, date).
+    Rows are streamed from an unbuffered cursor on a direct connection; counters and
+    awards are written every REPLAY_FLUSH_USERS users. Returns a stats dict.
+    """
+    started = time.time()
+    stats = {'users': 0, 'days': 0, 'awards': 0}
+    pending = []
+
+    def flush():
+        with repo.cursor(dictionary=False, commit=True) as cursor:
+            write_counters(repo, cursor, {
+                state.user_id: [state.totals[column] for column in SUMMARY_COLUMNS] for state in pending
+            }, additive=False)
+            awards = [award for state in pending for award in state.awards]
+            write_awards(repo, cursor, awards)
+        stats['users'] += len(pending)
+        stats['awards'] += len(awards)
+        pending.clear()
+
+    sql = f"SELECT user_id, date, {', '.join(SUMMARY_COLUMNS)} FROM daily_summary"
+    params = ()
+    if user_id is not None:
+        sql += " WHERE user_id = %s"
+        params = (user_id,)
+    sql += " ORDER BY user_id, date"
+
+    try:
+        conn = repo.connect_direct()
+    except repo.errors as e:
+        raise repo.translate_error(e) from e
+    try:
+        # Unbuffered: rows stay on the server until fetched
+        cursor = conn.cursor(buffered=False)
+        try:
+            cursor.execute(sql, params)
+            current = None
+            while True:
+                rows = cursor.fetchmany(REPLAY_FETCH_ROWS)
+                if not rows:
+                    break
+                for row in rows:
+                    if current is None or current.user_id != row[0]:
+                        if current is not None:
+                            pending.append(current)
+                            if len(pending) >= REPLAY_FLUSH_USERS:
+                                flush()
+                        current = _Replay(row[0])
+                    current.add_day(as_date(row[1]), row[2:])
+                    stats['days'] += 1
+            if current is not None:
+                pending.append(current)
+        finally:
+            cursor.close()
+    except repo.errors as e:
+        raise repo.translate_error(e) from e
+    finally:
+        conn.close()
+    if pending:
+        flush()
+    stats['seconds'] = round(time.time() - started, 3)
+    return stats
+
+
+def badge_view(awarded):
+    """Dashboard cards for every rule; awarded is fetch_badges()' {key: awarded_at}."""
+    cards = []
+    for badge in BADGES:
+        awarded_at = awarded.get(badge.key)
+        cards.append({
+            'key': badge.key,
+            'title': badge.title,
+            'icon': badge.icon,
+            'earned': badge.key in awarded,
+            'detail': f"Earned {awarded_at:%d %b %Y}" if awarded_at else badge.detail,
+        })
+    return cards
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Badge counters and awards")
+    sub = parser.add_subparsers(dest='command', required=True)
+    replay_parser = sub.add_parser('replay', help="re-evaluate the rules over daily_summary")
+    replay_parser.add_argument('--user-id', type=int, help="only this user")
+    show_parser = sub.add_parser('show', help="print one user's badges")
+    show_parser.add_argument('user_id', type=int)
+    args = parser.parse_args()
+
+    repo = get_repository()
+    try:
+        if args.command == 'replay':
+            result = replay(repo, args.user_id)
+            print(f"Replayed {result['days']} day(s) for {result['users']} user(s) in {result['seconds']}s, "
+                  f"{result['awards']} badge(s) earned (already stored awards keep their date)")
+        else:
+            awarded = repo.badges(args.user_id)
+            for badge in BADGES:
+                status = f"earned {awarded[badge.key]}" if badge.key in awarded else "not yet"
+                print(f"{badge.icon} {badge.title}: {status}")
+    except StorageError as e:
+        print(f"Error: {e}")
@@ -0,0 +1,339 @@
+"""
+Bulk import of food and exercise logs from CSV or NDJSON.
+Records are streamed from the file, validated one at a time, and written in
+batches: one transaction per batch with multi-row INSERTs (executemany) into
+food_log / exercise_log / environment_log plus the matching daily_summary
+upserts, so the rollups stay consistent with the raw logs.
+
+Record fields (CSV header or NDJSON keys):
+    type        food | exercise (optional if every record is the same kind, see --type)
+    user_id     required unless given on the command line / taken from the session
+    log_date    optional, ISO date or datetime (defaults to now)
+    food:       food_name, quantity, calories (only used for unknown foods)
+    exercise:   activity, duration (minutes)
+
+Usage:
+    python bulk_import.py logs.csv
+    python bulk_import.py logs.ndjson --user-id 7 --type exercise --batch-size 5000
+"""
+
+import argparse
+import csv
+import io
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from calories import calculate_calories_burned, get_fruit_calories
+from profiles import burn_inputs, fetch_profiles
+from rollups import upsert_daily_summaries
+from storage import get_repository
+from storage.errors import StorageError
+
+DEFAULT_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+# What a batch writer may raise for rows it cannot store (the repository translates driver errors)
+WRITE_ERRORS = (StorageError,)
+
+# Column limits of food_log / exercise_log
+MAX_NAME_LENGTH = 100  # food_name / activity VARCHAR(100)
+MAX_INT = 2 ** 31 - 1  # quantity / duration INT
+
+# Same assumptions as add_exercise: 5 km/h walking pace, 0.21 kg CO2 saved per km
+WALKING_KM_PER_MIN = 5.0 / 60.0
+CO2_KG_PER_KM = 0.21
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl', '.json')):
+        return 'ndjson'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def iter_records(stream, fmt):
+    """
+    Yield (line_number, record_dict) from a binary or text stream without reading it all.
+    Malformed NDJSON lines are yielded as (line_number, ValueError).
+    """
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == 'ndjson':
+        for line_number, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f"invalid JSON: {e}")
+                continue
+            if not isinstance(record, dict):
+                yield line_number, ValueError("expected a JSON object")
+                continue
+            yield line_number, record
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _text(record, key):
+    value = record.get(key)
+    return str(value).strip() if value is not None else ''
+
+
+def parse_log_date(value, now):
+    if value is None or str(value).strip() == '':
+        return now
+    value = str(value).strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"invalid log_date {value!r}")
+    return parsed.replace(tzinfo=None)
+
+
+def prepare_food(record, user_id, log_date):
+    """Validate a food record and compute calories the same way add_food does."""
+    food_name = _text(record, 'food_name')
+    if not food_name:
+        raise ValueError("food_name is required")
+    if len(food_name) > MAX_NAME_LENGTH:
+        raise ValueError(f"food_name must be at most {MAX_NAME_LENGTH} characters")
+    try:
+        quantity = max(int(_text(record, 'quantity') or 1), 1)
+    except ValueError:
+        quantity = 1
+    if quantity > MAX_INT:
+        raise ValueError(f"quantity must be at most {MAX_INT}")
+
+    calories_per_unit = get_fruit_calories(food_name)
+    if calories_per_unit is not None:
+        calories = calories_per_unit * quantity
+    else:
+        try:
+            calories = float(_text(record, 'calories') or 0)
+        except ValueError:
+            calories = 0
+    return (user_id, food_name, quantity, calories, log_date)
+
+
+def prepare_exercise(record, user_id, log_date):
+    """Validate an exercise record; calories are computed per batch once profiles are known."""
+    activity = _text(record, 'activity')
+    if not activity:
+        raise ValueError("activity is required")
+    if len(activity) > MAX_NAME_LENGTH:
+        raise ValueError(f"activity must be at most {MAX_NAME_LENGTH} characters")
+    try:
+        duration = int(float(_text(record, 'duration') or 0))
+    except ValueError:
+        raise ValueError(f"invalid duration {record.get('duration')!r}")
+    if duration < 0:
+        raise ValueError("duration must not be negative")
+    if duration > MAX_INT:
+        raise ValueError(f"duration must be at most {MAX_INT}")
+    return (user_id, activity, duration, log_date)
+
+
+class ImportBatch:
+    def __init__(self):
+        self.food = []        # [(line, (user_id, food_name, quantity, calories, log_date))]
+        self.exercise = []    # [(line, (user_id, activity, duration, log_date))]
+
+    def __len__(self):
+        return len(self.food) + len(self.exercise)
+
+
+FOOD_INSERT_SQL = "INSERT INTO food_log (user_id, food_name, quantity, calories, log_date) VALUES (%s, %s, %s, %s, %s)"
+EXERCISE_INSERT_SQL = (
+    "INSERT INTO exercise_log (user_id, activity, duration, calories_burned, log_date) VALUES (%s, %s, %s, %s, %s)"
+)
+ENVIRONMENT_INSERT_SQL = (
+    "INSERT INTO environment_log (user_id, distance_walked, carbon_saved, log_date) VALUES (%s, %s, %s, %s)"
+)
+
+
+def insert_batch(cursor, food_rows, exercise_rows, profiles=None, upsert=upsert_daily_summaries):
+    """
+    Execute a batch on cursor without committing: food_log, exercise_log,
+    environment_log (walking only) and the daily_summary deltas via upsert(cursor, rows).
+    Returns those (user_id, day, totals_dict) rollup rows.
+    """
+    if profiles is None:
+        profiles = fetch_profiles(cursor, [row[0] for row in exercise_rows])
+
+    rollups = defaultdict(lambda: defaultdict(float))
+    for user_id, _, _, calories, log_date in food_rows:
+        totals = rollups[(user_id, log_date.date())]
+        totals['calories_in'] += calories or 0
+        totals['food_items'] += 1
+
+    exercise_params = []
+    environment_params = []
+    for user_id, activity, duration, log_date in exercise_rows:
+        weight_kg, height_cm, age = burn_inputs(profiles.get(user_id))
+        burned = calculate_calories_burned(
+            activity=activity,
+            duration_minutes=duration,
+            weight_kg=weight_kg,
+            height_cm=height_cm,
+            age=age
+        )
+        exercise_params.append((user_id, activity, duration, burned, log_date))
+        totals = rollups[(user_id, log_date.date())]
+        totals['calories_burned'] += burned
+        totals['minutes'] += duration
+        totals['sessions'] += 1
+        if activity.lower() == 'walking':
+            distance_km = duration * WALKING_KM_PER_MIN
+            carbon_saved_kg = distance_km * CO2_KG_PER_KM
+            environment_params.append((user_id, distance_km, carbon_saved_kg, log_date))
+            totals['distance'] += distance_km
+            totals['carbon_saved'] += carbon_saved_kg
+
+    if food_rows:
+        cursor.executemany(FOOD_INSERT_SQL, food_rows)
+    if exercise_params:
+        cursor.executemany(EXERCISE_INSERT_SQL, exercise_params)
+    if environment_params:
+        cursor.executemany(ENVIRONMENT_INSERT_SQL, environment_params)
+    rows = [
+        (user_id, day, {key: (int(value) if key in ('food_items', 'sessions', 'minutes') else value)
+                        for key, value in totals.items()})
+        for (user_id, day), totals in rollups.items()
+    ]
+    upsert(cursor, rows)
+    return rows
+
+
+class ImportReport:
+    def __init__(self):
+        self.started = time.time()
+        self.rows_read = 0
+        self.food_inserted = 0
+        self.exercise_inserted = 0
+        self.batches = 0
+        self.error_count = 0
+        self.errors = []
+        self.user_ids = set()
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'error': message})
+
+    def as_dict(self):
+        seconds = max(time.time() - self.started, 1e-9)
+        inserted = self.food_inserted + self.exercise_inserted
+        return {
+            'rows_read': self.rows_read,
+            'food_inserted': self.food_inserted,
+            'exercise_inserted': self.exercise_inserted,
+            'batches': self.batches,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'errors_truncated': self.error_count > len(self.errors),
+            'seconds': round(seconds, 3),
+            'rows_per_second': int(inserted / seconds),
+        }
+
+
+def _flush(writer, batch, report):
+    if not len(batch):
+        return
+    report.batches += 1
+    try:
+        report.user_ids |= writer([row for _, row in batch.food], [row for _, row in batch.exercise])
+        report.food_inserted += len(batch.food)
+        report.exercise_inserted += len(batch.exercise)
+    except WRITE_ERRORS:
+        # Isolate the offending rows (e.g. unknown user_id) so the rest of the batch still lands
+        for line, row in batch.food:
+            try:
+                report.user_ids |= writer([row], [])
+                report.food_inserted += 1
+            except WRITE_ERRORS as e:
+                report.error(line, str(e))
+        for line, row in batch.exercise:
+            try:
+                report.user_ids |= writer([], [row])
+                report.exercise_inserted += 1
+            except WRITE_ERRORS as e:
+                report.error(line, str(e))
+    batch.food.clear()
+    batch.exercise.clear()
+
+
+def import_stream(writer, stream, fmt='csv', user_id=None, default_type=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Import a CSV/NDJSON stream. writer(food_rows, exercise_rows) writes one batch and
+    returns the affected user_ids (Repository.write_batch). user_id, when given, is
+    used for every record and a record naming a different user is rejected.
+    Returns an ImportReport.
+    """
+    report = ImportReport()
+    batch = ImportBatch()
+    now = datetime.now()
+
+    for line, record in iter_records(stream, fmt):
+        report.rows_read += 1
+        if isinstance(record, Exception):
+            report.error(line, str(record))
+            continue
+        try:
+            kind = (_text(record, 'type') or default_type or '').lower()
+            record_user = _text(record, 'user_id')
+            if user_id is not None:
+                if record_user and record_user != str(user_id):
+                    raise ValueError(f"user_id {record_user} does not match the importing user")
+                row_user = user_id
+            elif record_user:
+                row_user = int(record_user)
+            else:
+                raise ValueError("user_id is required")
+
+            log_date = parse_log_date(record.get('log_date'), now)
+            if kind == 'food':
+                batch.food.append((line, prepare_food(record, row_user, log_date)))
+            elif kind == 'exercise':
+                batch.exercise.append((line, prepare_exercise(record, row_user, log_date)))
+            else:
+                raise ValueError(f"unknown type {kind!r} (expected food or exercise)")
+        except ValueError as e:
+            report.error(line, str(e))
+            continue
+
+        if len(batch) >= batch_size:
+            _flush(writer, batch, report)
+
+    _flush(writer, batch, report)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import food/exercise logs from CSV or NDJSON")
+    parser.add_argument('path', help="file to import")
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help="defaults to the file extension")
+    parser.add_argument('--user-id', type=int, help="import every record for this user")
+    parser.add_argument('--type', choices=['food', 'exercise'], help="record type when the file has no type column")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="rows per transaction")
+    args = parser.parse_args()
+
+    with open(args.path, 'rb') as f:
+        result = import_stream(get_repository().write_batch, f, fmt=args.format or detect_format(args.path),
+                               user_id=args.user_id, default_type=args.type, batch_size=args.batch_size).as_dict()
+    print(f"Read {result['rows_read']} row(s): {result['food_inserted']} food, "
+          f"{result['exercise_inserted']} exercise inserted in {result['batches']} batch(es)")
+    print(f"{result['seconds']}s, {result['rows_per_second']} rows/s, {result['error_count']} error(s)")
+    for error in result['errors'][:50]:
+        print(f"  line {error['line']}: {error['error']}")
@@ -0,0 +1,273 @@
+"""
+In-process caches with an optional shared Redis backend.
+- LRUCache: thread-safe LRU with a per-entry TTL, used per worker process
+- RedisCache: shared across workers; only used when CACHE_REDIS_URL is set
+- TieredCache: checks the local LRU first, then the shared backend
+
+dashboard_cache holds each user's computed dashboard view-model. Entries are
+stamped with the day they were built for, so they roll over at midnight, and with
+the user's versions (versions.py) when they were read, so a write made through any
+worker process retires them in all of them. add_food / add_exercise also drop the
+entry of the worker that served the write.
+
+profile_cache holds each user's profile row (name, age, height, weight) for the
+dashboard and for the calories of log writes, stamped with the user's
+profile_version when it was read.
+"""
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+
+from config import cache_config
+
+try:
+    import redis
+except ImportError:  # optional dependency
+    redis = None
+
+_MISSING = object()
+
+
+class LRUCache:
+    def __init__(self, name, maxsize=1024, ttl=300):
+        self.name = name
+        self.maxsize = max(int(maxsize), 1)
+        self.ttl = float(ttl)
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self._counters['misses'] += 1
+                return default
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                self._counters['expirations'] += 1
+                self._counters['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._counters['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def delete(self, key):
+        with self._lock:
+            if self._data.pop(key, _MISSING) is not _MISSING:
+                self._counters['invalidations'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._data)
+        stats['maxsize'] = self.maxsize
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+class RedisCache:
+    """Shared cache on Redis (or any Redis-protocol server); errors count as misses."""
+
+    def __init__(self, name, url, ttl=300):
+        if redis is None:
+            raise RuntimeError("CACHE_REDIS_URL is set but the 'redis' package is not installed")
+        self.name = name
+        self.ttl = int(ttl)
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'errors': 0, 'invalidations': 0}
+
+    def _key(self, key):
+        return f"fitness:{self.name}:{key}"
+
+    def _count(self, counter):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def get(self, key, default=None):
+        try:
+            raw = self._client.get(self._key(key))
+        except redis.RedisError:
+            self._count('errors')
+            raw = None
+        if raw is None:
+            self._count('misses')
+            return default
+        self._count('hits')
+        return pickle.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        try:
+            self._client.set(self._key(key), pickle.dumps(value), ex=max(int(self.ttl if ttl is None else ttl), 1))
+        except redis.RedisError:
+            self._count('errors')
+
+    def delete(self, key):
+        try:
+            self._client.delete(self._key(key))
+            self._count('invalidations')
+        except redis.RedisError:
+            self._count('errors')
+
+    def clear(self):
+        try:
+            for key in self._client.scan_iter(self._key('*')):
+                self._client.delete(key)
+        except redis.RedisError:
+            self._count('errors')
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
+
+
+class TieredCache:
+    """
+    Local LRU in front of a shared backend.
+    Invalidations go to both tiers; other workers' local copies expire within the local TTL.
+    """
+
+    def __init__(self, local, shared=None):
+        self.local = local
+        self.shared = shared
+
+    def get(self, key, default=None):
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.shared is not None:
+            value = self.shared.get(key, _MISSING)
+            if value is not _MISSING:
+                self.local.set(key, value)
+                return value
+        return default
+
+    def set(self, key, value, ttl=None):
+        self.local.set(key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(key, value, ttl)
+
+    def delete(self, key):
+        self.local.delete(key)
+        if self.shared is not None:
+            self.shared.delete(key)
+
+    def clear(self):
+        self.local.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        stats = {'local': self.local.stats()}
+        if self.shared is not None:
+            stats['shared'] = self.shared.stats()
+        return stats
+
+
+def build_cache(name, maxsize, ttl, local_ttl=None):
+    """LRU cache, fronting Redis when cache_config['redis_url'] is set."""
+    local = LRUCache(name, maxsize=maxsize, ttl=ttl if local_ttl is None else local_ttl)
+    shared = RedisCache(name, cache_config['redis_url'], ttl=ttl) if cache_config['redis_url'] else None
+    return TieredCache(local, shared)
+
+
+class DashboardCache:
+    """Per-user dashboard view-models, valid for the day and the user versions they were computed on."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get(self, user_id, versions, today_date=None):
+        today_date = today_date or date.today()
+        entry = self.cache.get(user_id)
+        if entry is None:
+            return None
+        built_for, built_from, view = entry
+        if built_for != today_date or built_from != versions:
+            # Built before midnight ("today" and the 7-day window have moved on), or before a write
+            self.cache.delete(user_id)
+            return None
+        return view
+
+    def set(self, user_id, view, versions, today_date=None):
+        """versions must have been read before the data the view was built from."""
+        self.cache.set(user_id, (today_date or date.today(), tuple(versions), view))
+
+    def invalidate(self, user_id):
+        self.cache.delete(user_id)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+dashboard_cache = DashboardCache(build_cache(
+    'dashboard',
+    maxsize=cache_config['dashboard_size'],
+    ttl=cache_config['dashboard_ttl'],
+    # Keep local copies short-lived when shared so other workers see invalidations quickly
+    local_ttl=min(cache_config['dashboard_ttl'], 5) if cache_config['redis_url'] else None,
+))
+
+
+class ProfileCache:
+    """Per-user profile rows; misses are loaded together with one query by the caller's loader."""
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def get_many(self, user_ids, loader, versions):
+        """
+        {user_id: profile} for the given users. versions is {user_id: profile_version},
+        read before calling; entries cached at another version count as misses.
+        loader(missing_ids) must return {user_id: profile} for the ids it found;
+        unknown users are left out and not cached.
+        """
+        profiles = {}
+        missing = []
+        for user_id in set(user_ids):
+            entry = self.cache.get(user_id)
+            if entry is None or entry[0] != versions.get(user_id, 0):
+                missing.append(user_id)
+            else:
+                profiles[user_id] = entry[1]
+        if missing:
+            loaded = loader(sorted(missing))
+            for user_id, profile in loaded.items():
+                # Read after the version, so the row is at least that new
+                self.cache.set(user_id, (versions.get(user_id, 0), profile))
+            profiles.update(loaded)
+        return profiles
+
+    def invalidate(self, user_id):
+        self.cache.delete(user_id)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+profile_cache = ProfileCache(build_cache(
+    'profile',
+    maxsize=cache_config['profile_size'],
+    ttl=cache_config['profile_ttl'],
+    local_ttl=min(cache_config['profile_ttl'], 5) if cache_config['redis_url'] else None,
+))
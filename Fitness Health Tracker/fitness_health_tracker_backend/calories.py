@@ -0,0 +1,251 @@
+"""
+Calorie lookup tables and calculations used by the log endpoints and batch jobs.
+Food names are resolved with an Aho-Corasick automaton compiled once at import,
+which finds the longest known fruit name in a single pass over the input; exercise
+names go through the same kind of index to pick the most specific MET value.
+"""
+
+import re
+from collections import deque
+from functools import lru_cache
+
+# Fruit calories per 100g (scientific values from USDA)
+FRUIT_CALORIES = {
+    'apple': 52, 'apples': 52,
+    'banana': 89, 'bananas': 89,
+    'orange': 47, 'oranges': 47,
+    'mango': 60, 'mangos': 60, 'mangoes': 60,
+    'grapes': 69, 'grape': 69,
+    'watermelon': 30, 'watermelons': 30,
+    'strawberry': 32, 'strawberries': 32,
+    'blueberry': 57, 'blueberries': 57,
+    'pineapple': 50, 'pineapples': 50,
+    'papaya': 43, 'papayas': 43,
+    'kiwi': 61, 'kiwis': 61, 'kiwi fruit': 61,
+    'pear': 57, 'pears': 57,
+    'peach': 39, 'peaches': 39,
+    'plum': 46, 'plums': 46,
+    'cherry': 50, 'cherries': 50,
+    'avocado': 160, 'avocados': 160,
+    'guava': 68, 'guavas': 68,
+    'pomegranate': 83, 'pomegranates': 83,
+    'dragon fruit': 60, 'dragonfruit': 60,
+    'lychee': 66, 'lychees': 66,
+    'coconut': 354, 'coconuts': 354,
+    'cranberry': 46, 'cranberries': 46,
+    'raspberry': 52, 'raspberries': 52,
+    'blackberry': 43, 'blackberries': 43,
+    'lemon': 29, 'lemons': 29,
+    'lime': 30, 'limes': 30,
+    'grapefruit': 42, 'grapefruits': 42,
+    'apricot': 48, 'apricots': 48,
+    'fig': 74, 'figs': 74,
+    'date': 282, 'dates': 282,
+}
+
+# Standard portion (g) used when a fruit is named inside a longer description ("2 apples", "banana smoothie").
+# Fruits not listed here use the caller's portion_weight_g.
+FRUIT_PORTIONS_G = {
+    'apple': 150, 'apples': 150,            # Medium fruit ~150g
+    'orange': 150, 'oranges': 150,
+    'pear': 150, 'pears': 150,
+    'banana': 120, 'bananas': 120,          # Medium banana ~120g
+    'avocado': 150, 'avocados': 150,        # Medium avocado ~150g
+    'strawberry': 100, 'strawberries': 100,  # Cup of berries ~100g
+    'blueberry': 100, 'blueberries': 100,
+    'raspberry': 100, 'raspberries': 100,
+    'blackberry': 100, 'blackberries': 100,
+}
+
+
+class KeywordMatcher:
+    """
+    Aho-Corasick automaton over a fixed keyword -> value table.
+    longest() returns the longest keyword occurring anywhere in the text (earliest on ties).
+    """
+
+    def __init__(self, table):
+        self._goto = [{}]
+        self._fail = [0]
+        self._best = [None]  # longest (keyword, value) ending at this state, following fail links
+
+        for keyword, value in table.items():
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._best.append(None)
+                state = next_state
+            self._best[state] = (keyword, value)
+
+        # Breadth-first pass to set failure links; a state's best match is its own
+        # keyword or, failing that, the best match of its failure state.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                if self._best[next_state] is None:
+                    self._best[next_state] = self._best[self._fail[next_state]]
+                queue.append(next_state)
+
+    def longest(self, text):
+        """Return (keyword, value) for the longest match in text, or None."""
+        goto, fail, best_at = self._goto, self._fail, self._best
+        state = 0
+        best = None
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match = best_at[state]
+            if match is not None and (best is None or len(match[0]) > len(best[0])):
+                best = match
+        return best
+
+
+# (calories per 100g, standard portion in g or None) per fruit name
+_FRUIT_MATCHER = KeywordMatcher({
+    fruit: (calories_per_100g, FRUIT_PORTIONS_G.get(fruit))
+    for fruit, calories_per_100g in FRUIT_CALORIES.items()
+})
+
+
+def get_fruit_calories(food_name, portion_weight_g=100):
+    """
+    Get calories for fruit based on name.
+    Returns calories per portion_weight_g (default 100g).
+    For average serving sizes, we'll use standard portions:
+    - Apple/Orange: ~150g
+    - Banana: ~120g
+    - Small fruits (berries): ~100g
+    """
+    food_lower = food_name.lower().strip()
+
+    # Check exact match first
+    if food_lower in FRUIT_CALORIES:
+        calories_per_100g = FRUIT_CALORIES[food_lower]
+        return round(calories_per_100g * (portion_weight_g / 100), 1)
+
+    # Longest fruit name contained in the string ("pineapple juice" -> pineapple, not apple)
+    match = _FRUIT_MATCHER.longest(food_lower)
+    if match is None:
+        return None  # Not a known fruit
+
+    _, (calories_per_100g, standard_portion) = match
+    portion = standard_portion or portion_weight_g
+    return round(calories_per_100g * (portion / 100), 1)
+
+
+# MET (Metabolic Equivalent of Task) values for exercises
+# MET value * weight(kg) * duration(hours) = calories burned
+EXERCISE_MET_VALUES = {
+    'walking': 3.5,  # Walking at moderate pace
+    'walking slow': 2.0,
+    'walking fast': 5.0,
+    'running': 11.0,  # Running at 8 km/h
+    'running slow': 8.0,  # Jogging
+    'running fast': 13.0,  # Running at 10+ km/h
+    'swimming': 8.0,  # Swimming general
+    'swimming slow': 6.0,
+    'swimming fast': 10.0,
+    'cycling': 8.0,  # Cycling moderate effort
+    'cycling slow': 4.0,
+    'cycling fast': 10.0,
+    'jogging': 7.0,
+    'jumping rope': 12.0,
+    'dancing': 6.0,
+    'yoga': 3.0,
+    'weight lifting': 6.0,
+    'aerobics': 7.0,
+    'tennis': 7.0,
+    'basketball': 8.0,
+    'soccer': 7.0,
+    'hiking': 6.0,
+    'climbing': 8.0,
+}
+
+_TOKEN = re.compile(r'[a-z]+')
+
+# Intensity words that select a "<activity> <modifier>" entry of EXERCISE_MET_VALUES
+MET_MODIFIERS = ('slow', 'fast')
+DEFAULT_MET = 5.0  # Moderate activity default
+
+# Activities without their modifier ("walking", "jumping rope"), matched longest-first
+_ACTIVITY_MATCHER = KeywordMatcher({
+    key: key for key in EXERCISE_MET_VALUES if key.split()[-1] not in MET_MODIFIERS
+})
+
+
+@lru_cache(maxsize=4096)
+def resolve_met(activity):
+    """
+    Resolve a free-text activity to (table key, MET value).
+    The longest known activity wins, and a slow/fast token anywhere in the text picks
+    the matching variant: "fast walking" and "walking fast" both resolve to 'walking fast'.
+    Unknown activities return (None, DEFAULT_MET). Memoized for repeated activity strings.
+    """
+    tokens = _TOKEN.findall((activity or '').lower())
+    match = _ACTIVITY_MATCHER.longest(' '.join(tokens))
+    if match is None:
+        return None, DEFAULT_MET
+
+    base = match[0]
+    for modifier in MET_MODIFIERS:
+        if modifier in tokens and f"{base} {modifier}" in EXERCISE_MET_VALUES:
+            key = f"{base} {modifier}"
+            return key, EXERCISE_MET_VALUES[key]
+    return base, EXERCISE_MET_VALUES[base]
+
+
+def calculate_calories_burned(activity, duration_minutes, weight_kg, height_cm=None, age=None, gender=None):
+    """
+    Calculate calories burned during exercise using MET values.
+    Formula: MET * weight(kg) * time(hours) = calories burned
+    
+    For more accuracy with BMR adjustment (optional):
+    - Uses Harris-Benedict or Mifflin-St Jeor equation
+    - But MET values are simpler and widely used
+    
+    Args:
+        activity: Exercise type (e.g., 'walking', 'running')
+        duration_minutes: Exercise duration in minutes
+        weight_kg: User's weight in kg
+        height_cm: User's height in cm (optional, for BMR adjustment)
+        age: User's age (optional, for BMR adjustment)
+        gender: 'male' or 'female' (optional, for BMR adjustment)
+    
+    Returns:
+        Calories burned (float)
+    """
+    # Most specific MET for the activity ("walking fast" -> 5.0), moderate default if unknown
+    met_value = resolve_met(activity)[1]
+
+    # Convert duration to hours
+    duration_hours = duration_minutes / 60.0
+    
+    # Basic calculation: MET * weight * time
+    calories = met_value * weight_kg * duration_hours
+    
+    # Optional: Adjust based on height and age for more accuracy
+    # This is a simplified adjustment factor
+    if height_cm and age:
+        # BMI factor adjustment (optional refinement)
+        height_m = height_cm / 100.0
+        bmi = weight_kg / (height_m ** 2)
+        
+        # Slight adjustment: heavier people burn slightly more per MET unit
+        # This is a simplified approximation
+        if bmi > 25:
+            calories *= 1.05  # Slight increase for higher BMI
+        elif bmi < 18.5:
+            calories *= 0.95  # Slight decrease for lower BMI
+    
+    return round(calories, 1)
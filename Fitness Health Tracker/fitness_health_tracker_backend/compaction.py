@@ -0,0 +1,384 @@
+"""
+Compaction of closed days from daily_summary into weekly_summary and monthly_summary.
+
+Each run:
+1. Recomputes the periods whose already-compacted days changed since the last run
+   without going through write_batch (rollup rebuilds, direct SQL). These are found
+   through daily_summary.updated_at. write_batch itself rewrites the periods of the
+   back-dated days it writes (refresh_periods), in the same transaction.
+2. Adds the days after the high-water mark (rollup_compaction.compacted_through),
+   up to yesterday, to their week and month rows. It works one window of days per
+   transaction and moves the mark forward with each window.
+
+Compacted days are not read again unless they change, so a run costs O(new days +
+changed days). Week/month summaries then read one row per compacted period (see
+summary.py).
+
+Run it from cron (python compaction.py run) or inside the app
+(COMPACTION_SCHEDULER=1). A lease on the rollup_compaction row keeps several
+workers, or cron plus the app, from compacting at the same time.
+
+Usage:
+    python compaction.py run
+    python compaction.py rebuild     # empty the period tables and compact all history again
+    python compaction.py status
+"""
+
+import argparse
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from config import compaction_config
+from rollups import SUMMARY_COLUMNS
+from storage import StorageError, get_repository
+from summary import PERIOD_TABLES
+from timeranges import as_date, as_datetime, next_period_start, period_start
+
+JOB_NAME = 'periods'
+PERIOD_COLUMNS = SUMMARY_COLUMNS + ('days_logged', 'days_active')
+DAILY_SELECT = f"SELECT user_id, date, {', '.join(SUMMARY_COLUMNS)} FROM daily_summary"
+RECOMPUTE_CHUNK = 500  # users per recompute statement
+COMPACTED_THROUGH_SQL = "SELECT compacted_through FROM rollup_compaction WHERE name = %s"
+
+logger = logging.getLogger('fitness.compaction')
+
+
+class CompactionBusy(Exception):
+    """Another runner holds the compaction lease."""
+
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def fetch_state(cursor):
+    """The job's rollup_compaction row as a dict (dictionary cursor)."""
+    cursor.execute("""
+        SELECT compacted_through, changes_since, locked_by, locked_until, last_run_at, last_run_seconds
+        FROM rollup_compaction WHERE name = %s
+    """, (JOB_NAME,))
+    row = cursor.fetchone() or {}
+    return {
+        'compacted_through': as_date(row.get('compacted_through')),
+        'changes_since': as_datetime(row.get('changes_since')),
+        'locked_by': row.get('locked_by'),
+        'locked_until': as_datetime(row.get('locked_until')),
+        'last_run_at': as_datetime(row.get('last_run_at')),
+        'last_run_seconds': row.get('last_run_seconds'),
+    }
+
+
+def fetch_compacted_through(cursor):
+    """High-water mark read by the summary queries (one primary-key lookup)."""
+    cursor.execute(COMPACTED_THROUGH_SQL, (JOB_NAME,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return as_date(row['compacted_through'] if isinstance(row, dict) else row[0])
+
+
+def acquire_lease(repo, owner, seconds):
+    now = datetime.now()
+    with repo.cursor(commit=True) as cursor:
+        cursor.execute("""
+            UPDATE rollup_compaction SET locked_by = %s, locked_until = %s
+            WHERE name = %s AND (locked_until IS NULL OR locked_until < %s OR locked_by = %s)
+        """, (owner, now + timedelta(seconds=seconds), JOB_NAME, now, owner))
+        return cursor.rowcount == 1
+
+
+def renew_lease(repo, owner, seconds):
+    with repo.cursor(commit=True) as cursor:
+        cursor.execute(
+            "UPDATE rollup_compaction SET locked_until = %s WHERE name = %s AND locked_by = %s",
+            (datetime.now() + timedelta(seconds=seconds), JOB_NAME, owner)
+        )
+
+
+def release_lease(repo, owner):
+    with repo.cursor(commit=True) as cursor:
+        cursor.execute(
+            "UPDATE rollup_compaction SET locked_by = NULL, locked_until = NULL WHERE name = %s AND locked_by = %s",
+            (JOB_NAME, owner)
+        )
+
+
+def aggregate_periods(rows, granularities=tuple(PERIOD_TABLES)):
+    """
+    daily_summary rows (user_id, date, *SUMMARY_COLUMNS) ->
+    {granularity: {(user_id, period_start): {column: total}}}.
+    """
+    periods = {granularity: {} for granularity in granularities}
+    for row in rows:
+        user_id, day = row[0], as_date(row[1])
+        values = {column: value or 0 for column, value in zip(SUMMARY_COLUMNS, row[2:])}
+        # Same definitions as the dashboard's days logged / days active
+        values['days_logged'] = 1 if values['total_calories_consumed'] > 0 or values['total_calories_burned'] > 0 else 0
+        values['days_active'] = 1 if values['exercise_minutes'] > 0 else 0
+        for granularity in granularities:
+            totals = periods[granularity].setdefault(
+                (user_id, period_start(day, granularity)), dict.fromkeys(PERIOD_COLUMNS, 0)
+            )
+            for column in PERIOD_COLUMNS:
+                totals[column] += values[column]
+    return periods
+
+
+def write_periods(repo, cursor, periods, additive):
+    """Upsert aggregated periods: add to the stored totals, or replace them."""
+    for granularity, totals in periods.items():
+        if not totals:
+            continue
+        sql = (
+            f"INSERT INTO {PERIOD_TABLES[granularity]} (user_id, period_start, {', '.join(PERIOD_COLUMNS)}) "
+            f"VALUES (%s, %s, {', '.join(['%s'] * len(PERIOD_COLUMNS))}) "
+            + repo.upsert_clause(('user_id', 'period_start'), PERIOD_COLUMNS, additive=additive)
+        )
+        # Key order keeps concurrent writers from deadlocking on the unique index
+        cursor.executemany(sql, [
+            (user_id, start) + tuple(values[column] for column in PERIOD_COLUMNS)
+            for (user_id, start), values in sorted(totals.items())
+        ])
+
+
+def period_batches(user_days, compacted_through):
+    """
+    (granularity, start, end, user_ids) for every period containing one of the
+    compacted (user_id, day) pairs; end stops at compacted_through.
+    """
+    user_days = [(user_id, as_date(day)) for user_id, day in user_days]
+    user_days = [(user_id, day) for user_id, day in user_days if day <= compacted_through]
+    for granularity in PERIOD_TABLES:
+        users_by_period = defaultdict(set)
+        for user_id, day in user_days:
+            users_by_period[period_start(day, granularity)].add(user_id)
+        for start, user_ids in sorted(users_by_period.items()):
+            end = min(next_period_start(start, granularity), compacted_through + timedelta(days=1))
+            user_ids = sorted(user_ids)
+            for offset in range(0, len(user_ids), RECOMPUTE_CHUNK):
+                yield granularity, start, end, user_ids[offset:offset + RECOMPUTE_CHUNK]
+
+
+def rewrite_period(repo, cursor, granularity, start, end, user_ids):
+    """Replace the users' period rows with the sum of their daily rows in [start, end); no commit."""
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    cursor.execute(
+        f"{DAILY_SELECT} WHERE user_id IN ({placeholders}) AND date >= %s AND date < %s",
+        list(user_ids) + [start, end]
+    )
+    periods = aggregate_periods(cursor.fetchall(), (granularity,))
+    write_periods(repo, cursor, periods, additive=False)
+    return len(periods[granularity])
+
+
+def refresh_periods(repo, cursor, user_days):
+    """
+    Bring the period rows of already-compacted (user_id, day) pairs up to date on
+    cursor, without committing: write_batch calls it so back-dated writes show up
+    in week/month summaries right away. Returns the number of (user, period) rows.
+    """
+    compacted_through = fetch_compacted_through(cursor)
+    if compacted_through is None:
+        return 0
+    return sum(rewrite_period(repo, cursor, *batch) for batch in period_batches(user_days, compacted_through))
+
+
+def recompute_changed(repo, compacted_through, since):
+    """
+    Rebuild the period rows whose compacted days were written after since, from
+    daily_summary up to compacted_through. Returns the number of (user, period) rows.
+    Catches the writes that bypass write_batch (rollups.py rebuild, direct SQL).
+    """
+    with repo.cursor(dictionary=False) as cursor:
+        # updated_at is the only predicate so both engines range-scan idx_daily_summary_updated
+        cursor.execute("SELECT user_id, date FROM daily_summary WHERE updated_at > %s", (since,))
+        touched = cursor.fetchall()
+
+    recomputed = 0
+    for batch in period_batches(touched, compacted_through):
+        with repo.cursor(dictionary=False, commit=True) as cursor:
+            recomputed += rewrite_period(repo, cursor, *batch)
+    return recomputed
+
+
+def compact(repo, today=None, window_days=None, lag_seconds=None, lease_seconds=None, owner=None):
+    """
+    One compaction run up to yesterday. Returns a stats dict; raises CompactionBusy
+    when another runner holds the lease.
+    """
+    window_days = window_days or compaction_config['window_days']
+    lag_seconds = compaction_config['lag_seconds'] if lag_seconds is None else lag_seconds
+    lease_seconds = lease_seconds or compaction_config['lease_seconds']
+    owner = owner or default_owner()
+    if not acquire_lease(repo, owner, lease_seconds):
+        raise CompactionBusy("another compaction run holds the lease")
+
+    started = time.time()
+    stats = {'recomputed_periods': 0, 'days': 0, 'daily_rows': 0, 'windows': 0}
+    try:
+        through = (today or date.today()) - timedelta(days=1)
+        with repo.cursor() as cursor:
+            state = fetch_state(cursor)
+            # Taken before reading anything, so writes racing this run are seen by the next one
+            cursor.execute("SELECT MAX(updated_at) AS mark FROM daily_summary")
+            mark = as_datetime(cursor.fetchone()['mark'])
+            start = None
+            if state['compacted_through'] is None:
+                cursor.execute("SELECT MIN(date) AS first_day FROM daily_summary")
+                start = as_date(cursor.fetchone()['first_day'])
+
+        compacted_through = state['compacted_through']
+        if compacted_through is not None:
+            start = compacted_through + timedelta(days=1)
+            if state['changes_since'] is not None and mark is not None and mark > state['changes_since']:
+                # Something was written since the last run. lag covers transactions that
+                # stamped updated_at before the last mark but committed after it.
+                since = state['changes_since'] - timedelta(seconds=lag_seconds)
+                stats['recomputed_periods'] = recompute_changed(repo, compacted_through, since)
+
+        while start is not None and start <= through:
+            end = min(start + timedelta(days=window_days - 1), through)
+            with repo.cursor(dictionary=False, commit=True) as cursor:
+                cursor.execute(f"{DAILY_SELECT} WHERE date >= %s AND date <= %s", (start, end))
+                rows = cursor.fetchall()
+                write_periods(repo, cursor, aggregate_periods(rows), additive=True)
+                cursor.execute(
+                    "UPDATE rollup_compaction SET compacted_through = %s WHERE name = %s", (end, JOB_NAME)
+                )
+            renew_lease(repo, owner, lease_seconds)
+            stats['days'] += (end - start).days + 1
+            stats['daily_rows'] += len(rows)
+            stats['windows'] += 1
+            compacted_through = end
+            start = end + timedelta(days=1)
+
+        stats['compacted_through'] = compacted_through.isoformat() if compacted_through else None
+        stats['seconds'] = round(time.time() - started, 3)
+        with repo.cursor(commit=True) as cursor:
+            cursor.execute(
+                "UPDATE rollup_compaction SET changes_since = %s, last_run_at = %s, last_run_seconds = %s "
+                "WHERE name = %s",
+                (mark or state['changes_since'], datetime.now(), stats['seconds'], JOB_NAME)
+            )
+    finally:
+        release_lease(repo, owner)
+    return stats
+
+
+def rebuild(repo, **options):
+    """Empty the period tables and the high-water mark, then compact all history."""
+    owner = options.pop('owner', None) or default_owner()
+    if not acquire_lease(repo, owner, options.get('lease_seconds') or compaction_config['lease_seconds']):
+        raise CompactionBusy("another compaction run holds the lease")
+    try:
+        with repo.cursor(commit=True) as cursor:
+            for table in PERIOD_TABLES.values():
+                cursor.execute(f"DELETE FROM {table}")
+            # Summaries read daily rows only until the run below moves the mark again
+            cursor.execute(
+                "UPDATE rollup_compaction SET compacted_through = NULL, changes_since = NULL WHERE name = %s",
+                (JOB_NAME,)
+            )
+    finally:
+        release_lease(repo, owner)
+    return compact(repo, owner=owner, **options)
+
+
+class CompactionScheduler:
+    """In-process runner: one compaction every interval seconds on a daemon thread."""
+
+    def __init__(self, repo, interval=3600):
+        self.repo = repo
+        self.interval = interval
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='rollup-compaction', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run_once(self):
+        try:
+            self.last_result = compact(self.repo)
+            self.last_error = None
+        except CompactionBusy:
+            pass  # another worker is on it
+        except StorageError as e:
+            self.last_error = str(e)
+            logger.warning("rollup compaction failed: %s", e)
+
+    def _run(self):
+        # Spread workers that start together so they do not all race for the lease
+        delay = random.uniform(1, min(self.interval, 60))
+        while not self._stop.wait(delay):
+            self.run_once()
+            delay = self.interval
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def get_compaction_scheduler():
+    """Process-wide scheduler (started on first use, recreated after a fork), or None when disabled."""
+    global _scheduler, _scheduler_pid
+    if not compaction_config['scheduler']:
+        return None
+    pid = os.getpid()
+    if _scheduler is None or _scheduler_pid != pid:
+        with _scheduler_lock:
+            if _scheduler is None or _scheduler_pid != pid:
+                _scheduler = CompactionScheduler(get_repository(), interval=compaction_config['interval'])
+                _scheduler.start()
+                _scheduler_pid = pid
+    return _scheduler
+
+
+def compaction_status(repo):
+    with repo.cursor() as cursor:
+        status = fetch_state(cursor)
+        for granularity, table in PERIOD_TABLES.items():
+            cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+            status[f'{granularity}_rows'] = cursor.fetchone()['n']
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact daily rollups into weekly and monthly rollups")
+    sub = parser.add_subparsers(dest='command', required=True)
+    for name, help_text in (('run', "compact closed days after the high-water mark"),
+                            ('rebuild', "empty the weekly/monthly tables and compact everything again")):
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument('--window-days', type=int, help="days per transaction")
+    sub.add_parser('status', help="show the high-water mark and last run")
+    args = parser.parse_args()
+
+    repo = get_repository()
+    try:
+        if args.command == 'status':
+            for key, value in compaction_status(repo).items():
+                print(f"{key}: {value}")
+        else:
+            job = rebuild if args.command == 'rebuild' else compact
+            result = job(repo, window_days=args.window_days)
+            print(f"Compacted {result['days']} day(s) ({result['daily_rows']} daily row(s)) in "
+                  f"{result['windows']} window(s), recomputed {result['recomputed_periods']} changed period(s)")
+            print(f"High-water mark {result['compacted_through']}, {result['seconds']}s")
+    except CompactionBusy as e:
+        print(f"Skipped: {e}")
+    except StorageError as e:
+        print(f"Error: {e}")
@@ -7,3 +7,115 @@ db_config = {
     'password': os.environ.get('DB_PASSWORD', '123456'),
     'database': os.environ.get('DB_NAME', 'fitness_tracker_db'),
 }
+
+# Connection pool used by the MySQL storage engine (db_pool.py)
+pool_config = {
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', '5')),
+    'max_overflow': int(os.environ.get('DB_POOL_MAX_OVERFLOW', '10')),
+    'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '5')),  # seconds to wait for a free connection
+    'pre_ping': os.environ.get('DB_POOL_PRE_PING', '1') == '1',  # health-check on borrow
+    'recycle': int(os.environ.get('DB_POOL_RECYCLE', '3600')),  # seconds, 0 = never
+}
+
+# Caches (cache.py). Set CACHE_REDIS_URL (e.g. redis://localhost:6379/0) to share entries between workers.
+cache_config = {
+    'redis_url': os.environ.get('CACHE_REDIS_URL', ''),
+    'dashboard_size': int(os.environ.get('DASHBOARD_CACHE_SIZE', '2048')),  # users per worker
+    'dashboard_ttl': int(os.environ.get('DASHBOARD_CACHE_TTL', '60')),  # seconds
+    'profile_size': int(os.environ.get('PROFILE_CACHE_SIZE', '10000')),  # users per worker
+    'profile_ttl': int(os.environ.get('PROFILE_CACHE_TTL', '600')),  # seconds
+}
+
+# Users allowed to use admin-only endpoints (e.g. the all-users export), comma separated ids
+admin_config = {
+    'user_ids': {int(uid) for uid in os.environ.get('ADMIN_USER_IDS', '').split(',') if uid.strip().isdigit()},
+}
+
+# /entries and /api/entries keyset pagination
+entries_config = {
+    'page_size': int(os.environ.get('ENTRIES_PAGE_SIZE', '50')),
+    'max_page_size': int(os.environ.get('ENTRIES_MAX_PAGE_SIZE', '500')),
+}
+
+# Write-behind mode for /add_food and /add_exercise (write_queue.py); off by default
+write_behind_config = {
+    'enabled': os.environ.get('WRITE_BEHIND', '0') == '1',
+    'queue_size': int(os.environ.get('WRITE_BEHIND_QUEUE_SIZE', '10000')),
+    'batch_size': int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', '500')),
+    'flush_interval': float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', '0.5')),  # seconds
+    'spill_path': os.environ.get('WRITE_BEHIND_SPILL_PATH', 'write_queue.spill'),  # .<pid> is appended
+    'max_spill_bytes': int(os.environ.get('WRITE_BEHIND_MAX_SPILL_MB', '256')) * 1024 * 1024,
+    'dead_letter_path': os.environ.get('WRITE_BEHIND_DEAD_LETTER_PATH', 'write_queue.dead'),  # rows never written
+}
+
+# Request / query timing (metrics.py): Server-Timing header and Prometheus /metrics
+metrics_config = {
+    'enabled': os.environ.get('METRICS_ENABLED', '1') == '1',
+    'server_timing': os.environ.get('SERVER_TIMING', '1') == '1',
+    # /metrics answers admins and scrapers sending "Authorization: Bearer <METRICS_TOKEN>"
+    'token': os.environ.get('METRICS_TOKEN', ''),
+}
+
+# Opt-in slow-query log with EXPLAIN capture (slow_queries.py)
+slow_query_config = {
+    'enabled': os.environ.get('SLOW_QUERY_LOG', '0') == '1',
+    'threshold_ms': float(os.environ.get('SLOW_QUERY_MS', '200')),
+    'explain': os.environ.get('SLOW_QUERY_EXPLAIN', '1') == '1',
+    'path': os.environ.get('SLOW_QUERY_LOG_PATH', 'slow_queries.log'),
+    'max_bytes': int(os.environ.get('SLOW_QUERY_LOG_MB', '5')) * 1024 * 1024,
+    'backup_count': int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', '3')),
+}
+
+# Storage engine behind the routes (storage/): mysql (db_config + pool) or an embedded sqlite file
+storage_config = {
+    'backend': os.environ.get('STORAGE_BACKEND', 'mysql'),
+    'sqlite_path': os.environ.get('SQLITE_PATH', 'fitness_tracker.db'),
+    'sqlite_busy_timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', '5')),  # seconds a writer waits for the lock
+    'sqlite_synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),  # NORMAL is durable enough in WAL mode
+}
+
+# Weekly/monthly rollup compaction (compaction.py); COMPACTION_SCHEDULER=1 runs it inside the app
+compaction_config = {
+    'scheduler': os.environ.get('COMPACTION_SCHEDULER', '0') == '1',
+    'interval': int(os.environ.get('COMPACTION_INTERVAL', '3600')),  # seconds between runs
+    'window_days': int(os.environ.get('COMPACTION_WINDOW_DAYS', '31')),  # days per transaction
+    'lag_seconds': int(os.environ.get('COMPACTION_LAG', '60')),  # overlap when looking for late writes
+    'lease_seconds': int(os.environ.get('COMPACTION_LEASE', '600')),
+}
+
+# Leaderboards (leaderboard.py): ranks come from per-worker score snapshots rebuilt every ttl seconds
+leaderboard_config = {
+    'top_k': int(os.environ.get('LEADERBOARD_TOP_K', '100')),  # most entries a top list returns
+    'max_ranked': int(os.environ.get('LEADERBOARD_MAX_RANKED', '200000')),  # scores kept per snapshot
+    'ttl': float(os.environ.get('LEADERBOARD_TTL', '30')),  # seconds
+    'snapshots': int(os.environ.get('LEADERBOARD_SNAPSHOTS', '32')),  # boards/periods kept per worker
+}
+
+# Monthly log partitions and cold archives (partitions.py)
+archive_config = {
+    'path': os.environ.get('ARCHIVE_PATH', 'archive'),  # directory for the compressed month files
+    'retention_months': int(os.environ.get('ARCHIVE_RETENTION_MONTHS', '24')),  # months kept in the database
+    'partitions_ahead': int(os.environ.get('PARTITIONS_AHEAD', '3')),  # future monthly partitions to keep ready
+    'compress_level': int(os.environ.get('ARCHIVE_COMPRESS_LEVEL', '6')),
+}
+
+# Production server (serve.py); workers 0 = derived from the CPU count and worker class
+server_config = {
+    'server': os.environ.get('SERVER', 'auto'),  # auto (gunicorn when installed), gunicorn or werkzeug
+    'bind': os.environ.get('SERVER_BIND', '127.0.0.1:8000'),
+    'workers': int(os.environ.get('WEB_WORKERS', '0')),
+    'worker_class': os.environ.get('WORKER_CLASS', 'sync'),  # sync (one request per process) or gthread
+    'threads': int(os.environ.get('WEB_THREADS', '4')),  # per gthread worker
+    'timeout': int(os.environ.get('WORKER_TIMEOUT', '60')),  # seconds a sync worker may spend on one request
+    'graceful_timeout': int(os.environ.get('GRACEFUL_TIMEOUT', '30')),  # seconds old workers get to finish on reload
+    'max_requests': int(os.environ.get('WORKER_MAX_REQUESTS', '0')),  # recycle a worker after this many, 0 = never
+    'preload': os.environ.get('SERVER_PRELOAD', '1') == '1',  # import and warm the app once, before forking
+    'pidfile': os.environ.get('SERVER_PIDFILE', 'fitness_tracker.pid'),
+}
+
+# Concurrent dashboard / summary reads on aiomysql (async_reads.py); MySQL only, off by default
+async_config = {
+    'enabled': os.environ.get('ASYNC_READS', '0') == '1',
+    'pool_size': int(os.environ.get('ASYNC_POOL_SIZE', '10')),  # connections per worker process
+    'query_timeout': float(os.environ.get('ASYNC_QUERY_TIMEOUT', '2')),  # seconds per query before it is dropped
+}
@@ -0,0 +1,204 @@
+"""
+Data access for the dashboard.
+fetch_dashboard_data() loads everything the dashboard needs in a single round trip:
+one UNION ALL statement returns the week's daily_summary rows, the week's exercise
+sessions, the 10 most recent foods, the user's streak row (streaks.py) and awarded
+badges (badges.py), tagged by a `kind` column. The statement is plain SQL that both storage engines (MySQL and
+SQLite) accept. async_reads.py sends the same branches as separate concurrent queries
+and assembles the result with apply_rows().
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+from streaks import live_streak
+from timeranges import as_date, as_datetime, day_range
+
+RECENT_FOODS_LIMIT = 10
+
+# Branches of the dashboard query, all with the same columns. fetch_dashboard_data()
+# sends them as one UNION ALL; async_reads.py runs them concurrently.
+DASHBOARD_QUERIES = {
+    'summary': """
+        SELECT 'summary' AS kind, date AS day, NULL AS label, food_items AS quantity,
+               total_calories_consumed AS v1, total_calories_burned AS v2,
+               exercise_minutes AS v3, exercise_sessions AS v4,
+               total_distance_walked AS v5, total_carbon_saved AS v6,
+               NULL AS logged_at
+        FROM daily_summary
+        WHERE user_id = %s AND date BETWEEN %s AND %s
+    """,
+    'exercise': """
+        SELECT 'exercise' AS kind, DATE(log_date) AS day, activity AS label, NULL AS quantity,
+               calories_burned AS v1, duration AS v2, NULL AS v3, NULL AS v4, NULL AS v5, NULL AS v6,
+               log_date AS logged_at
+        FROM exercise_log
+        WHERE user_id = %s AND log_date >= %s AND log_date < %s
+    """,
+    'food': """
+        SELECT * FROM (
+            SELECT 'food' AS kind, NULL AS day, food_name AS label, quantity,
+                   calories AS v1, NULL AS v2, NULL AS v3, NULL AS v4, NULL AS v5, NULL AS v6,
+                   log_date AS logged_at
+            FROM food_log
+            WHERE user_id = %s
+            ORDER BY log_date DESC
+            LIMIT {limit}
+        ) AS recent_foods
+    """.format(limit=RECENT_FOODS_LIMIT),
+    'streak': """
+        SELECT 'streak' AS kind, last_active_date AS day, NULL AS label, NULL AS quantity,
+               current_streak AS v1, longest_streak AS v2, NULL AS v3, NULL AS v4, NULL AS v5, NULL AS v6,
+               NULL AS logged_at
+        FROM user_streaks
+        WHERE user_id = %s
+    """,
+    'badge': """
+        SELECT 'badge' AS kind, NULL AS day, badge AS label, NULL AS quantity,
+               NULL AS v1, NULL AS v2, NULL AS v3, NULL AS v4, NULL AS v5, NULL AS v6,
+               awarded_at AS logged_at
+        FROM user_badges
+        WHERE user_id = %s
+    """,
+}
+
+DASHBOARD_SQL = "/* dashboard */" + "UNION ALL".join(DASHBOARD_QUERIES.values())
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _int(value):
+    try:
+        return int(round(float(value)))
+    except (TypeError, ValueError):
+        return 0
+
+
+@dataclass
+class DaySummary:
+    day: date
+    calories_in: float = 0.0
+    food_items: int = 0
+    calories_burned: float = 0.0
+    minutes: int = 0
+    sessions: int = 0
+    distance: float = 0.0
+    carbon_saved: float = 0.0
+
+
+@dataclass
+class ExerciseEntry:
+    activity: str
+    duration: int
+    calories_burned: int
+    logged_at: datetime = None
+
+
+@dataclass
+class FoodEntry:
+    food_name: str
+    quantity: int
+    calories: float
+    created_at: datetime = None
+
+    @property
+    def created_at_display(self):
+        if self.created_at and hasattr(self.created_at, 'strftime'):
+            return self.created_at.strftime('%d %b %Y, %I:%M %p')
+        if self.created_at:
+            return str(self.created_at)
+        return '--'
+
+
+@dataclass
+class DashboardData:
+    today: DaySummary
+    week: list = field(default_factory=list)               # 7 DaySummary, oldest first
+    exercises: dict = field(default_factory=dict)          # date -> [ExerciseEntry], newest first
+    recent_foods: list = field(default_factory=list)       # [FoodEntry], newest first
+    current_streak: int = 0                                 # consecutive active days up to today/yesterday
+    longest_streak: int = 0
+    badges: dict = field(default_factory=dict)             # badge key -> awarded_at
+    missing: tuple = ()                                     # query branches that failed or timed out (async_reads)
+
+    @classmethod
+    def empty(cls, today_date):
+        week = [DaySummary(today_date - timedelta(days=delta)) for delta in range(6, -1, -1)]
+        return cls(today=week[-1], week=week)
+
+
+def dashboard_params(user_id, week_start, today_date):
+    """{branch: params} for DASHBOARD_QUERIES."""
+    range_start, range_end = day_range(week_start, today_date)
+    return {
+        'summary': (user_id, week_start, today_date),
+        'exercise': (user_id, range_start, range_end),
+        'food': (user_id,),
+        'streak': (user_id,),
+        'badge': (user_id,),
+    }
+
+
+def fetch_dashboard_data(cursor, user_id, today_date=None):
+    """
+    Load the dashboard's data for the 7 days ending today_date with one query.
+    cursor must be a dictionary cursor. Raises the driver's error on failure.
+    """
+    today_date = today_date or date.today()
+    data = DashboardData.empty(today_date)
+    params = dashboard_params(user_id, data.week[0].day, today_date)
+    cursor.execute(DASHBOARD_SQL, [value for kind in DASHBOARD_QUERIES for value in params[kind]])
+    return apply_rows(data, cursor.fetchall() or [], today_date)
+
+
+def apply_rows(data, rows, today_date):
+    """Fill an empty DashboardData from dashboard query rows (dicts tagged by kind); returns data."""
+    days = {summary.day: summary for summary in data.week}
+    for row in rows:
+        kind = row.get('kind')
+        if kind == 'summary':
+            summary = days.get(as_date(row.get('day')))
+            if summary is None:
+                continue
+            summary.calories_in = _float(row.get('v1'))
+            summary.food_items = _int(row.get('quantity'))
+            summary.calories_burned = _float(row.get('v2'))
+            summary.minutes = _int(row.get('v3'))
+            summary.sessions = _int(row.get('v4'))
+            summary.distance = _float(row.get('v5'))
+            summary.carbon_saved = _float(row.get('v6'))
+        elif kind == 'exercise':
+            day = as_date(row.get('day'))
+            if day is None:
+                continue
+            data.exercises.setdefault(day, []).append(ExerciseEntry(
+                activity=row.get('label') or 'Session',
+                duration=_int(row.get('v2')),
+                calories_burned=_int(row.get('v1')),
+                logged_at=as_datetime(row.get('logged_at')),
+            ))
+        elif kind == 'food':
+            data.recent_foods.append(FoodEntry(
+                food_name=row.get('label'),
+                quantity=row.get('quantity'),
+                calories=row.get('v1'),
+                created_at=as_datetime(row.get('logged_at')),
+            ))
+        elif kind == 'streak':
+            data.current_streak = live_streak({
+                'current_streak': _int(row.get('v1')),
+                'last_active_date': row.get('day'),
+            }, today_date)
+            data.longest_streak = _int(row.get('v2'))
+        elif kind == 'badge':
+            data.badges[row.get('label')] = as_datetime(row.get('logged_at'))
+
+    for entries in data.exercises.values():
+        entries.sort(key=lambda entry: entry.logged_at or datetime.min, reverse=True)
+    data.recent_foods.sort(key=lambda entry: entry.created_at or datetime.min, reverse=True)
+    return data
@@ -0,0 +1,248 @@
+"""
+Pooled MySQL connections for the Flask app.
+The MySQL storage engine (storage/mysql_repository.py) borrows from here instead
+of opening a new connection (TCP + auth handshake) on every request. Calling
+close() on a borrowed connection hands it back to the pool.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector.errors import PoolError
+
+from config import db_config, pool_config
+from metrics import instrument_cursor, record_acquire
+
+
+class PooledConnection:
+    """Thin proxy around a mysql.connector connection borrowed from the pool."""
+
+    def __init__(self, pool, raw, created_at):
+        self._pool = pool
+        self._raw = raw
+        self._created_at = created_at
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise mysql.connector.errors.OperationalError("Connection already returned to the pool")
+        return getattr(self._raw, name)
+
+    def cursor(self, *args, **kwargs):
+        if self._raw is None:
+            raise mysql.connector.errors.OperationalError("Connection already returned to the pool")
+        return instrument_cursor(self._raw.cursor(*args, **kwargs))
+
+    def close(self):
+        # Return to the pool instead of closing; safe to call more than once
+        if self._raw is not None:
+            raw, self._raw = self._raw, None
+            self._pool._release(raw, self._created_at)
+
+
+class ConnectionPool:
+    """
+    Bounded connection pool.
+    - pool_size: connections kept open while idle
+    - max_overflow: extra connections opened under load, closed when returned
+    - timeout: seconds to wait for a free connection before raising PoolError
+    - pre_ping: check the connection is alive before handing it out
+    - recycle: reopen connections older than this many seconds (0 = never)
+    """
+
+    def __init__(self, config, pool_size=5, max_overflow=10, timeout=5.0, pre_ping=True, recycle=3600):
+        self.config = dict(config)
+        self.pool_size = max(int(pool_size), 1)
+        self.max_overflow = max(int(max_overflow), 0)
+        self.timeout = float(timeout)
+        self.pre_ping = bool(pre_ping)
+        self.recycle = int(recycle or 0)
+
+        self._idle = deque()  # (raw_connection, created_at)
+        self._cond = threading.Condition()
+        self._total = 0
+        self._in_use = 0
+        self._counters = {
+            'created': 0,
+            'closed': 0,
+            'recycled': 0,
+            'failed_pings': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'max_wait_time': 0.0,
+            'timeouts': 0,
+            'borrowed': 0,
+        }
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.config)
+        with self._cond:
+            self._counters['created'] += 1
+        return raw
+
+    def _discard(self, raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._counters['closed'] += 1
+
+    def get_connection(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        waited = False
+        raw = None
+        created_at = None
+
+        with self._cond:
+            while True:
+                if self._idle:
+                    # LIFO keeps the most recently used (warmest) connections busy
+                    raw, created_at = self._idle.pop()
+                    break
+                if self._total < self.pool_size + self.max_overflow:
+                    self._total += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolError(
+                        f"Timed out after {self.timeout}s waiting for a database connection "
+                        f"(pool_size={self.pool_size}, max_overflow={self.max_overflow})"
+                    )
+                waited = True
+                self._cond.wait(remaining)
+
+            self._in_use += 1
+            self._counters['borrowed'] += 1
+            if waited:
+                wait_time = time.monotonic() - started
+                self._counters['waits'] += 1
+                self._counters['wait_time'] += wait_time
+                self._counters['max_wait_time'] = max(self._counters['max_wait_time'], wait_time)
+
+        try:
+            if raw is not None:
+                now = time.monotonic()
+                if self.recycle and now - created_at > self.recycle:
+                    self._discard(raw)
+                    raw = None
+                    with self._cond:
+                        self._counters['recycled'] += 1
+                elif self.pre_ping and not self._is_alive(raw):
+                    self._discard(raw)
+                    raw = None
+                    with self._cond:
+                        self._counters['failed_pings'] += 1
+
+            if raw is None:
+                raw = self._connect()
+                created_at = time.monotonic()
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        # Wait + ping + (re)connect, i.e. everything before the first query
+        record_acquire(time.monotonic() - started)
+        return PooledConnection(self, raw, created_at)
+
+    @staticmethod
+    def _is_alive(raw):
+        try:
+            return raw.is_connected()
+        except Exception:
+            return False
+
+    def _release(self, raw, created_at):
+        healthy = True
+        try:
+            # Never hand the next borrower unread rows (a cursor closed before fetching
+            # everything) or an open transaction
+            if raw.unread_result:
+                raw.consume_results()
+            if raw.in_transaction:
+                raw.rollback()
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            self._in_use -= 1
+            keep = healthy and self._total <= self.pool_size
+            if keep:
+                self._idle.append((raw, created_at))
+            else:
+                self._total -= 1
+            self._cond.notify()
+
+        if not keep:
+            self._discard(raw)
+
+    def prefill(self, count=None):
+        """Open connections up front so the first requests skip the handshake."""
+        count = self.pool_size if count is None else min(int(count), self.pool_size)
+        borrowed = [self.get_connection() for _ in range(count)]
+        for conn in borrowed:
+            conn.close()
+        return count
+
+    def dispose(self):
+        """Close all idle connections (connections in use are closed when returned)."""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._total -= len(idle)
+        for raw, _ in idle:
+            self._discard(raw)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._counters)
+            stats.update({
+                'pid': os.getpid(),
+                'pool_size': self.pool_size,
+                'max_overflow': self.max_overflow,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                'open': self._total,
+                'overflow': max(self._total - self.pool_size, 0),
+            })
+        stats['wait_time'] = round(stats['wait_time'], 6)
+        stats['max_wait_time'] = round(stats['max_wait_time'], 6)
+        stats['avg_wait_time'] = round(stats['wait_time'] / stats['waits'], 6) if stats['waits'] else 0.0
+        return stats
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide pool, creating a fresh one after a fork."""
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                # Connections inherited from a parent process must not be shared
+                _pool = ConnectionPool(db_config, **pool_config)
+                _pool_pid = pid
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+def connect_direct():
+    """
+    Open an unpooled connection for long-running work (streaming exports) so it
+    does not hold a pool slot for minutes. Close it when done.
+    """
+    return mysql.connector.connect(**db_config)
@@ -0,0 +1,183 @@
+"""
+Streaming export of food/exercise/environment logs as CSV or NDJSON.
+Rows are read from an unbuffered (server-side) cursor with fetchmany(), encoded and
+optionally gzip-compressed chunk by chunk, so memory use does not depend on how
+much history is exported.
+
+Exports walk each table in id order. Every record carries its type and id, so an
+interrupted export can be resumed with after="<type>:<id>" of the last record received.
+Months moved to archive files (partitions.py) are merged into each table's stream
+by id, so an export covers the whole history whether or not it was archived.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime
+
+from partitions import archive_entries, iter_archive, merge_by_id
+from timeranges import day_range
+
+EXPORT_TYPES = ('food', 'exercise', 'environment')
+FETCH_BATCH_SIZE = 1000
+CHUNK_BYTES = 64 * 1024
+
+EXPORT_TABLES = {'food': 'food_log', 'exercise': 'exercise_log', 'environment': 'environment_log'}
+EXPORT_COLUMNS = {
+    'food': ('id', 'user_id', 'log_date', 'food_name', 'quantity', 'calories'),
+    'exercise': ('id', 'user_id', 'log_date', 'activity', 'duration', 'calories_burned'),
+    'environment': ('id', 'user_id', 'log_date', 'distance_walked', 'carbon_saved'),
+}
+EXPORT_QUERIES = {
+    kind: f"""
+        SELECT {', '.join(columns)}
+        FROM {EXPORT_TABLES[kind]}
+        WHERE id > %s {{filters}}
+        ORDER BY id
+    """
+    for kind, columns in EXPORT_COLUMNS.items()
+}
+
+CSV_COLUMNS = [
+    'type', 'id', 'user_id', 'log_date',
+    'food_name', 'quantity', 'calories',
+    'activity', 'duration', 'calories_burned',
+    'distance_walked', 'carbon_saved',
+]
+
+
+def parse_types(value):
+    """'food,exercise' / 'all' / None -> tuple of export types in table order."""
+    if not value or value == 'all':
+        return EXPORT_TYPES
+    requested = {part.strip() for part in value.split(',') if part.strip()}
+    unknown = requested - set(EXPORT_TYPES)
+    if unknown:
+        raise ValueError(f"unknown export type(s): {', '.join(sorted(unknown))}")
+    return tuple(kind for kind in EXPORT_TYPES if kind in requested)
+
+
+def parse_resume_token(value, types):
+    """'exercise:5012' -> ('exercise', 5012); None -> (first type, 0)."""
+    if not value:
+        return types[0], 0
+    kind, _, last_id = value.partition(':')
+    if kind not in types or not last_id.isdigit():
+        raise ValueError(f"invalid resume token {value!r} (expected <type>:<id>)")
+    return kind, int(last_id)
+
+
+def iter_export_rows(conn, types=EXPORT_TYPES, user_id=None, start_day=None, end_day=None, after=None,
+                     batch_size=FETCH_BATCH_SIZE):
+    """
+    Yield export records (dicts) for the requested types, resuming after the given token.
+    start_day / end_day are inclusive dates.
+    """
+    resume_kind, resume_id = parse_resume_token(after, types)
+    kinds = types[types.index(resume_kind):]
+    filters = []
+    filter_params = []
+    start = end = None
+    if user_id is not None:
+        filters.append("AND user_id = %s")
+        filter_params.append(user_id)
+    if start_day is not None:
+        start = day_range(start_day)[0]
+        filters.append("AND log_date >= %s")
+        filter_params.append(start)
+    if end_day is not None:
+        end = day_range(end_day)[1]
+        filters.append("AND log_date < %s")
+        filter_params.append(end)
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        archives = archive_entries(cursor, kinds, start_day, end_day)
+    finally:
+        cursor.close()
+
+    for kind in kinds:
+        last_id = resume_id if kind == resume_kind else 0
+        streams = [_iter_table(conn, kind, filters, [last_id] + filter_params, batch_size)]
+        streams += [
+            iter_archive(entry, EXPORT_COLUMNS[kind], user_id, start, end, last_id)
+            for entry in archives.get(kind, []) if entry['max_id'] > last_id
+        ]
+        for row in merge_by_id(streams) if len(streams) > 1 else streams[0]:
+            row['type'] = kind
+            yield row
+
+
+def _iter_table(conn, kind, filters, params, batch_size):
+    # Unbuffered: rows stay on the server until fetched
+    cursor = conn.cursor(dictionary=True, buffered=False)
+    try:
+        cursor.execute(EXPORT_QUERIES[kind].format(filters=' '.join(filters)), params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_ndjson(rows):
+    buffer = []
+    size = 0
+    for row in rows:
+        line = json.dumps(row, default=_json_default, separators=(',', ':')) + '\n'
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield ''.join(buffer).encode('utf-8')
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def encode_csv(rows):
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+    writer.writeheader()
+    for row in rows:
+        writer.writerow({key: (_json_default(value) if isinstance(value, (datetime, date)) else value)
+                         for key, value in row.items()})
+        if out.tell() >= CHUNK_BYTES:
+            yield out.getvalue().encode('utf-8')
+            out.seek(0)
+            out.truncate()
+    if out.tell():
+        yield out.getvalue().encode('utf-8')
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(conn_factory, fmt='csv', compress=False, **filters):
+    """
+    Generator of response body chunks. conn_factory() opens the connection when streaming
+    starts; it is closed when the export finishes or the client disconnects.
+    """
+    conn = conn_factory()
+    try:
+        rows = iter_export_rows(conn, **filters)
+        chunks = encode_csv(rows) if fmt == 'csv' else encode_ndjson(rows)
+        if compress:
+            chunks = gzip_chunks(chunks)
+        yield from chunks
+    finally:
+        conn.close()
@@ -0,0 +1,242 @@
+"""
+Weekly and monthly leaderboards: most calories burned, km walked and CO2 saved.
+
+- leaderboard_scores holds one row per (period, period_start, user) with a column
+  per board. Repository.write_batch calls update_leaderboards() in the same
+  transaction as the logs, adding the batch's exercise totals to the user's
+  week and month rows. Food-only batches do not touch the table.
+- Top-K reads the board's (period, period_start, score) index backwards and
+  stops after K rows.
+- "My rank" reads the user's live score by primary key and bisects it into a
+  BoardSnapshot: the period's scores as a sorted float array, at most
+  LEADERBOARD_MAX_RANKED of them. Snapshots are rebuilt from the index at most
+  every LEADERBOARD_TTL seconds and kept in a bounded per-worker LRU, so a rank
+  costs one key lookup plus O(log n) in memory, however many users there are.
+  Ranks of other users can be up to LEADERBOARD_TTL seconds old.
+
+Usage:
+    python leaderboard.py rebuild                 # current and previous 3 weeks/months
+    python leaderboard.py rebuild --periods 12
+    python leaderboard.py top distance_walked --period month
+    python leaderboard.py prune --keep 26         # drop periods older than 26 weeks/months
+"""
+
+import argparse
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date, timedelta
+
+from cache import LRUCache
+from config import leaderboard_config
+from storage import StorageError, get_repository
+from timeranges import next_period_start, period_start
+
+# Board (leaderboard_scores column) -> bulk_import rollup total it adds up
+BOARDS = {
+    'calories_burned': 'calories_burned',
+    'distance_walked': 'distance',
+    'carbon_saved': 'carbon_saved',
+}
+PERIODS = ('week', 'month')
+DAILY_COLUMNS = {
+    'calories_burned': 'total_calories_burned',
+    'distance_walked': 'total_distance_walked',
+    'carbon_saved': 'total_carbon_saved',
+}
+
+
+class BoardSnapshot:
+    """One board's scores for one period, ascending, as loaded at loaded_at."""
+
+    def __init__(self, scores, complete, loaded_at=None):
+        self.scores = scores        # array('d'), ascending
+        self.complete = complete    # False when more than max_ranked users have a score
+        self.loaded_at = loaded_at or time.time()
+
+    def rank(self, score):
+        """Competition rank (1 + users with a higher score), None when not on the board or below the kept scores."""
+        if not score or score <= 0:
+            return None
+        if not self.complete and self.scores and score < self.scores[0]:
+            return None
+        return len(self.scores) - bisect_right(self.scores, score) + 1
+
+
+snapshots = LRUCache('leaderboard', maxsize=leaderboard_config['snapshots'], ttl=leaderboard_config['ttl'])
+_load_lock = threading.Lock()
+
+
+def board_deltas(rollups):
+    """(user_id, day, totals_dict) rollup rows -> {(period, period_start, user_id): {board: delta}}."""
+    deltas = {}
+    for user_id, day, totals in rollups:
+        values = {board: totals.get(key, 0) or 0 for board, key in BOARDS.items()}
+        if not any(values.values()):
+            continue
+        for period in PERIODS:
+            scores = deltas.setdefault((period, period_start(day, period), user_id), dict.fromkeys(BOARDS, 0))
+            for board, value in values.items():
+                scores[board] += value
+    return deltas
+
+
+def write_scores(repo, cursor, scores, additive):
+    """Upsert {(period, period_start, user_id): {board: score}}: add to the stored scores, or replace them."""
+    if not scores:
+        return
+    sql = (
+        f"INSERT INTO leaderboard_scores (period, period_start, user_id, {', '.join(BOARDS)}) "
+        f"VALUES (%s, %s, %s, {', '.join(['%s'] * len(BOARDS))}) "
+        + repo.upsert_clause(('period', 'period_start', 'user_id'), tuple(BOARDS), additive=additive)
+    )
+    # Key order keeps concurrent writers from deadlocking on the unique index
+    cursor.executemany(sql, [
+        key + tuple(values[board] for board in BOARDS) for key, values in sorted(scores.items())
+    ])
+
+
+def update_leaderboards(repo, cursor, rollups):
+    """Add a written batch's exercise totals to its users' week and month scores; no commit."""
+    write_scores(repo, cursor, board_deltas(rollups), additive=True)
+
+
+def fetch_top(cursor, board, period, start, limit):
+    """Highest scores first: [{'rank', 'user_id', 'name', 'score'}] (dictionary cursor)."""
+    cursor.execute(f"""
+        /* leaderboard_top */
+        SELECT l.user_id, u.name, l.{board} AS score
+        FROM leaderboard_scores l
+        JOIN users u ON u.id = l.user_id
+        WHERE l.period = %s AND l.period_start = %s AND l.{board} > 0
+        ORDER BY l.{board} DESC
+        LIMIT %s
+    """, (period, start, limit))
+    top = []
+    previous = None
+    for position, row in enumerate(cursor.fetchall(), start=1):
+        score = float(row['score'])
+        # Ties share the rank of the first user with that score
+        rank = top[-1]['rank'] if top and score == previous else position
+        previous = score
+        top.append({'rank': rank, 'user_id': row['user_id'], 'name': row['name'], 'score': round(score, 2)})
+    return top
+
+
+def fetch_score(cursor, board, period, start, user_id):
+    cursor.execute(
+        f"SELECT {board} AS score FROM leaderboard_scores WHERE period = %s AND period_start = %s AND user_id = %s",
+        (period, start, user_id)
+    )
+    row = cursor.fetchone()
+    return float(row['score']) if row else 0.0
+
+
+def load_snapshot(cursor, board, period, start, max_ranked):
+    """Read the period's positive scores (highest first, index only) into a BoardSnapshot."""
+    cursor.execute(f"""
+        /* leaderboard_scores */
+        SELECT {board} AS score
+        FROM leaderboard_scores
+        WHERE period = %s AND period_start = %s AND {board} > 0
+        ORDER BY {board} DESC
+        LIMIT %s
+    """, (period, start, max_ranked + 1))
+    scores = array('d', (float(row['score']) for row in cursor.fetchall()))
+    complete = len(scores) <= max_ranked
+    del scores[max_ranked:]
+    scores.reverse()
+    return BoardSnapshot(scores, complete)
+
+
+def get_snapshot(cursor, board, period, start):
+    """Cached snapshot for the board and period; at most one worker thread rebuilds it at a time."""
+    key = (board, period, start)
+    snapshot = snapshots.get(key)
+    if snapshot is None:
+        with _load_lock:
+            snapshot = snapshots.get(key)
+            if snapshot is None:
+                snapshot = load_snapshot(cursor, board, period, start, leaderboard_config['max_ranked'])
+                snapshots.set(key, snapshot)
+    return snapshot
+
+
+def rebuild(repo, periods=4, today=None):
+    """
+    Recompute the current and previous periods - 1 weeks and months from
+    daily_summary. Returns the number of (period, user) rows written.
+    """
+    today = today or date.today()
+    written = 0
+    for period in PERIODS:
+        start = period_start(today, period)
+        for _ in range(periods):
+            end = next_period_start(start, period)
+            with repo.cursor(dictionary=False, commit=True) as cursor:
+                cursor.execute(f"""
+                    SELECT user_id, {', '.join(f'SUM({column})' for column in DAILY_COLUMNS.values())}
+                    FROM daily_summary
+                    WHERE date >= %s AND date < %s
+                    GROUP BY user_id
+                """, (start, end))
+                scores = {
+                    (period, start, row[0]): dict(zip(BOARDS, (value or 0 for value in row[1:])))
+                    for row in cursor.fetchall()
+                }
+                scores = {key: values for key, values in scores.items() if any(values.values())}
+                cursor.execute(
+                    "DELETE FROM leaderboard_scores WHERE period = %s AND period_start = %s", (period, start)
+                )
+                write_scores(repo, cursor, scores, additive=False)
+            written += len(scores)
+            start = period_start(start - timedelta(days=1), period)
+    snapshots.clear()
+    return written
+
+
+def prune(repo, keep=26, today=None):
+    """Delete periods older than the last keep weeks / months. Returns the rows deleted."""
+    today = today or date.today()
+    deleted = 0
+    for period in PERIODS:
+        cutoff = period_start(today, period)
+        for _ in range(keep - 1):
+            cutoff = period_start(cutoff - timedelta(days=1), period)
+        with repo.cursor(commit=True) as cursor:
+            cursor.execute(
+                "DELETE FROM leaderboard_scores WHERE period = %s AND period_start < %s", (period, cutoff)
+            )
+            deleted += cursor.rowcount
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Weekly and monthly leaderboards")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild_parser = sub.add_parser('rebuild', help="recompute recent periods from daily_summary")
+    rebuild_parser.add_argument('--periods', type=int, default=4, help="weeks and months to rebuild, newest first")
+    top_parser = sub.add_parser('top', help="print a top list")
+    top_parser.add_argument('board', choices=sorted(BOARDS))
+    top_parser.add_argument('--period', choices=PERIODS, default='week')
+    top_parser.add_argument('--date', type=date.fromisoformat, help="any day in the period (default today)")
+    top_parser.add_argument('--limit', type=int, default=10)
+    prune_parser = sub.add_parser('prune', help="delete old periods")
+    prune_parser.add_argument('--keep', type=int, default=26, help="weeks and months to keep")
+    args = parser.parse_args()
+
+    repo = get_repository()
+    try:
+        if args.command == 'rebuild':
+            print(f"Rebuilt {rebuild(repo, args.periods)} leaderboard row(s)")
+        elif args.command == 'top':
+            board = repo.leaderboard(args.board, args.period, args.date or date.today(), args.limit)
+            more = '' if board['complete'] else '+'
+            print(f"{args.board}, {args.period} of {board['period_start']}: {board['ranked']}{more} user(s)")
+            for entry in board['top']:
+                print(f"{entry['rank']:>4}. {entry['name']} ({entry['user_id']}) {entry['score']}")
+        else:
+            print(f"Deleted {prune(repo, args.keep)} leaderboard row(s)")
+    except StorageError as e:
+        print(f"Error: {e}")
@@ -0,0 +1,323 @@
+"""
+Request and query timing.
+- InstrumentedCursor wraps the cursors of pooled connections and times every
+  statement (execute plus the fetches that read its rows), labelled with a short
+  query name: the leading /* name */ comment of the SQL when there is one,
+  otherwise "<verb>:<table>" (e.g. "insert:food_log").
+- Statements over SLOW_QUERY_MS also go to the slow-query log (slow_queries.py)
+  when it is enabled.
+- worker_stats() reports this process's resident memory and, once serve.py has
+  warmed it, its startup time, for capacity planning.
+- init_app() adds request timing hooks, a Server-Timing header that splits each
+  request into connect / db / render / compute time, and a Prometheus-text /metrics
+  endpoint with latency histograms per route and per query.
+
+Metrics are kept per worker process; Prometheus should scrape every worker (or use
+a single worker per port).
+"""
+
+import contextvars
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from flask import Response, before_render_template, g, request, template_rendered
+
+from config import metrics_config
+from slow_queries import slow_query_log
+
+# Seconds; roughly log-spaced from 1 ms to 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NAME_COMMENT = re.compile(r'^\s*/\*\s*([\w:.-]+)\s*\*/')
+_VERB_TABLE = re.compile(
+    r'^\s*(?:/\*.*?\*/\s*)?(?:(UPDATE)\s+|(\w+)\b.*?\b(?:FROM|INTO|TABLE)\s+)`?(\w+)',
+    re.IGNORECASE | re.DOTALL
+)
+
+
+@lru_cache(maxsize=1024)
+def query_name(sql):
+    """Short label for a statement: /* name */ prefix, else verb:table, else the verb."""
+    match = _NAME_COMMENT.match(sql)
+    if match:
+        return match.group(1)
+    match = _VERB_TABLE.match(sql)
+    if match:
+        update, verb, table = match.groups()
+        return f"{(update or verb).lower()}:{table.lower()}"
+    words = sql.split(None, 1)
+    return words[0].lower() if words else 'empty'
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram with one series per label tuple."""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: list(series) for labels, series in self._series.items()}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self.snapshot().items()):
+            label_text = ','.join(f'{key}="{_escape(value)}"' for key, value in zip(self.label_names, labels))
+            prefix = label_text + ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            braces = f"{{{label_text}}}" if label_text else ''
+            lines.append(f"{self.name}_sum{braces} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{braces} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+REQUEST_SECONDS = Histogram(
+    'fitness_http_request_duration_seconds', "Request latency by route", ('route', 'method', 'status'))
+QUERY_SECONDS = Histogram(
+    'fitness_db_query_duration_seconds', "Statement latency (execute + fetch) by query name", ('query',))
+ACQUIRE_SECONDS = Histogram(
+    'fitness_db_pool_acquire_seconds', "Time to get a connection from the pool", ())
+
+# Per-request accumulator: {'route', 'connect', 'db', 'render', 'queries'} while a request is active
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def _add_request_time(key, seconds):
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[key] += seconds
+
+
+def record_query(name, seconds, sql=None, params=None, many=False):
+    QUERY_SECONDS.observe((name,), seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings['queries'] += 1
+    if slow_query_log is not None and sql is not None:
+        slow_query_log.record(name, sql, params, seconds, many=many,
+                              route=timings['route'] if timings is not None else None)
+
+
+def record_acquire(seconds):
+    ACQUIRE_SECONDS.observe((), seconds)
+    _add_request_time('connect', seconds)
+
+
+# Set by serve.py once the worker is warm
+_worker = {'pid': None, 'startup_seconds': None, 'ready_at': None}
+
+
+def mark_worker_ready(startup_seconds):
+    _worker.update(pid=os.getpid(), startup_seconds=round(startup_seconds, 3), ready_at=time.time())
+
+
+def rss_bytes():
+    """Current resident set size of this process, or None where it cannot be read."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def worker_stats():
+    stats = {'pid': os.getpid()}
+    rss = rss_bytes()
+    if rss is not None:
+        stats['rss_bytes'] = rss
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        stats['max_rss_bytes'] = peak if sys.platform == 'darwin' else peak * 1024  # bytes on macOS, KiB elsewhere
+    if _worker['pid'] == os.getpid():
+        stats['startup_seconds'] = _worker['startup_seconds']
+        stats['uptime_seconds'] = round(time.time() - _worker['ready_at'], 1)
+    return stats
+
+
+class InstrumentedCursor:
+    """
+    Cursor proxy that times statements. Fetches are added to the statement that
+    produced the rows; the total is recorded at the next execute or at close().
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._pending_name = None
+        self._pending = None  # (sql, params, many) for the slow-query log
+        self._pending_seconds = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def _finish(self):
+        if self._pending_name is not None:
+            sql, params, many = self._pending
+            record_query(self._pending_name, self._pending_seconds, sql, params, many)
+            self._pending_name = None
+            self._pending = None
+            self._pending_seconds = 0.0
+
+    def _timed(self, method, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            self._pending_seconds += elapsed
+            _add_request_time('db', elapsed)
+
+    def execute(self, operation, params=None, *args, **kwargs):
+        self._finish()
+        self._pending_name = query_name(operation)
+        self._pending = (operation, params, False)
+        return self._timed(self._cursor.execute, operation, params, *args, **kwargs)
+
+    def executemany(self, operation, seq_params, *args, **kwargs):
+        self._finish()
+        self._pending_name = query_name(operation)
+        self._pending = (operation, seq_params, True)
+        return self._timed(self._cursor.executemany, operation, seq_params, *args, **kwargs)
+
+    def fetchone(self):
+        return self._timed(self._cursor.fetchone)
+
+    def fetchmany(self, *args, **kwargs):
+        return self._timed(self._cursor.fetchmany, *args, **kwargs)
+
+    def fetchall(self):
+        return self._timed(self._cursor.fetchall)
+
+    def close(self):
+        self._finish()
+        return self._cursor.close()
+
+
+def instrument_cursor(cursor):
+    return InstrumentedCursor(cursor) if metrics_config['enabled'] else cursor
+
+
+def server_timing(timings, total):
+    compute = max(total - timings['connect'] - timings['db'] - timings['render'], 0.0)
+    parts = [
+        ('connect', timings['connect']),
+        ('db', timings['db']),
+        ('render', timings['render']),
+        ('compute', compute),
+        ('total', total),
+    ]
+    header = ', '.join(f"{name};dur={seconds * 1000:.2f}" for name, seconds in parts)
+    return f'{header}, queries;desc="{timings["queries"]}"'
+
+
+def scrape_allowed(authorize=None):
+    """A request carrying the METRICS_TOKEN bearer token, or one authorize() accepts (an admin session)."""
+    token = metrics_config['token']
+    header = request.headers.get('Authorization', '')
+    if token and header.startswith('Bearer ') and hmac.compare_digest(header[len('Bearer '):], token):
+        return True
+    return authorize is not None and authorize()
+
+
+def init_app(app, extra_metrics=None, authorize=None):
+    """
+    Register the timing hooks and the /metrics route. extra_metrics() may return
+    lines of Prometheus text to append (e.g. pool and cache gauges). /metrics is
+    served to requests with the METRICS_TOKEN bearer token or that authorize() accepts.
+    """
+    if not metrics_config['enabled']:
+        return
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+        g.metrics_token = _request_timings.set({
+            'route': request.path, 'connect': 0.0, 'db': 0.0, 'render': 0.0, 'queries': 0,
+        })
+
+    @app.after_request
+    def _stop_timer(response):
+        started = g.pop('metrics_started', None)
+        token = g.pop('metrics_token', None)
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        timings = _request_timings.get()
+        _request_timings.reset(token)
+
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.observe((route, request.method, str(response.status_code)), total)
+        if metrics_config['server_timing'] and timings is not None:
+            response.headers['Server-Timing'] = server_timing(timings, total)
+        return response
+
+    def _render_started(sender, template, context, **extra):
+        g.metrics_render_started = time.perf_counter()
+
+    def _render_finished(sender, template, context, **extra):
+        started = g.pop('metrics_render_started', None)
+        if started is not None:
+            _add_request_time('render', time.perf_counter() - started)
+
+    # weak=False: the handlers are locals and would otherwise be garbage collected
+    before_render_template.connect(_render_started, app, weak=False)
+    template_rendered.connect(_render_finished, app, weak=False)
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        if not scrape_allowed(authorize):
+            return Response("Forbidden\n", status=403, mimetype='text/plain')
+        lines = []
+        for histogram in (REQUEST_SECONDS, QUERY_SECONDS, ACQUIRE_SECONDS):
+            lines.extend(histogram.render())
+        if extra_metrics is not None:
+            lines.extend(extra_metrics())
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+def gauge_lines(name, help_text, values, label='name'):
+    """Prometheus text for a gauge with one sample per {label: value} entry."""
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for key, value in sorted(values.items()):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            lines.append(f'{name}{{{label}="{_escape(key)}"}} {value}')
+    return lines
@@ -0,0 +1,104 @@
+"""
+Apply the versioned SQL migrations in ../migrations to the configured database.
+Each file is named NNN_description.sql and is applied once, in order; applied
+versions are recorded in the schema_migrations table.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # list applied / pending migrations
+"""
+
+import argparse
+import os
+import re
+
+import mysql.connector
+from config import db_config
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'migrations')
+MIGRATION_FILE = re.compile(r'^(\d+)_([\w-]+)\.sql$')
+
+
+def list_migrations():
+    """Return [(version, name, path)] sorted by version."""
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+
+def split_statements(sql):
+    """Split a migration file into statements, dropping -- comments."""
+    lines = [line for line in sql.splitlines() if not line.strip().startswith('--')]
+    return [stmt.strip() for stmt in '\n'.join(lines).split(';') if stmt.strip()]
+
+
+def ensure_migrations_table(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            name VARCHAR(200),
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_migrations")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def migrate(conn):
+    cursor = conn.cursor()
+    ensure_migrations_table(cursor)
+    done = applied_versions(cursor)
+
+    applied = []
+    for version, name, path in list_migrations():
+        if version in done:
+            continue
+        with open(path, encoding='utf-8') as f:
+            statements = split_statements(f.read())
+        print(f"Applying {version:03d}_{name} ({len(statements)} statements)...")
+        # DDL auto-commits in MySQL, so a failed migration stops here and must be fixed by hand
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+            (version, name)
+        )
+        conn.commit()
+        applied.append(version)
+
+    cursor.close()
+    return applied
+
+
+def show_status(conn):
+    cursor = conn.cursor()
+    ensure_migrations_table(cursor)
+    done = applied_versions(cursor)
+    cursor.close()
+    for version, name, _ in list_migrations():
+        state = 'applied' if version in done else 'pending'
+        print(f"{version:03d}_{name}: {state}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply database migrations")
+    parser.add_argument('--status', action='store_true', help="show applied and pending migrations")
+    args = parser.parse_args()
+
+    conn = mysql.connector.connect(**db_config)
+    try:
+        if args.status:
+            show_status(conn)
+        else:
+            applied = migrate(conn)
+            print(f"Applied {len(applied)} migration(s)." if applied else "Database is up to date.")
+    except mysql.connector.Error as e:
+        print(f"Error: {e}")
+    finally:
+        conn.close()
@@ -0,0 +1,485 @@
+"""
+Monthly RANGE partitions for food_log / exercise_log / environment_log, and cold
+archives of months older than the retention window.
+
+Partitions (MySQL):
+- convert rewrites each log table as PARTITION BY RANGE COLUMNS (log_date), one
+  partition per month (pYYYYMM) plus a pmax catch-all. MySQL requires the
+  partitioning column in every unique key and does not allow foreign keys on
+  partitioned tables, so the primary key becomes (id, log_date) and the user_id
+  foreign keys are dropped. The rewrite copies the table and blocks writes while
+  it runs; run it in a maintenance window.
+- ensure splits pmax so the next PARTITIONS_AHEAD months have their own
+  partition before rows arrive (cheap while pmax is empty). Run it from cron.
+- Queries that filter log_date with half-open ranges (every per-user date query
+  here, see timeranges.py) only touch the partitions of those months.
+
+Archives (MySQL and SQLite):
+- archive moves months older than ARCHIVE_RETENTION_MONTHS to gzip-compressed
+  NDJSON files under ARCHIVE_PATH/<table>/, one file per month, rows in id order.
+  Each file is written to a temporary name, fsynced, read back to check the row
+  count and then renamed. Only then is it recorded in log_archives and the rows
+  removed from the database.
+- On a partitioned MySQL table the month is first swapped out of the live table
+  with EXCHANGE PARTITION (a metadata-only operation), then archived from the
+  swapped-out table, then the empty partition is dropped. Elsewhere the month is
+  deleted in id windows after it has been archived.
+- export.py merges the archive files of the requested months into its id-ordered
+  stream, so exports cover the full history. Summaries read daily_summary and the
+  period rollups, which are never archived. rollups.py rebuild only rebuilds days
+  after the archived months.
+
+Usage:
+    python partitions.py status
+    python partitions.py convert --dry-run     # print the DDL
+    python partitions.py convert
+    python partitions.py ensure
+    python partitions.py archive --dry-run
+    python partitions.py archive --retention-months 24
+"""
+
+import argparse
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import time
+from datetime import date, datetime
+from operator import itemgetter
+
+from config import archive_config
+from storage import StorageError, get_repository
+from timeranges import as_date, as_datetime
+
+# kind -> (table, every column, in the order archive files store them)
+LOG_TABLES = {
+    'food': ('food_log', ('id', 'user_id', 'food_name', 'quantity', 'calories', 'log_date')),
+    'exercise': ('exercise_log', ('id', 'user_id', 'activity', 'duration', 'calories_burned', 'distance', 'log_date')),
+    'environment': ('environment_log', ('id', 'user_id', 'distance_walked', 'carbon_saved', 'log_date')),
+}
+MAX_PARTITION = 'pmax'
+FETCH_BATCH_SIZE = 1000
+DELETE_CHUNK = 5000  # id window per delete transaction
+
+
+class PartitionError(Exception):
+    """A table cannot be partitioned or archived as asked."""
+
+
+def month_start(value):
+    return as_date(value).replace(day=1)
+
+
+def add_months(month, count):
+    year, index = divmod(month.year * 12 + month.month - 1 + count, 12)
+    return date(year, index + 1, 1)
+
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+
+def retention_cutoff(today=None, retention_months=None):
+    """First day of the oldest month kept in the database."""
+    retention_months = retention_months or archive_config['retention_months']
+    return add_months(month_start(today or date.today()), -(max(retention_months, 1) - 1))
+
+
+# ---- MySQL partition DDL ----
+def list_partitions(cursor, table):
+    """[(name, exclusive upper bound or None for MAXVALUE)] in order; [] when not partitioned (tuple cursor)."""
+    cursor.execute("""
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+    """, (table,))
+    partitions = []
+    for name, description in cursor.fetchall():
+        bound = None if description == 'MAXVALUE' else date.fromisoformat(description.strip("'")[:10])
+        partitions.append((name, bound))
+    return partitions
+
+
+def partition_definitions(months):
+    """PARTITION clauses for the given month starts plus the pmax catch-all."""
+    clauses = [
+        f"PARTITION {partition_name(month)} VALUES LESS THAN ('{add_months(month, 1).isoformat()}')"
+        for month in months
+    ]
+    clauses.append(f"PARTITION {MAX_PARTITION} VALUES LESS THAN (MAXVALUE)")
+    return ',\n    '.join(clauses)
+
+
+def convert_statements(cursor, table, today=None, ahead=None):
+    """DDL that turns table into monthly partitions from its oldest row to today + ahead months."""
+    ahead = archive_config['partitions_ahead'] if ahead is None else ahead
+    if list_partitions(cursor, table):
+        return []
+    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE log_date IS NULL")
+    if cursor.fetchone()[0]:
+        raise PartitionError(f"{table} has rows without log_date; set them before partitioning")
+    cursor.execute(f"SELECT MIN(log_date) FROM {table}")
+    oldest = cursor.fetchone()[0]
+    current = month_start(today or date.today())
+    month = month_start(oldest) if oldest else current
+    months = []
+    while month <= add_months(current, ahead):
+        months.append(month)
+        month = add_months(month, 1)
+
+    cursor.execute("""
+        SELECT CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS
+        WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME = %s
+    """, (table,))
+    statements = [f"ALTER TABLE {table} DROP FOREIGN KEY {row[0]}" for row in cursor.fetchall()]
+    statements.append(
+        f"ALTER TABLE {table} MODIFY log_date DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP, "
+        f"DROP PRIMARY KEY, ADD PRIMARY KEY (id, log_date)"
+    )
+    statements.append(
+        f"ALTER TABLE {table} PARTITION BY RANGE COLUMNS (log_date) (\n    {partition_definitions(months)}\n)"
+    )
+    return statements
+
+
+def ensure_statements(cursor, table, today=None, ahead=None):
+    """REORGANIZE of pmax that adds the missing months up to today + ahead; [] when none are missing."""
+    ahead = archive_config['partitions_ahead'] if ahead is None else ahead
+    bounds = [bound for _, bound in list_partitions(cursor, table) if bound is not None]
+    if not bounds:
+        return []
+    month = bounds[-1]
+    last = add_months(month_start(today or date.today()), ahead)
+    months = []
+    while month <= last:
+        months.append(month)
+        month = add_months(month, 1)
+    if not months:
+        return []
+    return [f"ALTER TABLE {table} REORGANIZE PARTITION {MAX_PARTITION} INTO (\n    {partition_definitions(months)}\n)"]
+
+
+def _require_mysql(repo):
+    if repo.name != 'mysql':
+        raise PartitionError("table partitioning is a MySQL feature; archive works on every engine")
+
+
+def run_ddl(repo, builder, dry_run=False, **options):
+    """Build (and unless dry_run, execute) builder's statements for every log table."""
+    _require_mysql(repo)
+    executed = []
+    for table, _ in LOG_TABLES.values():
+        with repo.cursor(dictionary=False) as cursor:
+            statements = builder(cursor, table, **options)
+            for statement in statements:
+                if not dry_run:
+                    cursor.execute(statement)  # DDL commits implicitly
+                executed.append(statement)
+    return executed
+
+
+# ---- archives ----
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def archive_ranges(repo, cursor, table, cutoff):
+    """[(name, start or None, end)] of the months before cutoff still in table (tuple cursor)."""
+    partitions = list_partitions(cursor, table) if repo.name == 'mysql' else []
+    if partitions:
+        ranges = []
+        start = None
+        for name, bound in partitions:
+            if bound is None or bound > cutoff:
+                break
+            ranges.append((name, start, bound))
+            start = bound
+        return ranges
+    cursor.execute(f"SELECT MIN(log_date) FROM {table} WHERE log_date < %s", (cutoff,))
+    oldest = cursor.fetchone()[0]
+    if oldest is None:
+        return []
+    ranges = []
+    month = month_start(oldest)
+    while month < cutoff:
+        ranges.append((partition_name(month), month, add_months(month, 1)))
+        month = add_months(month, 1)
+    return ranges
+
+
+def _range_filter(start, end):
+    conditions = ["log_date < %s"]
+    params = [end]
+    if start is not None:
+        conditions.insert(0, "log_date >= %s")
+        params.insert(0, start)
+    return ' AND '.join(conditions), params
+
+
+def write_archive(repo, kind, source, name, start, end, where='', params=()):
+    """
+    Stream source's rows (id order) into a gzip NDJSON file and record it in
+    log_archives. Returns the manifest entry, or None when there were no rows.
+    """
+    table, columns = LOG_TABLES[kind]
+    directory = os.path.join(archive_config['path'], table)
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{name}.{datetime.now():%Y%m%d%H%M%S}.ndjson.gz"
+    path = os.path.join(directory, filename)
+    tmp_path = path + '.tmp'
+    entry = {'rows': 0, 'min_id': None, 'max_id': None, 'min_log_date': None, 'max_log_date': None}
+
+    try:
+        conn = repo.connect_direct()
+    except repo.errors as e:
+        raise repo.translate_error(e) from e
+    try:
+        # Unbuffered: rows stay on the server until fetched
+        cursor = conn.cursor(buffered=False)
+        try:
+            cursor.execute(f"SELECT {', '.join(columns)} FROM {source} {where} ORDER BY id", list(params))
+            with open(tmp_path, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=archive_config['compress_level'],
+                                   mtime=0) as out:
+                    while True:
+                        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+                        if not rows:
+                            break
+                        lines = []
+                        for row in rows:
+                            record = dict(zip(columns, row))
+                            log_date = as_datetime(record['log_date'])
+                            entry['rows'] += 1
+                            entry['min_id'] = record['id'] if entry['min_id'] is None else min(entry['min_id'], record['id'])
+                            entry['max_id'] = record['id'] if entry['max_id'] is None else max(entry['max_id'], record['id'])
+                            if log_date is not None:
+                                entry['min_log_date'] = min(filter(None, (entry['min_log_date'], log_date)))
+                                entry['max_log_date'] = max(filter(None, (entry['max_log_date'], log_date)))
+                            lines.append(json.dumps(record, default=_json_default, separators=(',', ':')) + '\n')
+                        out.write(''.join(lines).encode('utf-8'))
+                raw.flush()
+                os.fsync(raw.fileno())
+        finally:
+            cursor.close()
+    except repo.errors as e:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise repo.translate_error(e) from e
+    finally:
+        conn.close()
+
+    if entry['rows'] == 0:
+        os.remove(tmp_path)
+        return None
+
+    # Read it back before anything is deleted
+    digest = hashlib.sha256()
+    with open(tmp_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    with gzip.open(tmp_path, 'rt', encoding='utf-8') as f:
+        written = sum(1 for _ in f)
+    if written != entry['rows']:
+        os.remove(tmp_path)
+        raise PartitionError(f"{path}: wrote {written} of {entry['rows']} rows")
+    os.replace(tmp_path, path)
+
+    entry.update({
+        'table_name': table,
+        'partition_name': name,
+        'range_start': start,
+        'range_end': end,
+        'path': f"{table}/{filename}",
+        'bytes': os.path.getsize(path),
+        'sha256': digest.hexdigest(),
+        'archived_at': datetime.now(),
+    })
+    with repo.cursor(commit=True) as cursor:
+        cursor.execute("""
+            INSERT INTO log_archives (table_name, partition_name, range_start, range_end, path, rows_archived,
+                                      min_id, max_id, min_log_date, max_log_date, bytes, sha256, archived_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """, (table, name, start, end, entry['path'], entry['rows'], entry['min_id'], entry['max_id'],
+              entry['min_log_date'], entry['max_log_date'], entry['bytes'], entry['sha256'], entry['archived_at']))
+    return entry
+
+
+def _archive_partition(repo, kind, name, start, end):
+    """MySQL: swap the partition out, archive the swapped-out rows, drop the empty partition."""
+    table, _ = LOG_TABLES[kind]
+    stage = f"{table}_{name}_archive"
+    with repo.cursor(dictionary=False) as cursor:
+        cursor.execute("SHOW TABLES LIKE %s", (stage,))
+        # A stage table left by an interrupted run still holds that run's rows
+        if cursor.fetchone() is None:
+            cursor.execute(f"CREATE TABLE {stage} LIKE {table}")
+            cursor.execute(f"ALTER TABLE {stage} REMOVE PARTITIONING")
+            cursor.execute(f"ALTER TABLE {table} EXCHANGE PARTITION {name} WITH TABLE {stage}")
+    entry = write_archive(repo, kind, stage, name, start, end)
+    with repo.cursor(dictionary=False) as cursor:
+        cursor.execute(f"DROP TABLE {stage}")
+        # Rows written into the month after the swap stay until the next run
+        cursor.execute(f"SELECT COUNT(*) FROM {table} PARTITION ({name})")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute(f"ALTER TABLE {table} DROP PARTITION {name}")
+    return entry
+
+
+def _archive_range(repo, kind, name, start, end):
+    """Any engine: archive the month's rows, then delete them in id windows."""
+    table, _ = LOG_TABLES[kind]
+    where, params = _range_filter(start, end)
+    entry = write_archive(repo, kind, table, name, start, end, f"WHERE {where}", params)
+    if entry is None:
+        return None
+    low = entry['min_id']
+    while low <= entry['max_id']:
+        with repo.cursor(commit=True) as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id >= %s AND id < %s AND {where}", [low, low + DELETE_CHUNK] + params
+            )
+        low += DELETE_CHUNK
+    return entry
+
+
+def archive(repo, retention_months=None, today=None, dry_run=False):
+    """Archive every month before the retention cutoff; returns [summary per month]."""
+    cutoff = retention_cutoff(today, retention_months)
+    results = []
+    for kind, (table, _) in LOG_TABLES.items():
+        with repo.cursor(dictionary=False) as cursor:
+            ranges = archive_ranges(repo, cursor, table, cutoff)
+            partitioned = repo.name == 'mysql' and bool(list_partitions(cursor, table))
+            counts = {}
+            if dry_run:
+                for name, start, end in ranges:
+                    where, params = _range_filter(start, end)
+                    cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {where}", params)
+                    counts[name] = cursor.fetchone()[0]
+        for name, start, end in ranges:
+            if dry_run:
+                results.append({'table': table, 'partition': name, 'rows': counts[name], 'path': None})
+                continue
+            started = time.time()
+            if partitioned:
+                entry = _archive_partition(repo, kind, name, start, end)
+            else:
+                entry = _archive_range(repo, kind, name, start, end)
+            results.append({
+                'table': table,
+                'partition': name,
+                'rows': entry['rows'] if entry else 0,
+                'path': entry['path'] if entry else None,
+                'seconds': round(time.time() - started, 3),
+            })
+    return results
+
+
+# ---- reading archives ----
+def archive_entries(cursor, kinds, start_day=None, end_day=None):
+    """{kind: [manifest rows]} of the archives that may hold rows for the inclusive date range (dictionary cursor)."""
+    tables = {LOG_TABLES[kind][0]: kind for kind in kinds}
+    cursor.execute(
+        f"SELECT table_name, path, min_id, max_id, min_log_date, max_log_date FROM log_archives "
+        f"WHERE table_name IN ({', '.join(['%s'] * len(tables))}) ORDER BY min_id",
+        list(tables)
+    )
+    entries = {}
+    for row in cursor.fetchall():
+        if start_day is not None and as_date(row['max_log_date']) < start_day:
+            continue
+        if end_day is not None and as_date(row['min_log_date']) > end_day:
+            continue
+        entries.setdefault(tables[row['table_name']], []).append(row)
+    return entries
+
+
+def iter_archive(entry, columns, user_id=None, start=None, end=None, after_id=0):
+    """Rows of one archive file in id order, filtered like the export query, with only columns."""
+    with gzip.open(os.path.join(archive_config['path'], entry['path']), 'rt', encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if record['id'] <= after_id or (user_id is not None and record['user_id'] != user_id):
+                continue
+            log_date = as_datetime(record.get('log_date'))
+            if (start is not None or end is not None) and log_date is None:
+                continue
+            if (start is not None and log_date < start) or (end is not None and log_date >= end):
+                continue
+            record['log_date'] = log_date
+            yield {column: record.get(column) for column in columns}
+
+
+def merge_by_id(streams):
+    """Merge id-ordered row streams; a row archived twice (an interrupted run) is yielded once."""
+    last_id = None
+    for row in heapq.merge(*streams, key=itemgetter('id')):
+        if row['id'] != last_id:
+            last_id = row['id']
+            yield row
+
+
+def archive_status(repo):
+    status = {}
+    with repo.cursor() as cursor:
+        cursor.execute("""
+            SELECT table_name, COUNT(*) AS files, SUM(rows_archived) AS rows_archived, SUM(bytes) AS bytes,
+                   MAX(range_end) AS archived_before
+            FROM log_archives GROUP BY table_name
+        """)
+        archives = {row['table_name']: row for row in cursor.fetchall()}
+    with repo.cursor(dictionary=False) as cursor:
+        for table, _ in LOG_TABLES.values():
+            partitions = list_partitions(cursor, table) if repo.name == 'mysql' else []
+            row = archives.get(table) or {}
+            status[table] = {
+                'partitions': len(partitions),
+                'first_partition': partitions[0][0] if partitions else None,
+                'last_partition': partitions[-2][0] if len(partitions) > 1 else None,
+                'archive_files': row.get('files') or 0,
+                'archived_rows': int(row.get('rows_archived') or 0),
+                'archived_bytes': int(row.get('bytes') or 0),
+                'archived_before': as_date(row.get('archived_before')),
+            }
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monthly log partitions and cold archives")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('status', help="partitions and archives per log table")
+    for name, help_text in (('convert', "partition the log tables by month (MySQL, rewrites the tables)"),
+                            ('ensure', "create the next PARTITIONS_AHEAD monthly partitions (MySQL)")):
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument('--dry-run', action='store_true', help="print the DDL only")
+        command.add_argument('--ahead', type=int, help="future months (default PARTITIONS_AHEAD)")
+    archive_parser = sub.add_parser('archive', help="move months past the retention window to archive files")
+    archive_parser.add_argument('--retention-months', type=int, help="default ARCHIVE_RETENTION_MONTHS")
+    archive_parser.add_argument('--dry-run', action='store_true', help="list the months and row counts only")
+    args = parser.parse_args()
+
+    repo = get_repository()
+    try:
+        if args.command == 'status':
+            for table, info in archive_status(repo).items():
+                print(f"{table}: " + ', '.join(f"{key}={value}" for key, value in info.items()))
+        elif args.command in ('convert', 'ensure'):
+            builder = convert_statements if args.command == 'convert' else ensure_statements
+            statements = run_ddl(repo, builder, dry_run=args.dry_run, ahead=args.ahead)
+            for statement in statements:
+                print(statement + ';')
+            if not statements:
+                print("Nothing to do")
+        else:
+            results = archive(repo, args.retention_months, dry_run=args.dry_run)
+            for result in results:
+                target = result['path'] or ('(dry run)' if args.dry_run else '(no rows)')
+                print(f"{result['table']} {result['partition']}: {result['rows']} row(s) -> {target}")
+            if not results:
+                print(f"Nothing older than {retention_cutoff(retention_months=args.retention_months)} to archive")
+    except (PartitionError, StorageError) as e:
+        print(f"Error: {e}")
@@ -0,0 +1,60 @@
+"""
+User profile reads and updates.
+Pages read profiles (name, age, height, weight) through profile_cache, checked
+against the users' profile_version (versions.py), so they skip the users query
+for profiles they have already seen. Log writes and the recompute job use the same
+cache through Repository.current_profiles(), which reads the versions inside their
+own transaction and fetch_profiles() only for misses, so a profile changed through
+another worker is never written into calories_burned. update_profile()
+writes the row; the caller bumps profile_version in the same transaction.
+"""
+
+# Same defaults add_exercise has always used for missing profile values
+DEFAULT_PROFILE = {'weight': 70.0, 'height': 170.0, 'age': 30}
+
+PROFILE_FIELDS = ('name', 'age', 'height', 'weight')
+
+
+def fetch_profiles(cursor, user_ids):
+    """Uncached {user_id: profile} for the given ids with one query."""
+    profiles = {}
+    ids = sorted(set(user_ids))
+    if not ids:
+        return profiles
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"SELECT id, name, age, height, weight FROM users WHERE id IN ({placeholders})", ids)
+    for row in cursor.fetchall():
+        if isinstance(row, dict):  # dictionary cursors
+            row = (row['id'], row['name'], row['age'], row['height'], row['weight'])
+        user_id, name, age, height, weight = row
+        profiles[user_id] = {
+            'name': name,
+            'age': age,
+            'height': float(height) if height is not None else None,
+            'weight': float(weight) if weight is not None else None,
+        }
+    return profiles
+
+
+def burn_inputs(profile):
+    """(weight_kg, height_cm, age) for calculate_calories_burned, with defaults for blanks."""
+    profile = profile or {}
+    return (
+        profile.get('weight') or DEFAULT_PROFILE['weight'],
+        profile.get('height') or DEFAULT_PROFILE['height'],
+        profile.get('age') or DEFAULT_PROFILE['age'],
+    )
+
+
+def bmi(profile):
+    if not profile or not profile.get('weight') or not profile.get('height'):
+        return None
+    return round(profile['weight'] / ((profile['height'] / 100.0) ** 2), 1)
+
+
+def update_profile(cursor, user_id, name, age, height, weight):
+    """Write the profile row; bump profile_version in the same transaction."""
+    cursor.execute(
+        "UPDATE users SET name = %s, age = %s, height = %s, weight = %s WHERE id = %s",
+        (name, age, height, weight, user_id)
+    )
@@ -0,0 +1,207 @@
+"""
+Batch recompute of exercise_log.calories_burned.
+Run after users update their weight/height/age or after EXERCISE_MET_VALUES changes.
+Rows are streamed in primary-key order in fixed-size chunks, calories are computed
+for the whole chunk with NumPy (profiles come from the shared profile cache, checked against
+profile_version for each chunk), and changed rows are written
+back with one UPDATE per chunk. In the same transaction the deltas go to daily_summary
+and, through Repository.apply_rollups (as for any log write), to the compacted
+week/month rows, user_counters and badges, leaderboard_scores and the cache versions.
+Runs on either storage engine.
+
+Usage:
+    python recompute_calories.py --dry-run              # diff report only
+    python recompute_calories.py --user-id 7
+    python recompute_calories.py --chunk-size 50000 --report recompute.json
+"""
+
+import argparse
+import heapq
+import json
+import time
+from collections import defaultdict
+
+import numpy as np
+
+from calories import resolve_met
+from storage import StorageError, get_repository
+from timeranges import as_date
+
+# Same profile defaults as add_exercise
+DEFAULT_WEIGHT_KG = 70.0
+DEFAULT_HEIGHT_CM = 170.0
+
+CHUNK_SQL = """
+    SELECT id, user_id, activity, duration, calories_burned, DATE(log_date) AS day
+    FROM exercise_log
+    WHERE id > %s {user_filter}
+    ORDER BY id
+    LIMIT %s
+"""
+
+
+def _column(values, default):
+    """Float array with NULL / zero values replaced by default (matching add_exercise's falsy check)."""
+    array = np.array(values, dtype=float)
+    return np.where(np.isnan(array) | (array <= 0), default, array)
+
+
+def compute_calories(activities, durations, weights, heights):
+    """
+    Vectorized calculate_calories_burned with add_exercise's profile defaults.
+    add_exercise always passes an age (default 30), so the BMI adjustment always applies.
+    MET values come from the memoized resolve_met(), so repeated activity strings are cheap.
+    """
+    met = np.fromiter((resolve_met(activity or '')[1] for activity in activities), dtype=float, count=len(activities))
+    duration_hours = np.nan_to_num(np.array(durations, dtype=float)) / 60.0
+    weight = _column(weights, DEFAULT_WEIGHT_KG)
+    height_m = _column(heights, DEFAULT_HEIGHT_CM) / 100.0
+
+    calories = met * weight * duration_hours
+    bmi = weight / (height_m ** 2)
+    calories *= np.where(bmi > 25, 1.05, np.where(bmi < 18.5, 0.95, 1.0))
+
+    rounded = np.round(calories, 1)
+    # np.round scales by 10 first, so values sitting on a .x5 boundary can round differently
+    # from the built-in round() used by add_exercise; redo just those with round()
+    ties = np.flatnonzero(np.abs((calories * 10) % 1 - 0.5) < 1e-6)
+    for i in ties:
+        rounded[i] = round(float(calories[i]), 1)
+    return rounded
+
+
+def fetch_chunk(cursor, after_id, chunk_size, user_id=None):
+    if user_id is None:
+        cursor.execute(CHUNK_SQL.format(user_filter=''), (after_id, chunk_size))
+    else:
+        cursor.execute(CHUNK_SQL.format(user_filter='AND user_id = %s'), (after_id, user_id, chunk_size))
+    return cursor.fetchall()
+
+
+def write_chunk(cursor, ids, values):
+    """Update a chunk of rows with a single CASE statement instead of one UPDATE per row."""
+    cases = ' '.join(['WHEN %s THEN %s'] * len(ids))
+    placeholders = ', '.join(['%s'] * len(ids))
+    params = [item for pair in zip(ids, values) for item in pair] + list(ids)
+    cursor.execute(
+        f"UPDATE exercise_log SET calories_burned = CASE id {cases} END WHERE id IN ({placeholders})",
+        params
+    )
+
+
+def recompute(repo, user_id=None, chunk_size=20000, dry_run=False, tolerance=0.05, sample_size=20):
+    """
+    Recompute calories_burned for one user (user_id) or the whole table.
+    Returns a report dict; with dry_run nothing is written. Raises StorageError.
+    """
+    started = time.time()
+    report = {
+        'mode': 'user' if user_id is not None else 'all',
+        'user_id': user_id,
+        'dry_run': dry_run,
+        'rows_scanned': 0,
+        'rows_changed': 0,
+        'chunks': 0,
+        'total_delta': 0.0,
+        'by_activity': {},
+        'largest_changes': [],
+    }
+    by_activity = defaultdict(lambda: {'rows': 0, 'delta': 0.0})
+    largest = []  # min-heap of (abs_delta, id, row_summary)
+
+    after_id = 0
+    while True:
+        with repo.cursor(dictionary=False) as cursor:
+            rows = fetch_chunk(cursor, after_id, chunk_size, user_id)
+            if not rows:
+                break
+            ids, user_ids, activities, durations, stored, days = zip(*rows)
+            after_id = ids[-1]
+
+            # Only users whose profile changed since it was cached are read from the users table
+            profiles = repo.current_profiles(cursor, {uid for uid in user_ids if uid is not None})
+        weights = [profiles.get(uid, {}).get('weight') for uid in user_ids]
+        heights = [profiles.get(uid, {}).get('height') for uid in user_ids]
+
+        new_values = compute_calories(activities, durations, weights, heights)
+        old_values = np.nan_to_num(np.array(stored, dtype=float))
+        deltas = new_values - old_values
+        changed = np.flatnonzero(np.abs(deltas) > tolerance)
+
+        report['rows_scanned'] += len(rows)
+        report['chunks'] += 1
+
+        if changed.size:
+            rollup_deltas = defaultdict(float)
+            for i in changed:
+                delta = float(deltas[i])
+                stats = by_activity[(activities[i] or '').lower().strip()]
+                stats['rows'] += 1
+                stats['delta'] += delta
+                if days[i] is not None and user_ids[i] is not None:
+                    rollup_deltas[(user_ids[i], as_date(days[i]))] += delta
+                change = {
+                    'id': ids[i], 'user_id': user_ids[i], 'activity': activities[i],
+                    'old': round(float(old_values[i]), 1), 'new': float(new_values[i]),
+                }
+                if len(largest) < sample_size:
+                    heapq.heappush(largest, (abs(delta), ids[i], change))
+                elif abs(delta) > largest[0][0]:
+                    heapq.heapreplace(largest, (abs(delta), ids[i], change))
+
+            report['rows_changed'] += int(changed.size)
+            report['total_delta'] += float(deltas[changed].sum())
+
+            if not dry_run:
+                rollups = [(uid, day, {'calories_burned': delta}) for (uid, day), delta in rollup_deltas.items()]
+                with repo.cursor(dictionary=False, commit=True) as cursor:
+                    write_chunk(cursor, [ids[i] for i in changed], [float(new_values[i]) for i in changed])
+                    repo.upsert_rollups(cursor, rollups)
+                    # The days already had logs, so streaks cannot change
+                    repo.apply_rollups(cursor, rollups, new_days=False)
+
+    report['total_delta'] = round(report['total_delta'], 1)
+    report['by_activity'] = {
+        activity: {'rows': stats['rows'], 'delta': round(stats['delta'], 1)}
+        for activity, stats in sorted(by_activity.items(), key=lambda item: -abs(item[1]['delta']))
+    }
+    report['largest_changes'] = [change for _, _, change in sorted(largest, reverse=True)]
+    report['seconds'] = round(time.time() - started, 2)
+    report['rows_per_second'] = int(report['rows_scanned'] / report['seconds']) if report['seconds'] else report['rows_scanned']
+    return report
+
+
+def print_report(report):
+    action = "Would update" if report['dry_run'] else "Updated"
+    print(f"Scanned {report['rows_scanned']} row(s) in {report['chunks']} chunk(s), "
+          f"{report['seconds']}s ({report['rows_per_second']} rows/s)")
+    print(f"{action} {report['rows_changed']} row(s), total delta {report['total_delta']:+} kcal")
+    if report['by_activity']:
+        print("\nBy activity:")
+        for activity, stats in list(report['by_activity'].items())[:20]:
+            print(f"  {activity or '(blank)'}: {stats['rows']} row(s), {stats['delta']:+} kcal")
+    if report['largest_changes']:
+        print("\nLargest changes:")
+        for change in report['largest_changes']:
+            print(f"  id {change['id']} (user {change['user_id']}, {change['activity']}): "
+                  f"{change['old']} -> {change['new']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute exercise_log.calories_burned")
+    parser.add_argument('--user-id', type=int, help="only recompute this user's rows")
+    parser.add_argument('--chunk-size', type=int, default=20000, help="rows per chunk / transaction")
+    parser.add_argument('--dry-run', action='store_true', help="report differences without writing")
+    parser.add_argument('--tolerance', type=float, default=0.05, help="ignore differences up to this many kcal")
+    parser.add_argument('--report', help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    try:
+        result = recompute(get_repository(), user_id=args.user_id, chunk_size=args.chunk_size,
+                           dry_run=args.dry_run, tolerance=args.tolerance)
+        print_report(result)
+        if args.report:
+            with open(args.report, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=2, default=str)
+    except StorageError as e:
+        print(f"Error: {e}")
@@ -0,0 +1,190 @@
+"""
+Per-(user_id, date) rollups kept in the daily_summary table.
+add_food and add_exercise add their totals to the day's row in the same
+transaction as the log insert, so the dashboard reads one row per day instead
+of aggregating the raw logs.
+
+Rebuild the rollups from the raw logs (after migrating, or to repair drift).
+Months moved to archive files by partitions.py are no longer in the logs, so a
+rebuild keeps the rollups of days before the archive horizon as they are:
+    python rollups.py rebuild
+    python rollups.py rebuild --user-id 7
+"""
+
+import argparse
+import time
+
+from config import db_config
+
+SUMMARY_COLUMNS = (
+    'total_calories_consumed',
+    'food_items',
+    'total_calories_burned',
+    'exercise_minutes',
+    'exercise_sessions',
+    'total_distance_walked',
+    'total_carbon_saved',
+)
+
+UPSERT_SQL = """
+    INSERT INTO daily_summary (user_id, date, {columns})
+    VALUES (%s, {day}, {placeholders})
+    ON DUPLICATE KEY UPDATE {updates}
+""".format(
+    columns=', '.join(SUMMARY_COLUMNS),
+    day='{day}',
+    placeholders=', '.join(['%s'] * len(SUMMARY_COLUMNS)),
+    updates=', '.join(f"{col} = {col} + VALUES({col})" for col in SUMMARY_COLUMNS),
+)
+
+
+def _summary_values(calories_in=0, food_items=0, calories_burned=0, minutes=0,
+                    sessions=0, distance=0, carbon_saved=0):
+    return (calories_in or 0, food_items, calories_burned or 0, minutes or 0,
+            sessions, distance or 0, carbon_saved or 0)
+
+
+def upsert_daily_summary(cursor, user_id, day=None, **totals):
+    """
+    Add totals to the user's daily_summary row, creating it if needed.
+    day defaults to the database's CURDATE(), matching log_date's CURRENT_TIMESTAMP default.
+    Does not commit; call it inside the same transaction as the log insert.
+    """
+    if day is None:
+        cursor.execute(UPSERT_SQL.format(day='CURDATE()'), (user_id,) + _summary_values(**totals))
+    else:
+        cursor.execute(UPSERT_SQL.format(day='%s'), (user_id, day) + _summary_values(**totals))
+
+
+def upsert_params(rows):
+    """(user_id, day, totals_dict) rows -> parameter tuples for UPSERT_SQL with an explicit day."""
+    return [(user_id, day) + _summary_values(**totals) for user_id, day, totals in rows]
+
+
+def upsert_daily_summaries(cursor, rows):
+    """
+    Batched upsert for imports: rows is an iterable of (user_id, day, totals_dict).
+    """
+    params = upsert_params(rows)
+    if params:
+        cursor.executemany(UPSERT_SQL.format(day='%s'), params)
+
+
+REBUILD_SQL = """
+    INSERT INTO daily_summary (user_id, date, {columns})
+    SELECT user_id, day,
+           SUM(calories_in), SUM(food_items), SUM(calories_burned), SUM(minutes),
+           SUM(sessions), SUM(distance), SUM(carbon_saved)
+    FROM (
+        SELECT user_id, DATE(log_date) AS day,
+               IFNULL(SUM(calories), 0) AS calories_in, COUNT(*) AS food_items,
+               0 AS calories_burned, 0 AS minutes, 0 AS sessions, 0 AS distance, 0 AS carbon_saved
+        FROM food_log
+        WHERE user_id = %s {since}
+        GROUP BY user_id, DATE(log_date)
+        UNION ALL
+        SELECT user_id, DATE(log_date),
+               0, 0,
+               IFNULL(SUM(calories_burned), 0), IFNULL(SUM(duration), 0), COUNT(*), 0, 0
+        FROM exercise_log
+        WHERE user_id = %s {since}
+        GROUP BY user_id, DATE(log_date)
+        UNION ALL
+        SELECT user_id, DATE(log_date),
+               0, 0, 0, 0, 0,
+               IFNULL(SUM(distance_walked), 0), IFNULL(SUM(carbon_saved), 0)
+        FROM environment_log
+        WHERE user_id = %s {since}
+        GROUP BY user_id, DATE(log_date)
+    ) AS logs
+    WHERE day IS NOT NULL
+    GROUP BY user_id, day
+""".replace('{columns}', ', '.join(SUMMARY_COLUMNS))
+
+
+def archive_horizon(cursor):
+    """First day still in the logs after archiving (partitions.py), or None when nothing is archived."""
+    cursor.execute("SELECT MAX(range_end) FROM log_archives")
+    row = cursor.fetchone()
+    return row[0] if row and row[0] else None
+
+
+def rebuild_user(conn, user_id, horizon=None):
+    """
+    Recompute one user's rollups from the raw logs in a single transaction.
+    Days before horizon (archived logs) keep their rollups.
+    """
+    cursor = conn.cursor()
+    try:
+        if horizon is None:
+            cursor.execute("DELETE FROM daily_summary WHERE user_id = %s", (user_id,))
+            cursor.execute(REBUILD_SQL.replace('{since}', ''), (user_id, user_id, user_id))
+        else:
+            cursor.execute("DELETE FROM daily_summary WHERE user_id = %s AND date >= %s", (user_id, horizon))
+            cursor.execute(REBUILD_SQL.replace('{since}', 'AND log_date >= %s'),
+                           (user_id, horizon, user_id, horizon, user_id, horizon))
+        days = cursor.rowcount
+        # Retires the user's cached dashboards in every worker (versions.py)
+        cursor.execute(
+            "INSERT INTO user_versions (user_id, data_version) VALUES (%s, 1) "
+            "ON DUPLICATE KEY UPDATE data_version = data_version + 1",
+            (user_id,)
+        )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return days
+
+
+def rebuild_all(conn, batch_size=500):
+    """Rebuild every user's rollups, one short transaction per user."""
+    cursor = conn.cursor()
+    horizon = archive_horizon(cursor)
+    users = days = 0
+    last_id = 0
+    while True:
+        cursor.execute(
+            "SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s",
+            (last_id, batch_size)
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            break
+        for user_id in ids:
+            days += rebuild_user(conn, user_id, horizon)
+            users += 1
+        last_id = ids[-1]
+    cursor.close()
+    return users, days
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the daily_summary rollups")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild = sub.add_parser('rebuild', help="recompute rollups from food/exercise/environment logs")
+    rebuild.add_argument('--user-id', type=int, help="only rebuild this user")
+    args = parser.parse_args()
+
+    # Imported here: the web app imports this module on every storage engine
+    import mysql.connector
+
+    conn = mysql.connector.connect(**db_config)
+    started = time.time()
+    try:
+        if args.user_id is not None:
+            cursor = conn.cursor()
+            horizon = archive_horizon(cursor)
+            cursor.close()
+            days = rebuild_user(conn, args.user_id, horizon)
+            print(f"Rebuilt {days} day(s) for user {args.user_id}")
+        else:
+            users, days = rebuild_all(conn)
+            print(f"Rebuilt {days} day(s) for {users} user(s)")
+        print(f"Done in {time.time() - started:.1f}s")
+    except mysql.connector.Error as e:
+        print(f"Error: {e}")
+    finally:
+        conn.close()
@@ -0,0 +1,234 @@
+"""
+Production launcher for the Flask app (app.py keeps the debug dev server).
+
+gunicorn (Linux/macOS, `pip install gunicorn`) runs a pre-fork master with
+WEB_WORKERS worker processes:
+- WORKER_CLASS=sync: one request at a time per process, 2 x CPUs + 1 workers by
+  default. A request running longer than WORKER_TIMEOUT gets its worker restarted,
+  so long exports and imports want gthread.
+- WORKER_CLASS=gthread: WEB_THREADS threads per worker for I/O-bound routes (exports,
+  imports, database waits), one worker per CPU by default. Threads share the
+  worker's pool connections, so keep WEB_THREADS near DB_POOL_SIZE + DB_POOL_MAX_OVERFLOW.
+- With SERVER_PRELOAD=1 the master imports the app and compiles the templates, URL
+  matcher and activity lookups once (warm_app); workers inherit them through fork.
+  Each worker then opens DB_POOL_SIZE connections (warm_worker) before it accepts
+  requests, and logs its startup time and resident memory. /metrics exports both
+  as fitness_worker gauges.
+- `python serve.py reload` sends SIGHUP: the master starts new workers and stops the
+  old ones once their requests finish (GRACEFUL_TIMEOUT). Preloaded code is not
+  re-imported; restart the master, or run with SERVER_PRELOAD=0, to pick up code.
+
+Without gunicorn (e.g. on Windows) it falls back to werkzeug's threaded server:
+one process, a thread per request, no debugger or reloader, same warm-up.
+
+Usage:
+    python serve.py                               # SERVER_BIND, workers from config
+    python serve.py --workers 4 --worker-class gthread --threads 8
+    python serve.py --server werkzeug
+    python serve.py reload
+    python serve.py check                         # warm up once, print timings and RSS, exit
+"""
+
+import argparse
+import logging
+import os
+import signal
+import sys
+import time
+
+from config import pool_config, server_config
+from metrics import mark_worker_ready, rss_bytes, worker_stats
+
+try:
+    import gunicorn.app.base
+except ImportError:  # optional; the werkzeug fallback is used instead
+    gunicorn = None
+
+logger = logging.getLogger('serve')
+WORKER_CLASSES = ('sync', 'gthread')
+
+_started = time.perf_counter()
+_worker_forked = None
+
+
+def default_workers(worker_class, cpus=None):
+    """Processes per host: sync workers block on the database, so run more of them than there are CPUs."""
+    cpus = cpus or os.cpu_count() or 1
+    return 2 * cpus + 1 if worker_class == 'sync' else cpus
+
+
+def _mb(value):
+    return f"{value / (1024 * 1024):.1f} MB" if value else "n/a"
+
+
+def warm_app(app):
+    """Work every process can share through fork: templates, the URL matcher, the MET lookup table."""
+    from calories import EXERCISE_MET_VALUES, resolve_met
+
+    started = time.perf_counter()
+    templates = app.jinja_env.list_templates()
+    for name in templates:
+        app.jinja_env.get_template(name)  # compiled into the environment's cache
+    app.url_map.update()
+    for activity in EXERCISE_MET_VALUES:
+        resolve_met(activity)
+    return {'templates': len(templates), 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def warm_worker():
+    """Per-process work that must not cross fork: the connection pools and background threads."""
+    from async_reads import get_async_reader
+    from compaction import get_compaction_scheduler
+    from storage import StorageError, get_repository
+
+    started = time.perf_counter()
+    repo = get_repository()
+    try:
+        connections = repo.warm_up(pool_config['pool_size'] if repo.name == 'mysql' else 1)
+        async_reader = get_async_reader(repo)
+        if async_reader is not None:
+            connections += async_reader.submit(async_reader.warm()).result()
+    except StorageError as e:
+        # Serve anyway; requests will retry the connection and report the error themselves
+        logger.warning("warm-up could not connect to the database: %s", e)
+        connections = 0
+    get_compaction_scheduler()
+    return {'connections': connections, 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def load_app():
+    from app import app
+
+    result = warm_app(app)
+    logger.info("app loaded in %.2fs (%d templates compiled in %.3fs), RSS %s",
+                time.perf_counter() - _started, result['templates'], result['seconds'], _mb(rss_bytes()))
+    return app
+
+
+def worker_ready(forked_at):
+    """Warm the current process and record how long it took to become ready."""
+    result = warm_worker()
+    startup = time.perf_counter() - forked_at
+    mark_worker_ready(startup)
+    logger.info("worker %d ready in %.2fs (%d DB connection(s) in %.3fs), RSS %s",
+                os.getpid(), startup, result['connections'], result['seconds'], _mb(rss_bytes()))
+
+
+def capacity_note(options):
+    workers = options['workers']
+    threads = options['threads'] if options['worker_class'] == 'gthread' else 1
+    per_worker = pool_config['pool_size'] + pool_config['max_overflow']
+    logger.info("%d worker(s) x %d thread(s); up to %d DB connection(s) (%d per worker)",
+                workers, threads, workers * per_worker, per_worker)
+    if threads > per_worker:
+        logger.warning("WEB_THREADS=%d exceeds the %d pool connections per worker; threads will queue for them",
+                       threads, per_worker)
+
+
+# ---- gunicorn ----
+def _post_fork(server, worker):
+    global _worker_forked
+    _worker_forked = time.perf_counter()
+
+
+def _post_worker_init(worker):
+    worker_ready(_worker_forked or _started)
+
+
+def _when_ready(server):
+    logger.info("master %d listening on %s after %.2fs", os.getpid(), ', '.join(server.cfg.bind),
+                time.perf_counter() - _started)
+
+
+def run_gunicorn(options):
+    class Server(gunicorn.app.base.BaseApplication):
+        def __init__(self, settings):
+            self.settings = settings
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.settings.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_app()
+
+    Server({
+        'bind': options['bind'],
+        'workers': options['workers'],
+        'worker_class': options['worker_class'],
+        'threads': options['threads'],
+        'timeout': options['timeout'],
+        'graceful_timeout': options['graceful_timeout'],
+        'max_requests': options['max_requests'],
+        'max_requests_jitter': options['max_requests'] // 10,  # workers do not all restart together
+        'preload_app': options['preload'],
+        'pidfile': options['pidfile'],
+        'post_fork': _post_fork,
+        'post_worker_init': _post_worker_init,
+        'when_ready': _when_ready,
+    }).run()
+
+
+# ---- werkzeug fallback ----
+def run_werkzeug(options):
+    from werkzeug.serving import run_simple
+
+    host, _, port = options['bind'].rpartition(':')
+    app = load_app()
+    worker_ready(_started)
+    run_simple(host or '127.0.0.1', int(port), app, threaded=True, use_debugger=False, use_reloader=False)
+
+
+def reload_server(pidfile):
+    """Graceful reload of a running gunicorn master (SIGHUP); the werkzeug fallback has no pid file."""
+    with open(pidfile) as f:
+        pid = int(f.read().strip())
+    os.kill(pid, signal.SIGHUP)
+    return pid
+
+
+def check():
+    """Load and warm the app in this process, as a worker would; returns the timings."""
+    app = load_app()
+    worker_ready(_started)
+    return {'routes': len(list(app.url_map.iter_rules())), **worker_stats()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the app with a production server")
+    parser.add_argument('command', nargs='?', choices=('serve', 'reload', 'check'), default='serve')
+    parser.add_argument('--server', choices=('auto', 'gunicorn', 'werkzeug'), default=server_config['server'])
+    parser.add_argument('--bind', default=server_config['bind'], help="host:port")
+    parser.add_argument('--workers', type=int, default=server_config['workers'],
+                        help="processes (default from CPU count and worker class)")
+    parser.add_argument('--worker-class', choices=WORKER_CLASSES, default=server_config['worker_class'])
+    parser.add_argument('--threads', type=int, default=server_config['threads'], help="threads per gthread worker")
+    parser.add_argument('--no-preload', dest='preload', action='store_false', default=server_config['preload'],
+                        help="import the app in each worker (SIGHUP then reloads code)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(levelname)s %(message)s")
+    options = dict(server_config, bind=args.bind, worker_class=args.worker_class, threads=args.threads,
+                   preload=args.preload)
+    options['workers'] = args.workers or default_workers(args.worker_class)
+
+    if args.command == 'reload':
+        try:
+            print(f"Sent SIGHUP to {reload_server(options['pidfile'])}")
+        except (OSError, ValueError) as e:
+            print(f"Error: no running server to reload ({e})")
+            sys.exit(1)
+    elif args.command == 'check':
+        for key, value in check().items():
+            print(f"{key}: {value}")
+    elif args.server == 'werkzeug' or (args.server == 'auto' and gunicorn is None):
+        if args.server == 'auto':
+            logger.info("gunicorn is not installed; serving with werkzeug's threaded server (one process)")
+        run_werkzeug(options)
+    elif gunicorn is None:
+        print("Error: gunicorn is not installed (pip install gunicorn)")
+        sys.exit(1)
+    else:
+        capacity_note(options)
+        run_gunicorn(options)
@@ -0,0 +1,247 @@
+"""
+Opt-in slow-query log (SLOW_QUERY_LOG=1).
+Statements run through the instrumented cursor (metrics.py) that take longer than
+SLOW_QUERY_MS are handed to a background thread. The thread runs EXPLAIN for them on
+its own connection and appends one JSON line per statement to a rotating log file.
+Each process writes its own file (SLOW_QUERY_LOG_PATH.<pid>), since a rotating
+handler must not share a file with other workers' rotations; recent() merges them.
+The log records the SQL, the shapes of the parameters (types and lengths, never the
+values), the duration, the route and the plan. The request thread only pays for a
+queue put.
+
+/admin/slow_queries shows the most recent entries to ADMIN_USER_IDS.
+"""
+
+import glob
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from decimal import Decimal
+from logging.handlers import RotatingFileHandler
+
+from config import db_config, slow_query_config
+
+_EXPLAINABLE = re.compile(r'^\s*(?:/\*.*?\*/\s*)?(SELECT|UPDATE|DELETE|WITH)\b', re.IGNORECASE | re.DOTALL)
+_WHITESPACE = re.compile(r'\s+')
+# Files (and backups) of exited worker processes are deleted once untouched this long
+STALE_LOG_SECONDS = 7 * 24 * 3600
+
+
+def param_shape(value):
+    if value is None:
+        return 'null'
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    if isinstance(value, (list, tuple, set)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def params_shape(params, many=False):
+    """Types/lengths of the statement parameters; executemany reports the row count and first row."""
+    if params is None:
+        return None
+    if many:
+        rows = list(params) if not isinstance(params, (list, tuple)) else params
+        return {'rows': len(rows), 'first': params_shape(rows[0]) if rows else None}
+    if isinstance(params, dict):
+        return {key: param_shape(value) for key, value in params.items()}
+    return [param_shape(value) for value in params]
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode('utf-8', 'replace')
+    return str(value)
+
+
+class SlowQueryLog:
+    def __init__(self, path, threshold_ms=200, explain=True, explain_interval=300,
+                 max_bytes=5 * 1024 * 1024, backup_count=3, queue_size=100):
+        self.path = path
+        self.threshold = threshold_ms / 1000.0
+        self.explain = explain
+        self.explain_interval = explain_interval
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._explained = {}  # sql -> (monotonic time, plan) so a hot slow query is explained once per interval
+        self._conn = None
+        self._connect = None  # MySQL unless use_engine() picks another engine
+        self._explain_prefix = "EXPLAIN "
+        self._explain_errors = ()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._handler_pid = None
+
+        self.logger = logging.getLogger('fitness.slow_queries')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+
+    def _log_files(self):
+        """{path: pid} of every process's log file and rotated backups."""
+        files = {}
+        for path in glob.glob(glob.escape(self.path) + '.*'):
+            pid = path[len(self.path) + 1:].split('.')[0]
+            if pid.isdigit():
+                files[path] = int(pid)
+        return files
+
+    def _open_handler(self):
+        """This process's handler; called from the writer thread, which does not survive a fork."""
+        pid = os.getpid()
+        if self._handler_pid == pid:
+            return
+        for handler in list(self.logger.handlers):
+            # Inherited from the parent process: closing only releases this process's descriptor
+            self.logger.removeHandler(handler)
+            handler.close()
+        handler = RotatingFileHandler(f"{self.path}.{pid}", maxBytes=self.max_bytes,
+                                      backupCount=self.backup_count, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        self.logger.addHandler(handler)
+        self._handler_pid = pid
+
+        cutoff = time.time() - STALE_LOG_SECONDS
+        for path, file_pid in self._log_files().items():
+            try:
+                if file_pid != pid and os.path.getmtime(path) < cutoff and not _pid_alive(file_pid):
+                    os.remove(path)
+            except OSError:
+                continue
+
+    def use_engine(self, connect, errors, explain_prefix="EXPLAIN "):
+        """Run EXPLAIN through another storage engine (e.g. SQLite's EXPLAIN QUERY PLAN)."""
+        self._connect = connect
+        self._explain_prefix = explain_prefix
+        self._explain_errors = errors
+        self._conn = None
+
+    def _use_mysql(self):
+        # Imported on the first EXPLAIN so the SQLite engine runs without the MySQL driver
+        import mysql.connector
+        self.use_engine(lambda: mysql.connector.connect(**db_config), errors=(mysql.connector.Error,))
+
+    def record(self, name, sql, params, seconds, many=False, route=None):
+        """Called from the request thread for every finished statement; cheap below the threshold."""
+        if seconds < self.threshold:
+            return
+        entry = {
+            'at': datetime.now().isoformat(timespec='milliseconds'),
+            'pid': os.getpid(),
+            'name': name,
+            'route': route,
+            'duration_ms': round(seconds * 1000, 2),
+            'sql': _WHITESPACE.sub(' ', sql).strip(),
+            'params': params_shape(params, many),
+        }
+        self._start()
+        try:
+            # Parameters travel to the worker for EXPLAIN only; they are never written out
+            self._queue.put_nowait((entry, sql, None if many else params))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='slow-query-log', daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        self._open_handler()
+        while True:
+            entry, sql, params = self._queue.get()
+            if self.explain and _EXPLAINABLE.match(sql):
+                entry['explain'] = self._explain(sql, params)
+            self.logger.info(json.dumps(entry, default=_json_default))
+
+    def _explain(self, sql, params):
+        now = time.monotonic()
+        cached = self._explained.get(sql)
+        if cached is not None and now - cached[0] < self.explain_interval:
+            return cached[1]
+        if self._connect is None:
+            self._use_mysql()
+        try:
+            if self._conn is None or not self._conn.is_connected():
+                # Separate connection so EXPLAIN never takes a pool slot from requests
+                self._conn = self._connect()
+            cursor = self._conn.cursor(dictionary=True)
+            try:
+                cursor.execute(self._explain_prefix + sql, params)
+                plan = cursor.fetchall()
+            finally:
+                cursor.close()
+            self._conn.rollback()
+        except self._explain_errors as e:
+            plan = {'error': str(e)}
+        if len(self._explained) > 1000:
+            self._explained.clear()
+        self._explained[sql] = (now, plan)
+        return plan
+
+    def recent(self, limit=200):
+        """Newest-first entries from every process's current log file (not the rotated backups)."""
+        entries = []
+        for path in self._log_files():
+            if not path[len(self.path) + 1:].isdigit():
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    lines = deque(f, maxlen=limit)
+            except FileNotFoundError:
+                continue  # removed since the listing
+            for line in lines:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+        entries.sort(key=lambda entry: entry.get('at', ''), reverse=True)
+        return entries[:limit]
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def summarize(entries):
+    """Per query name: count, max and average duration, worst first."""
+    groups = {}
+    for entry in entries:
+        group = groups.setdefault(entry.get('name'), {'name': entry.get('name'), 'count': 0, 'total_ms': 0.0,
+                                                       'max_ms': 0.0, 'sql': entry.get('sql')})
+        group['count'] += 1
+        group['total_ms'] += entry.get('duration_ms', 0)
+        group['max_ms'] = max(group['max_ms'], entry.get('duration_ms', 0))
+    for group in groups.values():
+        group['avg_ms'] = round(group['total_ms'] / group['count'], 2)
+    return sorted(groups.values(), key=lambda group: -group['total_ms'])
+
+
+slow_query_log = SlowQueryLog(
+    slow_query_config['path'],
+    threshold_ms=slow_query_config['threshold_ms'],
+    explain=slow_query_config['explain'],
+    max_bytes=slow_query_config['max_bytes'],
+    backup_count=slow_query_config['backup_count'],
+) if slow_query_config['enabled'] else None
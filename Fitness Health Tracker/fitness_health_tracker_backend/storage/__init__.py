@@ -0,0 +1,47 @@
+"""
+Storage layer: the routes read and write through a Repository instead of issuing
+SQL themselves.
+
+- MySQLRepository (storage/mysql_repository.py) uses the connection pool; this is
+  the default.
+- SQLiteRepository (storage/sqlite_repository.py) is an embedded engine in WAL
+  mode with the same tables and indexes, for single-node deployments and
+  zero-setup test / benchmark runs.
+
+Select the engine with STORAGE_BACKEND=mysql|sqlite (SQLITE_PATH for the database
+file). Engines are imported on first use so the SQLite engine never needs the MySQL
+driver to be configured and vice versa.
+"""
+
+import threading
+
+from config import storage_config
+
+from storage.errors import StorageError
+
+BACKENDS = ('mysql', 'sqlite')
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def create_repository(backend=None, **options):
+    backend = backend or storage_config['backend']
+    if backend == 'mysql':
+        from storage.mysql_repository import MySQLRepository
+        return MySQLRepository(**options)
+    if backend == 'sqlite':
+        from storage.sqlite_repository import SQLiteRepository
+        options.setdefault('path', storage_config['sqlite_path'])
+        return SQLiteRepository(**options)
+    raise ValueError(f"STORAGE_BACKEND must be one of {', '.join(BACKENDS)}, not {backend!r}")
+
+
+def get_repository():
+    """Process-wide repository for the configured backend (engines handle forks themselves)."""
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                _repository = create_repository()
+    return _repository
@@ -0,0 +1,279 @@
+"""
+Repository base class: every data access the routes need, written once in SQL
+that MySQL and SQLite both accept. Engines provide connections, the upsert syntax
+(the part that differs between them), the summary bucket expressions and the
+mapping of their driver errors to StorageError.
+"""
+
+from contextlib import contextmanager
+
+from badges import fetch_badges, update_badges
+from bulk_import import insert_batch
+from compaction import fetch_compacted_through, refresh_periods
+from cache import profile_cache
+from dashboard_data import fetch_dashboard_data
+from leaderboard import BOARDS, PERIODS, fetch_score, fetch_top, get_snapshot, update_leaderboards
+from profiles import fetch_profiles, update_profile
+from streaks import fetch_streak, update_streaks
+from summary import GRANULARITIES, PERIOD_TABLES, fetch_last_modified, fetch_summary
+from timeranges import as_datetime, period_start
+from versions import bump_versions, fetch_profile_versions, fetch_versions
+
+from storage.errors import StorageError
+
+
+class Repository:
+    name = None
+    errors = ()  # driver exception types that are translated to StorageError
+    permanent_errors = ()  # the subset a retry cannot fix; translated with permanent=True
+    summary_buckets = GRANULARITIES
+    locking_read = ""  # suffix that locks the selected rows until commit (SQLite locks the whole file on write)
+
+    # ---- engine hooks ----
+    def connect(self):
+        """Connection for a request; close() releases it."""
+        raise NotImplementedError
+
+    def connect_direct(self):
+        """Connection for long-running work (exports) that should not hold a request slot."""
+        return self.connect()
+
+    def upsert_rollups(self, cursor, rows):
+        """Add (user_id, day, totals_dict) rows to daily_summary; no commit."""
+        raise NotImplementedError
+
+    def upsert_clause(self, conflict_columns, columns, additive=False):
+        """
+        Tail of an INSERT that updates columns on a unique-key conflict, either
+        replacing them or adding the inserted values (additive=True).
+        """
+        raise NotImplementedError
+
+    def stats(self):
+        return {'backend': self.name}
+
+    def warm_up(self, connections=1):
+        """
+        Open connections at the same time (so a pool keeps that many idle) and run a
+        round trip on each. Returns the number opened.
+        """
+        opened = []
+        try:
+            for _ in range(connections):
+                conn = self.connect()
+                opened.append(conn)
+                cursor = conn.cursor()
+                cursor.execute("/* warm_up */ SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+        except self.errors as e:
+            raise self.translate_error(e) from e
+        finally:
+            for conn in opened:
+                conn.close()
+        return len(opened)
+
+    def translate_error(self, error):
+        return StorageError(str(error), permanent=isinstance(error, self.permanent_errors))
+
+    @contextmanager
+    def cursor(self, dictionary=True, commit=False):
+        """
+        Cursor on a fresh connection, closed afterwards. With commit=True the work is
+        committed on success; driver errors are rolled back and raised as StorageError.
+        """
+        try:
+            conn = self.connect()
+        except self.errors as e:
+            raise self.translate_error(e) from e
+        cursor = None
+        try:
+            cursor = conn.cursor(dictionary=dictionary)
+            yield cursor
+            if commit:
+                conn.commit()
+        except self.errors as e:
+            try:
+                conn.rollback()
+            except self.errors:
+                pass
+            raise self.translate_error(e) from e
+        finally:
+            if cursor is not None:
+                cursor.close()
+            conn.close()
+
+    # ---- users ----
+    def find_user_by_email(self, email):
+        with self.cursor() as cursor:
+            cursor.execute(
+                "SELECT id, name, email, password, age, height, weight FROM users WHERE email = %s", (email,)
+            )
+            return cursor.fetchone()
+
+    def create_user(self, name, email, password_hash, age=None, height=None, weight=None):
+        with self.cursor(commit=True) as cursor:
+            cursor.execute(
+                "INSERT INTO users (name, email, password, age, height, weight) VALUES (%s, %s, %s, %s, %s, %s)",
+                (name, email, password_hash, age, height, weight)
+            )
+            return cursor.lastrowid
+
+    def get_profiles(self, user_ids, versions):
+        """
+        Cached {user_id: profile}, checked against versions ({user_id: profile_version});
+        a connection is only opened for cache misses.
+        """
+        def load(missing):
+            with self.cursor(dictionary=False) as cursor:
+                return fetch_profiles(cursor, missing)
+        return profile_cache.get_many(user_ids, load, versions)
+
+    def get_profile(self, user_id, versions=None):
+        """
+        The user's profile, or None. Served from the cache when versions (from
+        self.versions) are given, otherwise read from the users table.
+        """
+        if versions is not None:
+            return self.get_profiles([user_id], {user_id: versions[1]}).get(user_id)
+        with self.cursor(dictionary=False) as cursor:
+            return fetch_profiles(cursor, [user_id]).get(user_id)
+
+    def current_profiles(self, cursor, user_ids):
+        """
+        {user_id: profile} as of cursor's transaction: cached profiles whose profile_version
+        still matches, and the misses read from the users table on the same cursor.
+        """
+        versions = fetch_profile_versions(cursor, user_ids)
+        return profile_cache.get_many(user_ids, lambda missing: fetch_profiles(cursor, missing), versions)
+
+    def update_profile(self, user_id, name, age, height, weight):
+        with self.cursor(dictionary=False, commit=True) as cursor:
+            update_profile(cursor, user_id, name, age, height, weight)
+            bump_versions(self, cursor, [user_id], 'profile_version')
+        # Other workers see the new profile_version; drop this worker's entry right away
+        profile_cache.invalidate(user_id)
+
+    # ---- logs ----
+    def write_batch(self, food_rows, exercise_rows):
+        """
+        Insert prepared food/exercise rows (bulk_import's row format), their daily
+        rollups (and the week/month rollups of back-dated days already compacted), the
+        users' streaks, counters, badge awards, leaderboard scores and cache versions
+        in one transaction. Returns the set of affected user_ids.
+        """
+        with self.cursor(dictionary=False, commit=True) as cursor:
+            # Checked against profile_version in the transaction, so calories use the current weights
+            profiles = self.current_profiles(cursor, [row[0] for row in exercise_rows]) if exercise_rows else {}
+            rollups = insert_batch(cursor, food_rows, exercise_rows, profiles, upsert=self.upsert_rollups)
+            return self.apply_rollups(cursor, rollups)
+
+    def apply_rollups(self, cursor, rollups, new_days=True):
+        """
+        Carry (user_id, day, totals_dict) deltas, already added to daily_summary, into
+        the tables derived from it on cursor; no commit. new_days=False skips the
+        streaks, for corrections to days that already had logs (recompute_calories).
+        Returns the set of affected user_ids.
+        """
+        user_days = [(user_id, day) for user_id, day, _ in rollups]
+        refresh_periods(self, cursor, user_days)
+        streak_changes = update_streaks(self, cursor, user_days) if new_days else {}
+        update_badges(self, cursor, rollups, streak_changes)
+        update_leaderboards(self, cursor, rollups)
+        user_ids = {user_id for user_id, _, _ in rollups}
+        bump_versions(self, cursor, user_ids)
+        return user_ids
+
+    # ---- reads ----
+    def versions(self, user_id):
+        """(data_version, profile_version) the user's cache entries are checked against."""
+        with self.cursor(dictionary=False) as cursor:
+            return fetch_versions(cursor, user_id)
+
+    def fetch_dashboard(self, user_id, today_date=None):
+        with self.cursor() as cursor:
+            return fetch_dashboard_data(cursor, user_id, today_date)
+
+    def streak(self, user_id):
+        """Stored streak state for the user (see streaks.live_streak for the displayed value)."""
+        with self.cursor() as cursor:
+            return fetch_streak(cursor, user_id)
+
+    def badges(self, user_id):
+        """{badge key: awarded_at} for the user's awarded badges."""
+        with self.cursor() as cursor:
+            return fetch_badges(cursor, user_id)
+
+    def leaderboard(self, board, period, day, limit, user_id=None):
+        """
+        Top limit users of a board for the week/month containing day, plus user_id's
+        live score and rank when given. Ranks come from the cached score snapshot.
+        """
+        # board is interpolated into the SQL as a column name
+        if board not in BOARDS or period not in PERIODS:
+            raise ValueError(f"unknown leaderboard {board!r} / period {period!r}")
+        start = period_start(day, period)
+        with self.cursor() as cursor:
+            snapshot = get_snapshot(cursor, board, period, start)
+            result = {
+                'board': board,
+                'period': period,
+                'period_start': start.isoformat(),
+                'ranked': len(snapshot.scores),
+                'complete': snapshot.complete,  # False: more users than LEADERBOARD_MAX_RANKED, ranks below are None
+                'top': fetch_top(cursor, board, period, start, limit),
+            }
+            if user_id is not None:
+                score = fetch_score(cursor, board, period, start, user_id)
+                result['me'] = {'user_id': user_id, 'score': round(score, 2), 'rank': snapshot.rank(score)}
+        return result
+
+    def last_modified(self, user_id):
+        """Latest daily_summary write for the user as a datetime, or None."""
+        with self.cursor() as cursor:
+            return as_datetime(fetch_last_modified(cursor, user_id))
+
+    def summary(self, user_id, start_day=None, end_day=None, granularity='day'):
+        with self.cursor() as cursor:
+            # Week/month ranges read whole compacted periods from the period tables
+            compacted_through = fetch_compacted_through(cursor) if granularity in PERIOD_TABLES else None
+            return fetch_summary(cursor, user_id, start_day, end_day, granularity, buckets=self.summary_buckets,
+                                 compacted_through=compacted_through)
+
+    def users_page(self, after, limit):
+        """Newest-first users with id < after; returns (rows, next_cursor)."""
+        with self.cursor() as cursor:
+            if after is None:
+                cursor.execute("SELECT id, name, email FROM users ORDER BY id DESC LIMIT %s", (limit + 1,))
+            else:
+                cursor.execute(
+                    "SELECT id, name, email FROM users WHERE id < %s ORDER BY id DESC LIMIT %s",
+                    (after, limit + 1)
+                )
+            rows = cursor.fetchall() or []
+        # One extra row tells us whether there is a next page
+        next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    def foods_page(self, after, limit, user_id=None):
+        """Newest-first food_log rows with id < after, optionally for one user; returns (rows, next_cursor)."""
+        conditions = []
+        params = []
+        if after is not None:
+            conditions.append("id < %s")
+            params.append(after)
+        if user_id is not None:
+            conditions.append("user_id = %s")
+            params.append(user_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT id, user_id, food_name, quantity, calories, log_date AS created_at
+                FROM food_log
+                {where}
+                ORDER BY id DESC
+                LIMIT %s
+            """, params + [limit + 1])
+            rows = cursor.fetchall() or []
+        next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+        return rows[:limit], next_cursor
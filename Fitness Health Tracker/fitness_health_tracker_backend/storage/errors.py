@@ -0,0 +1,6 @@
+class StorageError(Exception):
+    """A repository operation failed; raised instead of the engine's own driver errors."""
+
+    def __init__(self, message, permanent=False):
+        super().__init__(message)
+        self.permanent = permanent  # retrying the same write cannot succeed (bad value, unknown user_id)
@@ -0,0 +1,46 @@
+"""
+MySQL engine: pooled connections (db_pool.py), ON DUPLICATE KEY rollup upserts
+(rollups.py) and the schema from fitness_tracker_db.sql + migrations/.
+"""
+
+import mysql.connector
+
+import db_pool
+from rollups import upsert_daily_summaries
+
+from storage.base import Repository
+from storage.errors import StorageError
+
+
+class MySQLRepository(Repository):
+    name = 'mysql'
+    errors = (mysql.connector.Error,)
+    permanent_errors = (mysql.connector.DataError, mysql.connector.IntegrityError)
+    locking_read = " FOR UPDATE"
+
+    def connect(self):
+        return db_pool.get_pool().get_connection()
+
+    def connect_direct(self):
+        return db_pool.connect_direct()
+
+    def upsert_rollups(self, cursor, rows):
+        upsert_daily_summaries(cursor, rows)
+
+    def upsert_clause(self, conflict_columns, columns, additive=False):
+        return "ON DUPLICATE KEY UPDATE " + ', '.join(
+            f"{col} = {col} + VALUES({col})" if additive else f"{col} = VALUES({col})" for col in columns
+        )
+
+    def stats(self):
+        return dict(db_pool.pool_stats(), backend=self.name)
+
+    def translate_error(self, error):
+        message = str(error)
+        # Some installs carry a trigger that writes to a user_summary table that no longer exists
+        if "user_summary" in message.lower() and "doesn't exist" in message.lower():
+            return StorageError(
+                "A database trigger references the missing user_summary table; "
+                f"run fix_database_triggers.py. Original error: {message}"
+            )
+        return StorageError(message, permanent=isinstance(error, self.permanent_errors))
@@ -0,0 +1,242 @@
+"""
+Embedded SQLite engine (STORAGE_BACKEND=sqlite).
+- One connection per thread (and per process after a fork), opened lazily, in WAL
+  mode with synchronous=NORMAL: readers never block the writer and commits skip
+  the fsync of the rollback journal. busy_timeout makes concurrent writers wait
+  instead of failing.
+- SQLiteConnection / SQLiteCursor give sqlite3 the small slice of the
+  mysql.connector API the shared modules use (%s placeholders, dictionary cursors,
+  in_transaction, is_connected), so dashboard_data, summary, export and bulk_import
+  run unchanged.
+- The schema (sqlite_schema.sql) is created on first connect with the same tables
+  and indexes as the MySQL schema plus migrations.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+from functools import lru_cache
+
+from config import storage_config
+from metrics import instrument_cursor
+from rollups import SUMMARY_COLUMNS, upsert_params
+from slow_queries import slow_query_log
+
+from storage.base import Repository
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sqlite_schema.sql')
+
+UPSERT_SQL = """
+    INSERT INTO daily_summary (user_id, date, {columns})
+    VALUES (%s, %s, {placeholders})
+    ON CONFLICT (user_id, date) DO UPDATE SET {updates}
+""".format(
+    columns=', '.join(SUMMARY_COLUMNS),
+    placeholders=', '.join(['%s'] * len(SUMMARY_COLUMNS)),
+    updates=', '.join(f"{col} = {col} + excluded.{col}" for col in SUMMARY_COLUMNS),
+)
+
+# Same buckets as summary.GRANULARITIES: ISO weeks start on Monday (%w is 0 on Sunday)
+GRANULARITIES = {
+    'day': "date",
+    'week': "date(date, '-' || ((CAST(strftime('%w', date) AS INTEGER) + 6) % 7) || ' days')",
+    'month': "date(date, 'start of month')",
+}
+
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value.decode())
+    except ValueError:
+        return value.decode()
+
+
+def _parse_datetime(value):
+    try:
+        return datetime.fromisoformat(value.decode())
+    except ValueError:
+        return value.decode()
+
+
+# Stored as ISO text, which sorts and compares the same way as the values
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', _parse_date)
+sqlite3.register_converter('DATETIME', _parse_datetime)
+sqlite3.register_converter('TIMESTAMP', _parse_datetime)
+
+
+@lru_cache(maxsize=1024)
+def _qmark(sql):
+    """mysql.connector's %s placeholders -> sqlite3's ?."""
+    return sql.replace('%s', '?')
+
+
+class SQLiteCursor:
+    def __init__(self, raw, dictionary=False):
+        self._raw = raw
+        self._dictionary = dictionary
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    @property
+    def column_names(self):
+        return tuple(column[0] for column in self._raw.description or ())
+
+    @property
+    def description(self):
+        return self._raw.description
+
+    @property
+    def rowcount(self):
+        return self._raw.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._raw.lastrowid
+
+    def _row(self, row):
+        if row is None or not self._dictionary:
+            return row
+        return dict(zip(self.column_names, row))
+
+    def execute(self, operation, params=None):
+        self._raw.execute(_qmark(operation), tuple(params) if params else ())
+
+    def executemany(self, operation, seq_params):
+        self._raw.executemany(_qmark(operation), [tuple(params) for params in seq_params])
+
+    def fetchone(self):
+        return self._row(self._raw.fetchone())
+
+    def fetchmany(self, size=1):
+        return [self._row(row) for row in self._raw.fetchmany(size)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._raw.fetchall()]
+
+    def close(self):
+        self._raw.close()
+
+
+class SQLiteConnection:
+    """
+    A checkout of a sqlite3 connection. For the per-thread connection close() only
+    rolls back what the outermost checkout left uncommitted; direct connections are
+    really closed.
+    """
+
+    def __init__(self, raw, holder=None, instrument=True):
+        self._raw = raw
+        self._holder = holder
+        self._instrument = instrument
+        if holder is not None:
+            holder.depth += 1
+
+    def cursor(self, dictionary=False, buffered=None):
+        cursor = SQLiteCursor(self._raw.cursor(), dictionary)
+        return instrument_cursor(cursor) if self._instrument else cursor
+
+    @property
+    def in_transaction(self):
+        return self._raw.in_transaction
+
+    def is_connected(self):
+        return True
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        if self._raw is None:
+            return
+        raw, self._raw = self._raw, None
+        if self._holder is None:
+            raw.close()
+            return
+        self._holder.depth -= 1
+        if self._holder.depth == 0 and raw.in_transaction:
+            raw.rollback()
+
+
+class SQLiteRepository(Repository):
+    name = 'sqlite'
+    errors = (sqlite3.Error,)
+    permanent_errors = (sqlite3.DataError, sqlite3.IntegrityError)
+    summary_buckets = GRANULARITIES
+
+    def __init__(self, path=None, busy_timeout=None, synchronous=None):
+        self.path = path or storage_config['sqlite_path']
+        self.busy_timeout = storage_config['sqlite_busy_timeout'] if busy_timeout is None else busy_timeout
+        self.synchronous = synchronous or storage_config['sqlite_synchronous']
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._opened = 0
+        if slow_query_log is not None:
+            slow_query_log.use_engine(
+                lambda: SQLiteConnection(self._open(check_same_thread=False), instrument=False),
+                explain_prefix="EXPLAIN QUERY PLAN ",
+                errors=self.errors,
+            )
+
+    def _open(self, check_same_thread=True):
+        raw = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=check_same_thread,
+        )
+        raw.execute("PRAGMA journal_mode = WAL")
+        raw.execute(f"PRAGMA synchronous = {self.synchronous}")
+        raw.execute("PRAGMA foreign_keys = ON")
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    with open(SCHEMA_PATH, encoding='utf-8') as f:
+                        raw.executescript(f.read())
+                    self._schema_ready = True
+        self._opened += 1
+        return raw
+
+    def connect(self):
+        holder = self._local
+        pid = os.getpid()
+        if getattr(holder, 'pid', None) != pid:
+            # Never reuse a connection inherited across fork()
+            holder.raw = self._open()
+            holder.pid = pid
+            holder.depth = 0
+        return SQLiteConnection(holder.raw, holder)
+
+    def connect_direct(self):
+        # Streaming responses may be drained by a different thread than the one that opened them
+        return SQLiteConnection(self._open(check_same_thread=False))
+
+    def upsert_rollups(self, cursor, rows):
+        params = upsert_params(rows)
+        if params:
+            cursor.executemany(UPSERT_SQL, params)
+
+    def upsert_clause(self, conflict_columns, columns, additive=False):
+        return f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET " + ', '.join(
+            f"{col} = {col} + excluded.{col}" if additive else f"{col} = excluded.{col}" for col in columns
+        )
+
+    def stats(self):
+        return {
+            'backend': self.name,
+            'pid': os.getpid(),
+            'path': self.path,
+            'connections_opened': self._opened,
+            'busy_timeout': self.busy_timeout,
+        }
@@ -0,0 +1,241 @@
+-- Schema for the embedded SQLite engine (STORAGE_BACKEND=sqlite).
+-- Mirrors ../../fitness_tracker_db.sql with ../../migrations applied: same tables,
+-- columns and indexes. Applied by SQLiteRepository on first connect; every statement
+-- is idempotent. Keep it in step when a migration adds tables or indexes.
+
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(100),
+    email VARCHAR(100) UNIQUE,
+    password VARCHAR(255),
+    age INT,
+    height FLOAT,
+    weight FLOAT
+);
+
+CREATE TABLE IF NOT EXISTS food_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES users(id),
+    food_name VARCHAR(100),
+    quantity INT DEFAULT 1,
+    calories FLOAT,
+    log_date DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS exercise_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES users(id),
+    activity VARCHAR(100),
+    duration INT,  -- in minutes
+    calories_burned FLOAT,
+    distance FLOAT,
+    log_date DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS environment_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES users(id),
+    distance_walked FLOAT,
+    carbon_saved FLOAT,
+    log_date DATETIME DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS daily_summary (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT REFERENCES users(id),
+    date DATE,
+    total_calories_consumed FLOAT NOT NULL DEFAULT 0,
+    total_calories_burned FLOAT NOT NULL DEFAULT 0,
+    total_carbon_saved FLOAT NOT NULL DEFAULT 0,
+    food_items INT NOT NULL DEFAULT 0,
+    exercise_minutes INT NOT NULL DEFAULT 0,
+    exercise_sessions INT NOT NULL DEFAULT 0,
+    total_distance_walked FLOAT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    CONSTRAINT unique_user_date UNIQUE (user_id, date)
+);
+
+-- 002: per-user date-range scans
+CREATE INDEX IF NOT EXISTS idx_food_log_user_date ON food_log (user_id, log_date);
+CREATE INDEX IF NOT EXISTS idx_exercise_log_user_date ON exercise_log (user_id, log_date);
+CREATE INDEX IF NOT EXISTS idx_environment_log_user_date ON environment_log (user_id, log_date);
+
+-- 003: conditional GETs on /api/summary; the trigger stands in for MySQL's ON UPDATE
+CREATE INDEX IF NOT EXISTS idx_daily_summary_user_updated ON daily_summary (user_id, updated_at);
+
+CREATE TRIGGER IF NOT EXISTS daily_summary_touch_updated_at
+AFTER UPDATE ON daily_summary
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE daily_summary
+    SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+    WHERE id = NEW.id;
+END;
+
+-- 004: weekly / monthly rollups compacted by compaction.py
+CREATE TABLE IF NOT EXISTS weekly_summary (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id),
+    period_start DATE NOT NULL,
+    total_calories_consumed FLOAT NOT NULL DEFAULT 0,
+    food_items INT NOT NULL DEFAULT 0,
+    total_calories_burned FLOAT NOT NULL DEFAULT 0,
+    exercise_minutes INT NOT NULL DEFAULT 0,
+    exercise_sessions INT NOT NULL DEFAULT 0,
+    total_distance_walked FLOAT NOT NULL DEFAULT 0,
+    total_carbon_saved FLOAT NOT NULL DEFAULT 0,
+    days_logged INT NOT NULL DEFAULT 0,
+    days_active INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    CONSTRAINT unique_user_period UNIQUE (user_id, period_start)
+);
+
+CREATE TABLE IF NOT EXISTS monthly_summary (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id),
+    period_start DATE NOT NULL,
+    total_calories_consumed FLOAT NOT NULL DEFAULT 0,
+    food_items INT NOT NULL DEFAULT 0,
+    total_calories_burned FLOAT NOT NULL DEFAULT 0,
+    exercise_minutes INT NOT NULL DEFAULT 0,
+    exercise_sessions INT NOT NULL DEFAULT 0,
+    total_distance_walked FLOAT NOT NULL DEFAULT 0,
+    total_carbon_saved FLOAT NOT NULL DEFAULT 0,
+    days_logged INT NOT NULL DEFAULT 0,
+    days_active INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    CONSTRAINT unique_user_period UNIQUE (user_id, period_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_weekly_summary_user_updated ON weekly_summary (user_id, updated_at);
+CREATE INDEX IF NOT EXISTS idx_monthly_summary_user_updated ON monthly_summary (user_id, updated_at);
+
+CREATE TRIGGER IF NOT EXISTS weekly_summary_touch_updated_at
+AFTER UPDATE ON weekly_summary
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE weekly_summary
+    SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+    WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS monthly_summary_touch_updated_at
+AFTER UPDATE ON monthly_summary
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE monthly_summary
+    SET updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')
+    WHERE id = NEW.id;
+END;
+
+CREATE TABLE IF NOT EXISTS rollup_compaction (
+    name VARCHAR(50) PRIMARY KEY,
+    compacted_through DATE NULL,
+    changes_since TIMESTAMP NULL,
+    locked_by VARCHAR(100) NULL,
+    locked_until DATETIME NULL,
+    last_run_at DATETIME NULL,
+    last_run_seconds FLOAT NULL
+);
+
+INSERT OR IGNORE INTO rollup_compaction (name) VALUES ('periods');
+
+CREATE INDEX IF NOT EXISTS idx_daily_summary_date ON daily_summary (date);
+CREATE INDEX IF NOT EXISTS idx_daily_summary_updated ON daily_summary (updated_at);
+
+CREATE TABLE IF NOT EXISTS user_streaks (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    current_streak INT NOT NULL DEFAULT 0,
+    longest_streak INT NOT NULL DEFAULT 0,
+    streak_start DATE NULL,
+    last_active_date DATE NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TRIGGER IF NOT EXISTS user_streaks_touch_updated_at
+AFTER UPDATE ON user_streaks
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE user_streaks
+    SET updated_at = datetime('now', 'localtime')
+    WHERE user_id = NEW.user_id;
+END;
+
+CREATE TABLE IF NOT EXISTS user_counters (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    total_calories_consumed FLOAT NOT NULL DEFAULT 0,
+    food_items INT NOT NULL DEFAULT 0,
+    total_calories_burned FLOAT NOT NULL DEFAULT 0,
+    exercise_minutes INT NOT NULL DEFAULT 0,
+    exercise_sessions INT NOT NULL DEFAULT 0,
+    total_distance_walked FLOAT NOT NULL DEFAULT 0,
+    total_carbon_saved FLOAT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime'))
+);
+
+CREATE TRIGGER IF NOT EXISTS user_counters_touch_updated_at
+AFTER UPDATE ON user_counters
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE user_counters
+    SET updated_at = datetime('now', 'localtime')
+    WHERE user_id = NEW.user_id;
+END;
+
+CREATE TABLE IF NOT EXISTS user_badges (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INT NOT NULL REFERENCES users(id),
+    badge VARCHAR(50) NOT NULL,
+    awarded_at DATETIME NOT NULL,
+    CONSTRAINT unique_user_badge UNIQUE (user_id, badge)
+);
+
+CREATE TABLE IF NOT EXISTS leaderboard_scores (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    period VARCHAR(10) NOT NULL,
+    period_start DATE NOT NULL,
+    user_id INT NOT NULL REFERENCES users(id),
+    calories_burned FLOAT NOT NULL DEFAULT 0,
+    distance_walked FLOAT NOT NULL DEFAULT 0,
+    carbon_saved FLOAT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT (datetime('now', 'localtime')),
+    CONSTRAINT unique_period_user UNIQUE (period, period_start, user_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_leaderboard_calories_burned ON leaderboard_scores (period, period_start, calories_burned);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_distance_walked ON leaderboard_scores (period, period_start, distance_walked);
+CREATE INDEX IF NOT EXISTS idx_leaderboard_carbon_saved ON leaderboard_scores (period, period_start, carbon_saved);
+
+CREATE TRIGGER IF NOT EXISTS leaderboard_scores_touch_updated_at
+AFTER UPDATE ON leaderboard_scores
+WHEN NEW.updated_at = OLD.updated_at
+BEGIN
+    UPDATE leaderboard_scores
+    SET updated_at = datetime('now', 'localtime')
+    WHERE id = NEW.id;
+END;
+
+CREATE TABLE IF NOT EXISTS log_archives (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name VARCHAR(50) NOT NULL,
+    partition_name VARCHAR(20) NOT NULL,
+    range_start DATE NULL,
+    range_end DATE NOT NULL,
+    path VARCHAR(500) NOT NULL,
+    rows_archived INT NOT NULL,
+    min_id INT NULL,
+    max_id INT NULL,
+    min_log_date DATETIME NULL,
+    max_log_date DATETIME NULL,
+    bytes BIGINT NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    archived_at DATETIME NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_log_archives_table_range ON log_archives (table_name, range_end);
+
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id),
+    data_version BIGINT NOT NULL DEFAULT 0,
+    profile_version BIGINT NOT NULL DEFAULT 0
+);
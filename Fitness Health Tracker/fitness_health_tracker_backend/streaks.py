@@ -0,0 +1,210 @@
+"""
+Logging streaks over the whole history, stored per user in user_streaks.
+
+A day counts as active when the user logged any food or exercise on it. Each row
+holds the run of consecutive active days ending at last_active_date
+(current_streak, streak_start) and the longest run so far.
+
+- Repository.write_batch calls update_streaks() in the same transaction as the
+  logs. Days on or after last_active_date move the counters forward in O(1); a
+  day inside the current run changes nothing. Only a back-dated day before
+  streak_start (it can join older runs) re-reads that user's active days.
+- Reads are one primary-key lookup (fetch_streak, or the dashboard's single
+  query). live_streak() drops the current streak once a whole day is missed.
+- rebuild() recomputes every row from daily_summary. Run it after migrating and
+  after rebuilding the rollups.
+
+Usage:
+    python streaks.py rebuild
+    python streaks.py rebuild --user-id 7
+    python streaks.py show 7
+"""
+
+import argparse
+from collections import defaultdict
+from datetime import date, timedelta
+
+from storage import StorageError, get_repository
+from timeranges import as_date
+
+STREAK_COLUMNS = ('current_streak', 'longest_streak', 'streak_start', 'last_active_date')
+ACTIVE_DAYS_SQL = """
+    SELECT user_id, date FROM daily_summary
+    WHERE user_id IN ({placeholders}) AND (food_items > 0 OR exercise_sessions > 0)
+    ORDER BY user_id, date
+"""
+REBUILD_CHUNK = 500  # users per rebuild transaction
+
+
+def empty_state():
+    return {'current_streak': 0, 'longest_streak': 0, 'streak_start': None, 'last_active_date': None}
+
+
+def advance(state, days):
+    """
+    Move a streak state forward over active days on or after its last_active_date.
+    Returns the new state, or None when nothing changed.
+    """
+    state = dict(state)
+    changed = False
+    for day in sorted(set(days)):
+        last = state['last_active_date']
+        if last is not None and day <= last:
+            continue
+        if last is not None and day == last + timedelta(days=1):
+            state['current_streak'] += 1
+        else:
+            state['current_streak'] = 1
+            state['streak_start'] = day
+        state['last_active_date'] = day
+        state['longest_streak'] = max(state['longest_streak'], state['current_streak'])
+        changed = True
+    return state if changed else None
+
+
+def compute_streak(days):
+    """Streak state from all of a user's active days."""
+    return advance(empty_state(), days) or empty_state()
+
+
+def live_streak(state, today=None):
+    """Current streak as shown to the user: 0 once neither today nor yesterday is active."""
+    last = as_date(state.get('last_active_date')) if state else None
+    if last is None:
+        return 0
+    return state['current_streak'] if last >= (today or date.today()) - timedelta(days=1) else 0
+
+
+def _state(row):
+    return {
+        'current_streak': int(row['current_streak'] or 0),
+        'longest_streak': int(row['longest_streak'] or 0),
+        'streak_start': as_date(row['streak_start']),
+        'last_active_date': as_date(row['last_active_date']),
+    }
+
+
+def fetch_streak(cursor, user_id):
+    """The user's stored streak state (dictionary cursor); empty for users who never logged."""
+    cursor.execute(
+        f"SELECT {', '.join(STREAK_COLUMNS)} FROM user_streaks WHERE user_id = %s", (user_id,)
+    )
+    row = cursor.fetchone()
+    return _state(row) if row else empty_state()
+
+
+def fetch_active_days(cursor, user_ids):
+    """{user_id: [active day, ...]} from daily_summary (tuple cursor)."""
+    cursor.execute(ACTIVE_DAYS_SQL.format(placeholders=', '.join(['%s'] * len(user_ids))), list(user_ids))
+    days = defaultdict(list)
+    for user_id, day in cursor.fetchall():
+        days[user_id].append(as_date(day))
+    return days
+
+
+def write_streaks(repo, cursor, states):
+    """Upsert {user_id: state} rows, replacing the stored values."""
+    if not states:
+        return
+    sql = (
+        f"INSERT INTO user_streaks (user_id, {', '.join(STREAK_COLUMNS)}) "
+        f"VALUES (%s, {', '.join(['%s'] * len(STREAK_COLUMNS))}) "
+        + repo.upsert_clause(('user_id',), STREAK_COLUMNS)
+    )
+    cursor.executemany(sql, [
+        (user_id,) + tuple(state[column] for column in STREAK_COLUMNS)
+        for user_id, state in sorted(states.items())
+    ])
+
+
+def update_streaks(repo, cursor, user_days):
+    """
+    Fold newly logged (user_id, day) pairs into user_streaks on cursor (a tuple
+    cursor inside the write's transaction); no commit. Returns
+    {user_id: (old_state, new_state)} for the users whose streak changed.
+    """
+    days_by_user = defaultdict(set)
+    for user_id, day in user_days:
+        days_by_user[user_id].add(day)
+    if not days_by_user:
+        return {}
+
+    user_ids = sorted(days_by_user)
+    placeholders = ', '.join(['%s'] * len(user_ids))
+    # Locked until commit on MySQL so concurrent writes for a user apply one after the other
+    cursor.execute(
+        f"SELECT user_id, {', '.join(STREAK_COLUMNS)} FROM user_streaks "
+        f"WHERE user_id IN ({placeholders}){repo.locking_read}",
+        user_ids
+    )
+    stored = {row[0]: _state(dict(zip(STREAK_COLUMNS, row[1:]))) for row in cursor.fetchall()}
+
+    changed = {}
+    recompute = []
+    for user_id in user_ids:
+        state = stored.get(user_id, empty_state())
+        days = days_by_user[user_id]
+        start = state['streak_start']
+        if start is not None and min(days) < start:
+            # Back-dated before the current run: it may bridge a gap, so count again
+            recompute.append(user_id)
+            continue
+        new_state = advance(state, days)
+        if new_state is not None:
+            changed[user_id] = new_state
+
+    if recompute:
+        active = fetch_active_days(cursor, recompute)
+        for user_id in recompute:
+            changed[user_id] = compute_streak(active[user_id])
+    write_streaks(repo, cursor, changed)
+    return {user_id: (stored.get(user_id, empty_state()), state) for user_id, state in changed.items()}
+
+
+def rebuild(repo, user_id=None):
+    """Recompute user_streaks from daily_summary; returns the number of users."""
+    if user_id is not None:
+        return _rebuild_users(repo, [user_id])
+    users = 0
+    last_id = 0
+    while True:
+        with repo.cursor(dictionary=False) as cursor:
+            cursor.execute("SELECT id FROM users WHERE id > %s ORDER BY id LIMIT %s", (last_id, REBUILD_CHUNK))
+            ids = [row[0] for row in cursor.fetchall()]
+        if not ids:
+            break
+        users += _rebuild_users(repo, ids)
+        last_id = ids[-1]
+    return users
+
+
+def _rebuild_users(repo, user_ids):
+    with repo.cursor(dictionary=False, commit=True) as cursor:
+        active = fetch_active_days(cursor, user_ids)
+        placeholders = ', '.join(['%s'] * len(user_ids))
+        cursor.execute(f"DELETE FROM user_streaks WHERE user_id IN ({placeholders})", list(user_ids))
+        # Users without any active day get no row, which reads as a zero streak
+        write_streaks(repo, cursor, {user_id: compute_streak(days) for user_id, days in active.items()})
+    return len(user_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain per-user logging streaks")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rebuild_parser = sub.add_parser('rebuild', help="recompute streaks from daily_summary")
+    rebuild_parser.add_argument('--user-id', type=int, help="only this user")
+    show_parser = sub.add_parser('show', help="print one user's streak")
+    show_parser.add_argument('user_id', type=int)
+    args = parser.parse_args()
+
+    repo = get_repository()
+    try:
+        if args.command == 'rebuild':
+            print(f"Rebuilt streaks for {rebuild(repo, args.user_id)} user(s)")
+        else:
+            state = repo.streak(args.user_id)
+            print(f"current: {live_streak(state)} day(s) (stored {state['current_streak']}, "
+                  f"since {state['streak_start']}), longest: {state['longest_streak']} day(s), "
+                  f"last active: {state['last_active_date']}")
+    except StorageError as e:
+        print(f"Error: {e}")
@@ -0,0 +1,204 @@
+"""
+Range summaries for /api/summary, read from the daily_summary rollups.
+Buckets are days, ISO weeks (starting Monday) or calendar months.
+GRANULARITIES holds the MySQL bucket expressions; other engines pass their own
+(see storage/sqlite_repository.py).
+
+Week and month summaries read whole periods up to the compaction high-water mark
+from weekly_summary / monthly_summary (compaction.py), one row per period, and only
+the partial periods at either end of the range from daily_summary.
+"""
+
+from datetime import timedelta
+
+from timeranges import next_period_start, period_start
+
+GRANULARITIES = {
+    'day': "date",
+    'week': "DATE_SUB(date, INTERVAL WEEKDAY(date) DAY)",
+    'month': "DATE_SUB(date, INTERVAL DAYOFMONTH(date) - 1 DAY)",
+}
+
+# Compacted rollups per granularity (compaction.py)
+PERIOD_TABLES = {
+    'week': 'weekly_summary',
+    'month': 'monthly_summary',
+}
+
+SUMMARY_SQL = """
+    /* summary */
+    SELECT {bucket} AS bucket,
+           SUM(total_calories_consumed) AS consumed,
+           SUM(total_calories_burned) AS burned,
+           SUM(exercise_minutes) AS minutes,
+           SUM(total_distance_walked) AS distance,
+           SUM(total_carbon_saved) AS co2_saved,
+           SUM(food_items) AS food_items,
+           SUM(exercise_sessions) AS sessions,
+           SUM(CASE WHEN total_calories_consumed > 0 OR total_calories_burned > 0 THEN 1 ELSE 0 END) AS days_logged,
+           SUM(CASE WHEN exercise_minutes > 0 THEN 1 ELSE 0 END) AS days_active
+    FROM daily_summary
+    WHERE user_id = %s {range_filter}
+    GROUP BY bucket
+    ORDER BY bucket
+"""
+
+PERIOD_SQL = """
+    /* summary_periods */
+    SELECT period_start AS bucket,
+           total_calories_consumed AS consumed,
+           total_calories_burned AS burned,
+           exercise_minutes AS minutes,
+           total_distance_walked AS distance,
+           total_carbon_saved AS co2_saved,
+           food_items,
+           exercise_sessions AS sessions,
+           days_logged,
+           days_active
+    FROM {table}
+    WHERE user_id = %s {range_filter}
+    ORDER BY period_start
+"""
+
+METRICS = ('consumed', 'burned', 'net', 'minutes', 'distance', 'co2_saved', 'food_items', 'sessions',
+           'days_logged', 'days_active')
+
+
+LAST_MODIFIED_SQL = """
+    /* summary_last_modified */
+    SELECT MAX(last_modified) AS last_modified FROM (
+        SELECT MAX(updated_at) AS last_modified FROM daily_summary WHERE user_id = %s
+        UNION ALL
+        SELECT MAX(updated_at) FROM weekly_summary WHERE user_id = %s
+        UNION ALL
+        SELECT MAX(updated_at) FROM monthly_summary WHERE user_id = %s
+    ) AS versions
+"""
+
+
+def fetch_last_modified(cursor, user_id):
+    """
+    Latest daily or compacted rollup write for the user (datetime) or None; each
+    table is served by its (user_id, updated_at) index.
+    """
+    cursor.execute(LAST_MODIFIED_SQL, (user_id, user_id, user_id))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row['last_modified'] if isinstance(row, dict) else row[0]
+
+
+def _bucket(row):
+    consumed = float(row['consumed'] or 0)
+    burned = float(row['burned'] or 0)
+    return {
+        'start': row['bucket'].isoformat() if hasattr(row['bucket'], 'isoformat') else str(row['bucket']),
+        'consumed': round(consumed, 1),
+        'burned': round(burned, 1),
+        'net': round(consumed - burned, 1),
+        'minutes': int(row['minutes'] or 0),
+        'distance': round(float(row['distance'] or 0), 2),
+        'co2_saved': round(float(row['co2_saved'] or 0), 3),
+        'food_items': int(row['food_items'] or 0),
+        'sessions': int(row['sessions'] or 0),
+        'days_logged': int(row['days_logged'] or 0),
+        'days_active': int(row['days_active'] or 0),
+    }
+
+
+def compacted_range(start_day, end_day, granularity, compacted_through):
+    """
+    (first, end): the whole periods of the range that are fully compacted, as
+    first <= period_start < end (first is None when the range is unbounded), or None.
+    """
+    first = None
+    if start_day is not None:
+        first = start_day if period_start(start_day, granularity) == start_day \
+            else next_period_start(start_day, granularity)
+    last_day = compacted_through if end_day is None else min(end_day, compacted_through)
+    end = period_start(last_day + timedelta(days=1), granularity)
+    if first is not None and first >= end:
+        return None
+    return first, end
+
+
+def summary_queries(user_id, start_day=None, end_day=None, granularity='day', buckets=GRANULARITIES,
+                    compacted_through=None):
+    """
+    [(sql, params)] for the buckets between start_day and end_day (inclusive; None =
+    unbounded): the daily rows, plus the compacted periods when compacted_through (the
+    compaction high-water mark) covers some. The statements are independent.
+    """
+    if granularity not in buckets:
+        raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+
+    range_filter = []
+    params = [user_id]
+    if start_day is not None:
+        range_filter.append("AND date >= %s")
+        params.append(start_day)
+    if end_day is not None:
+        range_filter.append("AND date < %s")
+        params.append(end_day + timedelta(days=1))
+
+    compacted = None
+    if compacted_through is not None and granularity in PERIOD_TABLES:
+        compacted = compacted_range(start_day, end_day, granularity, compacted_through)
+    if compacted is not None:
+        # Daily rows only for the days outside the compacted periods
+        first, end = compacted
+        if first is None:
+            range_filter.append("AND date >= %s")
+            params.append(end)
+        else:
+            range_filter.append("AND (date < %s OR date >= %s)")
+            params.extend([first, end])
+
+    queries = [(SUMMARY_SQL.format(bucket=buckets[granularity], range_filter=' '.join(range_filter)), params)]
+    if compacted is not None:
+        first, end = compacted
+        period_filter = "AND period_start < %s" if first is None else "AND period_start >= %s AND period_start < %s"
+        queries.append((
+            PERIOD_SQL.format(table=PERIOD_TABLES[granularity], range_filter=period_filter),
+            [user_id, end] if first is None else [user_id, first, end]
+        ))
+    return queries
+
+
+def assemble_summary(user_id, start_day, end_day, granularity, row_lists):
+    """The /api/summary body from the rows of each summary_queries() statement."""
+    rows = sorted((_bucket(row) for rows in row_lists for row in rows), key=lambda bucket: bucket['start'])
+
+    totals = {metric: 0 for metric in METRICS}
+    for bucket in rows:
+        for metric in METRICS:
+            totals[metric] += bucket[metric]
+    for metric in ('consumed', 'burned', 'net'):
+        totals[metric] = round(totals[metric], 1)
+    totals['distance'] = round(totals['distance'], 2)
+    totals['co2_saved'] = round(totals['co2_saved'], 3)
+
+    return {
+        'user_id': user_id,
+        'from': start_day.isoformat() if start_day else None,
+        'to': end_day.isoformat() if end_day else None,
+        'granularity': granularity,
+        'buckets': rows,
+        'totals': totals,
+        # Kept for existing clients of the original endpoint
+        'total_calories_consumed': totals['consumed'],
+    }
+
+
+def fetch_summary(cursor, user_id, start_day=None, end_day=None, granularity='day', buckets=GRANULARITIES,
+                  compacted_through=None):
+    """
+    Per-bucket totals between start_day and end_day (inclusive; None = unbounded).
+    cursor must be a dictionary cursor; buckets maps granularity -> SQL bucket expression.
+    compacted_through is the compaction high-water mark (None: read daily rows only).
+    """
+    row_lists = []
+    for sql, params in summary_queries(user_id, start_day, end_day, granularity, buckets, compacted_through):
+        cursor.execute(sql, params)
+        row_lists.append(cursor.fetchall() or [])
+    return assemble_summary(user_id, start_day, end_day, granularity, row_lists)
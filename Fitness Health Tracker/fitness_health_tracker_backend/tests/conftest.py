@@ -0,0 +1,33 @@
+"""
+The tests run against the embedded SQLite engine, so they need neither a MySQL
+server nor the MySQL driver. Run them from the backend folder: python -m pytest
+"""
+
+import os
+import sys
+
+# config.py reads the environment on import
+os.environ['STORAGE_BACKEND'] = 'sqlite'
+os.environ['SLOW_QUERY_LOG'] = '0'
+os.environ['WRITE_BEHIND'] = '0'
+os.environ.pop('CACHE_REDIS_URL', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from cache import dashboard_cache, profile_cache  # noqa: E402
+from storage import create_repository  # noqa: E402
+
+
+@pytest.fixture
+def repo(tmp_path):
+    # The caches are process-wide and user ids restart in every database
+    dashboard_cache.cache.clear()
+    profile_cache.cache.clear()
+    return create_repository('sqlite', path=str(tmp_path / 'fitness.db'))
+
+
+@pytest.fixture
+def user_id(repo):
+    return repo.create_user('Ada', 'ada@example.com', 'hash', age=30, height=170, weight=70)
+
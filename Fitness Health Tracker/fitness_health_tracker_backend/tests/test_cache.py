@@ -0,0 +1,79 @@
+from datetime import date, datetime, timedelta
+
+from cache import dashboard_cache, profile_cache
+from storage import create_repository
+from versions import NO_VERSIONS, bump_versions
+
+TODAY = date(2026, 3, 18)
+VIEW = {'today': 'cached'}
+
+
+def other_worker(repo):
+    """A second repository on the same file, standing in for another worker process."""
+    return create_repository('sqlite', path=repo.path)
+
+
+def test_versions_move_with_writes(repo, user_id):
+    assert repo.versions(user_id) == NO_VERSIONS
+    repo.write_batch([(user_id, 'apple', 1, 95.0, datetime.now())], [])
+    assert repo.versions(user_id) == (1, 0)
+    repo.update_profile(user_id, 'Ada', 31, 170, 72)
+    assert repo.versions(user_id) == (1, 1)
+
+
+def test_dashboard_entry_survives_until_a_write(repo, user_id):
+    versions = repo.versions(user_id)
+    dashboard_cache.set(user_id, VIEW, versions, TODAY)
+    assert dashboard_cache.get(user_id, repo.versions(user_id), TODAY) == VIEW
+
+    # Written through another worker: this worker's entry is never invalidated directly
+    other_worker(repo).write_batch([(user_id, 'apple', 1, 95.0, datetime.now())], [])
+    assert dashboard_cache.get(user_id, repo.versions(user_id), TODAY) is None
+    # and a stale entry is dropped, not served to a later reader at the old versions
+    assert dashboard_cache.get(user_id, versions, TODAY) is None
+
+
+def test_dashboard_entry_expires_at_midnight(repo, user_id):
+    versions = repo.versions(user_id)
+    dashboard_cache.set(user_id, VIEW, versions, TODAY)
+    assert dashboard_cache.get(user_id, versions, TODAY + timedelta(days=1)) is None
+
+
+def test_profile_is_reloaded_after_a_change_in_another_worker(repo, user_id):
+    assert repo.get_profile(user_id, repo.versions(user_id))['weight'] == 70.0
+
+    with other_worker(repo).cursor(commit=True) as cursor:
+        cursor.execute("UPDATE users SET weight = %s WHERE id = %s", (95, user_id))
+        bump_versions(repo, cursor, [user_id], 'profile_version')
+    assert repo.get_profile(user_id, repo.versions(user_id))['weight'] == 95.0
+
+
+def test_profile_hits_skip_the_loader(repo, user_id):
+    loads = []
+
+    def loader(missing):
+        loads.append(missing)
+        return {user_id: {'weight': 70.0}}
+
+    profile_cache.get_many([user_id], loader, {user_id: 0})
+    profile_cache.get_many([user_id], loader, {user_id: 0})
+    assert loads == [[user_id]]
+    profile_cache.get_many([user_id], loader, {user_id: 1})
+    assert loads == [[user_id], [user_id]]
+
+
+def test_write_batch_uses_the_current_profile(repo, user_id):
+    def burned():
+        repo.write_batch([], [(user_id, 'running', 30, datetime.now())])
+        with repo.cursor() as cursor:
+            cursor.execute("SELECT calories_burned FROM exercise_log WHERE user_id = %s ORDER BY id DESC LIMIT 1",
+                           (user_id,))
+            return cursor.fetchone()['calories_burned']
+
+    light = burned()
+    assert burned() == light  # served from the cache this time
+
+    with other_worker(repo).cursor(commit=True) as cursor:
+        cursor.execute("UPDATE users SET weight = %s WHERE id = %s", (140, user_id))
+        bump_versions(repo, cursor, [user_id], 'profile_version')
+    assert burned() > light
@@ -0,0 +1,102 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from compaction import compact, fetch_state
+from timeranges import period_start
+
+TODAY = date(2026, 3, 18)
+FIRST_DAY = date(2026, 1, 26)
+COMPARED = ('consumed', 'burned', 'minutes', 'food_items', 'sessions', 'days_logged', 'days_active')
+
+
+def at(day, hour=12):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+
+
+def seed(repo, user_id):
+    day = FIRST_DAY
+    while day <= TODAY:
+        if day.toordinal() % 3:
+            repo.write_batch([(user_id, 'apple', 1, 95.0 + day.day, at(day))],
+                             [(user_id, 'running', 20 + day.day, at(day, 18))])
+        day += timedelta(days=1)
+
+
+def expected_periods(repo, user_id, granularity):
+    """The period buckets summed from the daily buckets."""
+    totals = defaultdict(lambda: defaultdict(float))
+    for bucket in repo.summary(user_id, FIRST_DAY, TODAY, 'day')['buckets']:
+        start = period_start(date.fromisoformat(bucket['start']), granularity).isoformat()
+        for metric in COMPARED:
+            totals[start][metric] += bucket[metric]
+    return {start: {metric: round(value, 1) for metric, value in values.items()} for start, values in totals.items()}
+
+
+def periods(repo, user_id, granularity):
+    return {
+        bucket['start']: {metric: round(bucket[metric], 1) for metric in COMPARED}
+        for bucket in repo.summary(user_id, FIRST_DAY, TODAY, granularity)['buckets']
+    }
+
+
+def period_rows(repo, table):
+    with repo.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+        return cursor.fetchone()['n']
+
+
+def fetch_state_of(repo):
+    with repo.cursor() as cursor:
+        return fetch_state(cursor)
+
+
+def test_compaction_matches_daily_rollups(repo, user_id):
+    seed(repo, user_id)
+    stats = compact(repo, today=TODAY)
+    assert stats['compacted_through'] == (TODAY - timedelta(days=1)).isoformat()
+    assert period_rows(repo, 'weekly_summary') > 0
+    assert period_rows(repo, 'monthly_summary') > 0
+
+    for granularity in ('week', 'month'):
+        assert periods(repo, user_id, granularity) == expected_periods(repo, user_id, granularity)
+
+    # A second run has no new days and must not add the compacted ones again
+    assert compact(repo, today=TODAY)['days'] == 0
+    assert periods(repo, user_id, 'week') == expected_periods(repo, user_id, 'week')
+
+
+def test_backdated_write_updates_compacted_periods(repo, user_id):
+    seed(repo, user_id)
+    compact(repo, today=TODAY)
+    before = periods(repo, user_id, 'month')
+
+    # Lands in an already-compacted week and month, on a day with and a day without logs
+    repo.write_batch([(user_id, 'pizza', 2, 570.0, at(date(2026, 2, 10))),
+                      (user_id, 'pizza', 1, 285.0, at(date(2026, 2, 11)))], [])
+    for granularity in ('week', 'month'):
+        assert periods(repo, user_id, granularity) == expected_periods(repo, user_id, granularity)
+    assert periods(repo, user_id, 'month')['2026-02-01']['consumed'] == round(
+        before['2026-02-01']['consumed'] + 855.0, 1)
+
+    compact(repo, today=TODAY + timedelta(days=1))
+    assert periods(repo, user_id, 'month') == expected_periods(repo, user_id, 'month')
+
+
+def test_compaction_picks_up_writes_that_bypass_write_batch(repo, user_id):
+    seed(repo, user_id)
+    compact(repo, today=TODAY)
+    changes_since = fetch_state_of(repo)['changes_since']
+
+    with repo.cursor(commit=True) as cursor:
+        cursor.execute(
+            "UPDATE daily_summary SET total_calories_consumed = total_calories_consumed + 1000 "
+            "WHERE user_id = %s AND date = %s", (user_id, date(2026, 2, 2))
+        )
+    assert periods(repo, user_id, 'week') != expected_periods(repo, user_id, 'week')
+
+    # No overlap, so only the days changed since the last run are read again
+    stats = compact(repo, today=TODAY, lag_seconds=0)
+    assert stats['recomputed_periods'] == 2  # its week and its month
+    assert fetch_state_of(repo)['changes_since'] > changes_since
+    for granularity in ('week', 'month'):
+        assert periods(repo, user_id, granularity) == expected_periods(repo, user_id, granularity)
@@ -0,0 +1,92 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from bulk_import import CO2_KG_PER_KM, WALKING_KM_PER_MIN
+from storage import StorageError
+
+TODAY = date(2026, 3, 18)
+
+
+def at(day, hour=12):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour)
+
+
+def log_days(repo, user_id, days):
+    for day in days:
+        repo.write_batch([(user_id, 'apple', 1, 95.0, at(day))], [])
+
+
+def test_rollups_match_the_batch(repo, user_id):
+    food = [(user_id, 'oatmeal', 1, 150.0, at(TODAY, 8)), (user_id, 'apple', 2, 190.0, at(TODAY, 13))]
+    exercise = [(user_id, 'walking', 60, at(TODAY, 18)), (user_id, 'running', 30, at(TODAY - timedelta(days=1)))]
+    assert repo.write_batch(food, exercise) == {user_id}
+
+    summary = repo.summary(user_id, TODAY - timedelta(days=1), TODAY)
+    yesterday, today = summary['buckets']
+    assert today['consumed'] == 340.0
+    assert today['food_items'] == 2
+    assert today['sessions'] == 1
+    assert today['minutes'] == 60
+    assert today['distance'] == round(60 * WALKING_KM_PER_MIN, 2)
+    assert today['co2_saved'] == round(60 * WALKING_KM_PER_MIN * CO2_KG_PER_KM, 3)
+    assert yesterday['food_items'] == 0
+    assert yesterday['minutes'] == 30
+    assert yesterday['burned'] > 0
+
+    with repo.cursor() as cursor:
+        cursor.execute("SELECT SUM(calories_burned) AS burned FROM exercise_log WHERE user_id = %s", (user_id,))
+        burned = cursor.fetchone()['burned']
+        cursor.execute("SELECT total_calories_consumed, exercise_sessions FROM user_counters WHERE user_id = %s",
+                       (user_id,))
+        counters = cursor.fetchone()
+    assert summary['totals']['burned'] == round(burned, 1)
+    assert counters['total_calories_consumed'] == 340.0
+    assert counters['exercise_sessions'] == 2
+
+
+def test_failed_batch_writes_nothing(repo, user_id):
+    with pytest.raises(StorageError) as raised:
+        repo.write_batch([(user_id, 'apple', 1, 95.0, at(TODAY))], [(user_id + 1, 'walking', 10, at(TODAY))])
+    assert raised.value.permanent  # unknown user_id
+
+    assert repo.summary(user_id)['buckets'] == []
+    assert repo.streak(user_id)['current_streak'] == 0
+
+
+def test_streak_counts_consecutive_days(repo, user_id):
+    log_days(repo, user_id, [TODAY - timedelta(days=n) for n in (2, 1, 0)])
+    streak = repo.streak(user_id)
+    assert streak['current_streak'] == 3
+    assert streak['streak_start'] == TODAY - timedelta(days=2)
+    assert streak['last_active_date'] == TODAY
+
+    # A day already counted changes nothing
+    log_days(repo, user_id, [TODAY - timedelta(days=1)])
+    assert repo.streak(user_id) == streak
+
+
+def test_backdated_day_joins_older_runs(repo, user_id):
+    log_days(repo, user_id, [TODAY - timedelta(days=n) for n in (5, 4, 2, 1, 0)])
+    assert repo.streak(user_id)['longest_streak'] == 3
+
+    log_days(repo, user_id, [TODAY - timedelta(days=3)])
+    streak = repo.streak(user_id)
+    assert streak['current_streak'] == 6
+    assert streak['longest_streak'] == 6
+    assert streak['streak_start'] == TODAY - timedelta(days=5)
+
+
+def test_badges_are_awarded_once(repo, user_id):
+    # 1 km is 12 minutes at the assumed walking pace
+    repo.write_batch([], [(user_id, 'walking', 10, at(TODAY - timedelta(days=8)))])
+    assert 'walk_1km' not in repo.badges(user_id)
+    repo.write_batch([], [(user_id, 'walking', 10, at(TODAY - timedelta(days=7)))])
+    awarded = repo.badges(user_id)
+    assert 'walk_1km' in awarded
+
+    log_days(repo, user_id, [TODAY - timedelta(days=n) for n in range(6, -1, -1)])
+    badges = repo.badges(user_id)
+    assert 'streak_7' in badges
+    assert badges['walk_1km'] == awarded['walk_1km']
+    assert 'streak_30' not in badges
@@ -0,0 +1,160 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from storage import StorageError
+from write_queue import QueueFull, WriteQueue, _encode
+
+
+@pytest.fixture
+def paths(tmp_path):
+    return {
+        'spill_path': str(tmp_path / f'queue.spill.{os.getpid()}'),
+        'dead_letter_path': str(tmp_path / 'queue.dead'),
+    }
+
+
+def meal(user_id, n=0):
+    return (user_id, f'meal {n}', 1, 100.0 + n, datetime(2026, 3, 18, 12, n))
+
+
+def logged_meals(repo):
+    with repo.cursor() as cursor:
+        cursor.execute("SELECT food_name FROM food_log ORDER BY food_name")
+        return [row['food_name'] for row in cursor.fetchall()]
+
+
+def dead_letters(paths):
+    if not os.path.exists(paths['dead_letter_path']):
+        return []
+    with open(paths['dead_letter_path'], encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+def replay_all(write_queue, rounds=10):
+    """Run the worker's replay step until nothing is left on disk."""
+    for _ in range(rounds):
+        write_queue._replay_spill()
+        if not any(os.path.exists(path) for path in (write_queue.spill_path, write_queue.replay_path)):
+            return
+    raise AssertionError("spill file was not drained")
+
+
+def test_overflow_is_spilled_and_replayed(repo, user_id, paths):
+    write_queue = WriteQueue(repo.write_batch, queue_size=2, batch_size=2, **paths)
+    for n in range(5):
+        write_queue.submit('food', meal(user_id, n))
+    assert write_queue.stats()['depth'] == 2
+    assert write_queue.stats()['spilled'] == 3
+
+    write_queue.flush()
+    assert len(logged_meals(repo)) == 2
+    replay_all(write_queue)
+    assert logged_meals(repo) == [f'meal {n}' for n in range(5)]
+    assert write_queue.stats()['replayed'] == 3
+    assert not os.path.exists(write_queue.offset_path)
+
+
+def test_full_spill_file_rejects_writes(repo, user_id, paths):
+    write_queue = WriteQueue(repo.write_batch, queue_size=1, max_spill_bytes=1, **paths)
+    write_queue.submit('food', meal(user_id, 0))
+    write_queue.submit('food', meal(user_id, 1))  # the spill file is still empty
+    with pytest.raises(QueueFull):
+        write_queue.submit('food', meal(user_id, 2))
+    assert write_queue.stats()['rejected'] == 1
+
+
+def test_bad_row_is_dead_lettered_and_the_rest_written(repo, user_id, paths):
+    write_queue = WriteQueue(repo.write_batch, **paths)
+    write_queue.submit('food', meal(user_id, 0))
+    write_queue.submit('food', meal(user_id + 1, 1))  # unknown user
+    write_queue.submit('exercise', (user_id, 'walking', 30, datetime(2026, 3, 18, 18)))
+    write_queue.flush()
+
+    assert logged_meals(repo) == ['meal 0']
+    with repo.cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) AS n FROM exercise_log")
+        assert cursor.fetchone()['n'] == 1
+    [dead] = dead_letters(paths)
+    assert dead['row'][0] == user_id + 1
+    assert dead['attempts'] == 1
+    assert 'FOREIGN KEY' in dead['error']
+    assert not os.path.exists(paths['spill_path'])
+
+
+class FlakyWriter:
+    """write_batch that fails like an unreachable database while down is set."""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.down = True
+
+    def __call__(self, food_rows, exercise_rows):
+        if self.down:
+            raise StorageError("Can't connect to the database")
+        return self.repo.write_batch(food_rows, exercise_rows)
+
+
+def test_rows_are_retried_once_the_database_is_back(repo, user_id, paths):
+    writer = FlakyWriter(repo)
+    write_queue = WriteQueue(writer, **paths)
+    write_queue.submit('food', meal(user_id, 0))
+    write_queue.submit('food', meal(user_id, 1))
+    write_queue.flush()
+    assert logged_meals(repo) == []
+    assert write_queue.stats()['retried'] == 2
+
+    assert write_queue._replay_spill() is False  # still down: spilled again
+    writer.down = False
+    replay_all(write_queue)
+    assert logged_meals(repo) == ['meal 0', 'meal 1']
+    assert dead_letters(paths) == []
+
+
+def test_rows_are_dead_lettered_after_max_attempts(repo, user_id, paths):
+    write_queue = WriteQueue(FlakyWriter(repo), max_attempts=3, **paths)
+    write_queue.submit('food', meal(user_id, 0))
+    write_queue.flush()
+    replay_all(write_queue)
+
+    [dead] = dead_letters(paths)
+    assert dead['attempts'] == 3
+    assert logged_meals(repo) == []
+
+
+def test_replay_resumes_after_the_committed_batches(repo, user_id, paths):
+    with open(paths['spill_path'], 'w', encoding='utf-8') as f:
+        f.write(''.join(_encode('food', meal(user_id, n), 0.0) for n in range(6)))
+
+    first = WriteQueue(repo.write_batch, batch_size=2, **paths)
+
+    def stop_after_one_batch(food_rows, exercise_rows):
+        first._stop.set()  # as if the process were shut down mid-replay
+        return repo.write_batch(food_rows, exercise_rows)
+
+    first.writer = stop_after_one_batch
+    first._replay_spill()
+    assert len(logged_meals(repo)) == 2
+    assert os.path.exists(first.offset_path)
+
+    restarted = WriteQueue(repo.write_batch, batch_size=2, **paths)
+    replay_all(restarted)
+    assert logged_meals(repo) == [f'meal {n}' for n in range(6)]
+
+
+def test_spill_of_an_exited_worker_is_adopted(repo, user_id, paths, tmp_path):
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    orphan = str(tmp_path / f'queue.spill.{exited.pid}')
+    with open(orphan, 'w', encoding='utf-8') as f:
+        f.write(''.join(_encode('food', meal(user_id, n), 0.0) for n in range(3)))
+
+    write_queue = WriteQueue(repo.write_batch, **paths)
+    write_queue.adopt_orphaned_spills(str(tmp_path / 'queue.spill.*'))
+    assert not os.path.exists(orphan)
+    replay_all(write_queue)
+    assert logged_meals(repo) == ['meal 0', 'meal 1', 'meal 2']
@@ -0,0 +1,76 @@
+"""
+Helpers for index-friendly date filters.
+Filter DATETIME columns with half-open ranges (col >= start AND col < end) rather than
+DATE(col) = ..., which hides the column from the (user_id, log_date) indexes.
+"""
+
+from datetime import date, datetime, time, timedelta
+
+
+def day_start(day):
+    """Midnight at the start of day (a date or datetime)."""
+    if isinstance(day, datetime):
+        day = day.date()
+    return datetime.combine(day, time.min)
+
+
+def day_range(start_day, end_day=None):
+    """
+    Half-open [start, end) datetime bounds covering start_day..end_day inclusive.
+    With one argument, covers a single day.
+    """
+    if end_day is None:
+        end_day = start_day
+    return day_start(start_day), day_start(end_day) + timedelta(days=1)
+
+
+def today_range():
+    return day_range(date.today())
+
+
+def parse_day(value, field='date'):
+    """Parse an ISO YYYY-MM-DD query parameter; None/'' -> None, bad input -> ValueError."""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"invalid {field} {value!r} (expected YYYY-MM-DD)")
+
+
+def period_start(day, granularity):
+    """First day of the ISO week (Monday) or calendar month containing day."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_period_start(day, granularity):
+    """First day of the period after the one containing day."""
+    start = period_start(day, granularity)
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def as_date(value):
+    """date from a DATE/DATETIME column value; aggregates come back as ISO text on SQLite."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10]) if value else None
+
+
+def as_datetime(value):
+    """datetime from a DATETIME/TIMESTAMP column value (or ISO text); None if unparseable."""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
@@ -0,0 +1,53 @@
+"""
+Per-user version counters (user_versions) that cache entries are stamped with.
+- data_version: bumped by every log write (write_batch) and by the jobs that
+  rewrite a user's rollups, in the same transaction as the change
+- profile_version: bumped by update_profile
+
+An in-process cache cannot hear about an invalidation made by another worker, so
+cache.py compares an entry's stamp with the stored counters instead: one primary
+key lookup retires the entries of every worker, with or without Redis.
+"""
+
+VERSION_COLUMNS = ('data_version', 'profile_version')
+NO_VERSIONS = (0, 0)  # users that have never been written to
+
+
+def bump_versions(repo, cursor, user_ids, column='data_version'):
+    """Add one to column for each user; no commit."""
+    if column not in VERSION_COLUMNS:
+        raise ValueError(f"unknown version column {column!r}")
+    ids = sorted(set(user_ids))  # key order keeps concurrent writers from deadlocking
+    if not ids:
+        return
+    cursor.executemany(
+        f"INSERT INTO user_versions (user_id, {column}) VALUES (%s, %s) "
+        + repo.upsert_clause(('user_id',), (column,), additive=True),
+        [(user_id, 1) for user_id in ids]
+    )
+
+
+def fetch_versions(cursor, user_id):
+    """(data_version, profile_version) for the user."""
+    cursor.execute("SELECT data_version, profile_version FROM user_versions WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return NO_VERSIONS
+    if isinstance(row, dict):
+        return row['data_version'], row['profile_version']
+    return tuple(row)
+
+
+def fetch_profile_versions(cursor, user_ids):
+    """{user_id: profile_version} for the given ids with one query; users never written to are left out."""
+    ids = sorted(set(user_ids))
+    if not ids:
+        return {}
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"SELECT user_id, profile_version FROM user_versions WHERE user_id IN ({placeholders})", ids)
+    versions = {}
+    for row in cursor.fetchall():
+        if isinstance(row, dict):
+            row = (row['user_id'], row['profile_version'])
+        versions[row[0]] = row[1]
+    return versions
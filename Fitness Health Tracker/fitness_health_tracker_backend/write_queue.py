@@ -0,0 +1,385 @@
+"""
+Optional write-behind mode for /add_food and /add_exercise (WRITE_BEHIND=1).
+Requests validate the log, stamp it with the request time and enqueue it; a
+background thread drains the queue and writes group-committed batches through
+the storage repository's write_batch (one transaction per batch instead of one per
+request).
+
+When the in-memory queue is full, entries are appended (and fsynced) to a local
+spill file that the worker replays once it catches up. When the spill file is
+also at its size limit, submit() raises QueueFull and the endpoint answers 503.
+The queue is flushed on interpreter shutdown; entries still in memory are lost
+only if the process is killed hard.
+
+A batch that fails is retried row by row (as bulk_import does), so one bad row
+does not hold back the rest. Rows a retry cannot fix (a value the column rejects,
+an unknown user_id, or a row that failed while the rest of its batch went through)
+go to the dead-letter file (WRITE_BEHIND_DEAD_LETTER_PATH) with their error. The
+others are spilled again and retried with backoff, and dead-lettered after
+MAX_ATTEMPTS tries. Replay saves its byte offset after each batch, so a restart
+resumes after the batches already committed; only a crash between a commit and
+its offset write repeats that one batch.
+"""
+
+import atexit
+import contextlib
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+from bulk_import import WRITE_ERRORS
+from config import write_behind_config
+
+MAX_ATTEMPTS = 5
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _encode(kind, row, enqueued_at, attempts=0, **extra):
+    return json.dumps({
+        'kind': kind,
+        'row': [value.isoformat() if isinstance(value, datetime) else value for value in row],
+        'enqueued_at': enqueued_at,
+        'attempts': attempts,
+        **extra,
+    }) + '\n'
+
+
+def _decode(line):
+    item = json.loads(line)
+    row = list(item['row'])
+    row[-1] = datetime.fromisoformat(row[-1])  # log_date is always the last field
+    return item['kind'], tuple(row), item['enqueued_at'], item.get('attempts', 0)
+
+
+def _read_offset(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _save_offset(path, offset):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(str(offset))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _remove(*paths):
+    for path in paths:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+
+class WriteQueue:
+    def __init__(self, writer, queue_size=10000, batch_size=500, flush_interval=0.5,
+                 spill_path='write_queue.spill', max_spill_bytes=256 * 1024 * 1024, on_commit=None,
+                 dead_letter_path='write_queue.dead', max_attempts=MAX_ATTEMPTS):
+        self.writer = writer  # writer(food_rows, exercise_rows) -> affected user_ids
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+        self.replay_path = spill_path + '.replay'
+        self.offset_path = self.replay_path + '.offset'  # bytes of the replay file already written
+        self.max_spill_bytes = max_spill_bytes
+        self.on_commit = on_commit
+        self.dead_letter_path = dead_letter_path
+        self.max_attempts = max_attempts
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._spill_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters = {
+            'enqueued': 0,
+            'spilled': 0,
+            'rejected': 0,
+            'written': 0,
+            'batches': 0,
+            'errors': 0,
+            'retried': 0,
+            'dead_lettered': 0,
+            'replayed': 0,
+            'last_batch_size': 0,
+            'last_commit_lag': 0.0,
+            'max_commit_lag': 0.0,
+        }
+
+    # ---- producer side ----
+    def submit(self, kind, row):
+        """Enqueue a prepared food/exercise row; spills to disk or raises QueueFull under load."""
+        item = (kind, row, time.time(), 0)
+        try:
+            self._queue.put_nowait(item)
+            self._count('enqueued')
+            return
+        except queue.Full:
+            pass
+        self._spill([item])
+        self._count('spilled')
+
+    def _spill(self, items, limit=True):
+        """Append items to the spill file; limit=False for entries already accepted (retries)."""
+        with self._spill_lock:
+            size = os.path.getsize(self.spill_path) if os.path.exists(self.spill_path) else 0
+            if limit and size >= self.max_spill_bytes:
+                self._count('rejected', len(items))
+                raise QueueFull("Write queue and spill file are full, try again shortly")
+            with open(self.spill_path, 'a', encoding='utf-8') as f:
+                f.write(''.join(_encode(*item) for item in items))
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _dead_letter(self, failed):
+        """Append rows that will not be retried, with their error, to the dead-letter file."""
+        failed_at = time.time()
+        lines = ''.join(_encode(*item, error=str(error), failed_at=failed_at) for item, error in failed)
+        with self._spill_lock, open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self._count('dead_lettered', len(failed))
+
+    def _count(self, counter, amount=1):
+        with self._stats_lock:
+            self._counters[counter] += amount
+
+    # ---- consumer side ----
+    def adopt_orphaned_spills(self, pattern):
+        """
+        Append spill files left by dead worker processes to ours so they get replayed.
+        Workers that start together may find the same file, so each one is claimed with
+        a rename first: only one of them gets it.
+        """
+        own = {self.spill_path, self.replay_path}
+        for path in sorted(glob.glob(pattern)):
+            if path in own:
+                continue
+            pid, _, suffix = path[len(pattern) - 1:].partition('.')
+            # .adopting.<n> files were claimed by a worker that died while copying them
+            claimed_before = suffix.startswith('adopting.') and not suffix.endswith('.offset')
+            if not (suffix in ('', 'replay') or claimed_before) or not pid.isdigit() or _pid_alive(int(pid)):
+                continue
+            claimed = f"{self.spill_path}.adopting.{time.time_ns()}"
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # another worker claimed it first
+            # A replay file is taken from where that worker stopped
+            with contextlib.suppress(FileNotFoundError):
+                os.rename(path + '.offset', claimed + '.offset')
+            with self._spill_lock, open(claimed, 'rb') as src, open(self.spill_path, 'ab') as dst:
+                src.seek(_read_offset(claimed + '.offset'))
+                for line in src:
+                    dst.write(line)
+                dst.flush()
+                os.fsync(dst.fileno())
+            _remove(claimed, claimed + '.offset')
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+            atexit.register(self.shutdown)
+
+    def _drain(self, first_timeout):
+        items = []
+        try:
+            items.append(self._queue.get(timeout=first_timeout))
+            while len(items) < self.batch_size:
+                items.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return items
+
+    def _commit(self, items):
+        food = [row for kind, row, _, _ in items if kind == 'food']
+        exercise = [row for kind, row, _, _ in items if kind == 'exercise']
+        user_ids = self.writer(food, exercise)
+
+        lag = time.time() - min(enqueued_at for _, _, enqueued_at, _ in items)
+        with self._stats_lock:
+            self._counters['written'] += len(items)
+            self._counters['batches'] += 1
+            self._counters['last_batch_size'] = len(items)
+            self._counters['last_commit_lag'] = round(lag, 4)
+            self._counters['max_commit_lag'] = round(max(self._counters['max_commit_lag'], lag), 4)
+        if self.on_commit:
+            self.on_commit(user_ids)
+
+    def _write(self, items):
+        """
+        Write one group-committed batch, falling back to one row at a time when it fails.
+        Rows that cannot be written are dead-lettered or spilled for a retry; returns
+        False when something is left to retry (the database looks unavailable).
+        """
+        try:
+            self._commit(items)
+            return True
+        except WRITE_ERRORS as e:
+            self._count('errors')
+            failed = [(items[0], e)] if len(items) == 1 else None
+        if failed is None:
+            # Isolate the offending rows so the rest of the batch still lands
+            failed = []
+            for item in items:
+                try:
+                    self._commit([item])
+                except WRITE_ERRORS as e:
+                    failed.append((item, e))
+
+        # If anything in the batch went through, the database is up and the failure is the row's own
+        database_up = len(failed) < len(items)
+        dead, retry = [], []
+        for (kind, row, enqueued_at, attempts), error in failed:
+            item = (kind, row, enqueued_at, attempts + 1)
+            if database_up or error.permanent or item[3] >= self.max_attempts:
+                dead.append((item, error))
+            else:
+                retry.append(item)
+        if dead:
+            self._dead_letter(dead)
+        if retry:
+            self._spill(retry, limit=False)
+            self._count('retried', len(retry))
+        return not retry
+
+    def _replay_spill(self):
+        """
+        Move the spill file aside and write its entries in batches, saving the offset
+        after each one. Returns False when a batch has to be retried later.
+        """
+        with self._spill_lock:
+            if not os.path.exists(self.replay_path):
+                if not os.path.exists(self.spill_path) or os.path.getsize(self.spill_path) == 0:
+                    return True
+                os.replace(self.spill_path, self.replay_path)
+
+        with open(self.replay_path, 'rb') as f:
+            f.seek(_read_offset(self.offset_path))
+            while not self._stop.is_set():
+                batch = []
+                while len(batch) < self.batch_size:
+                    line = f.readline()
+                    if not line:
+                        break
+                    if line.strip():
+                        batch.append(_decode(line.decode('utf-8')))
+                if not batch:
+                    break
+                written = self._write(batch)
+                # Retries were spilled again by _write, so the batch is settled either way
+                _save_offset(self.offset_path, f.tell())
+                self._count('replayed', len(batch))
+                if not written:
+                    return False
+            else:
+                return True  # stopping; the offset says where to resume
+        _remove(self.replay_path, self.offset_path)
+        return True
+
+    def _run(self):
+        backoff = 0
+        while not self._stop.is_set():
+            items = self._drain(self.flush_interval)
+            if items:
+                written = self._write(items)
+            elif os.path.exists(self.spill_path) or os.path.exists(self.replay_path):
+                # Only replay once the live queue is idle so new writes are not starved
+                written = self._replay_spill()
+            else:
+                continue
+            if written:
+                backoff = 0
+            else:
+                backoff = min(backoff * 2 or 0.5, 10)
+                self._stop.wait(backoff)
+
+    def flush(self):
+        """Write everything currently queued (used on shutdown)."""
+        while True:
+            items = self._drain(0)
+            if not items:
+                break
+            self._write(items)
+
+    def shutdown(self, timeout=10):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._counters)
+        stats['depth'] = self._queue.qsize()
+        stats['capacity'] = self._queue.maxsize
+        with self._spill_lock:
+            stats['spill_bytes'] = sum(
+                os.path.getsize(path) for path in (self.spill_path, self.replay_path)
+                if os.path.exists(path)
+            )
+        # Age of the oldest entry still waiting in memory
+        with self._queue.mutex:
+            oldest = self._queue.queue[0][2] if self._queue.queue else None
+        stats['lag_seconds'] = round(time.time() - oldest, 4) if oldest else 0.0
+        stats['running'] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_write_queue = None
+_write_queue_pid = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue(writer, on_commit=None):
+    """Process-wide queue (started on first use, recreated after a fork), or None when disabled."""
+    global _write_queue, _write_queue_pid
+    if not write_behind_config['enabled']:
+        return None
+    pid = os.getpid()
+    if _write_queue is None or _write_queue_pid != pid:
+        with _write_queue_lock:
+            if _write_queue is None or _write_queue_pid != pid:
+                _write_queue = WriteQueue(
+                    writer,
+                    queue_size=write_behind_config['queue_size'],
+                    batch_size=write_behind_config['batch_size'],
+                    flush_interval=write_behind_config['flush_interval'],
+                    # One spill file per worker process
+                    spill_path=f"{write_behind_config['spill_path']}.{pid}",
+                    max_spill_bytes=write_behind_config['max_spill_bytes'],
+                    on_commit=on_commit,
+                    dead_letter_path=write_behind_config['dead_letter_path'],
+                )
+                _write_queue.adopt_orphaned_spills(f"{write_behind_config['spill_path']}.*")
+                _write_queue.start()
+                _write_queue_pid = pid
+    return _write_queue
+
+
+def current_write_queue():
+    """The queue this process has started, if any (for /metrics)."""
+    return _write_queue if _write_queue_pid == os.getpid() else None
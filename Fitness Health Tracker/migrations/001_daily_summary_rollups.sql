@@ -0,0 +1,16 @@
+-- daily_summary becomes a per-(user_id, date) rollup maintained by add_food / add_exercise.
+-- Nothing wrote to this table before, so it is cleared here and rebuilt from the raw logs with:
+--   python rollups.py rebuild
+-- Apply with: python migrate.py (from fitness_health_tracker_backend/)
+
+DELETE FROM daily_summary;
+
+ALTER TABLE daily_summary
+    MODIFY total_calories_consumed FLOAT NOT NULL DEFAULT 0,
+    MODIFY total_calories_burned FLOAT NOT NULL DEFAULT 0,
+    MODIFY total_carbon_saved FLOAT NOT NULL DEFAULT 0,
+    ADD COLUMN food_items INT NOT NULL DEFAULT 0,
+    ADD COLUMN exercise_minutes INT NOT NULL DEFAULT 0,
+    ADD COLUMN exercise_sessions INT NOT NULL DEFAULT 0,
+    ADD COLUMN total_distance_walked FLOAT NOT NULL DEFAULT 0,
+    ADD UNIQUE KEY unique_user_date (user_id, date);
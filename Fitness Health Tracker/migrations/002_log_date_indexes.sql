@@ -0,0 +1,9 @@
+-- Composite (user_id, log_date) indexes so per-user date-range queries become index range scans.
+-- Queries must filter with half-open ranges (log_date >= start AND log_date < end),
+-- not DATE(log_date) = ..., for these indexes to be used.
+
+ALTER TABLE food_log ADD INDEX idx_food_log_user_date (user_id, log_date);
+
+ALTER TABLE exercise_log ADD INDEX idx_exercise_log_user_date (user_id, log_date);
+
+ALTER TABLE environment_log ADD INDEX idx_environment_log_user_date (user_id, log_date);
@@ -0,0 +1,6 @@
+-- Track when each rollup row last changed so /api/summary can answer conditional GETs
+-- (ETag / Last-Modified) from one index lookup instead of re-aggregating.
+
+ALTER TABLE daily_summary
+    ADD COLUMN updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    ADD INDEX idx_daily_summary_user_updated (user_id, updated_at);
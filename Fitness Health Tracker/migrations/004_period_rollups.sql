@@ -0,0 +1,60 @@
+-- Weekly and monthly rollups compacted from daily_summary by compaction.py, so week/month
+-- summaries over long ranges read one row per period instead of one per day.
+-- Only closed days (before today) are compacted; rollup_compaction keeps the high-water mark.
+-- Fill them after migrating with: python compaction.py run
+
+CREATE TABLE weekly_summary (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    period_start DATE NOT NULL,
+    total_calories_consumed FLOAT NOT NULL DEFAULT 0,
+    food_items INT NOT NULL DEFAULT 0,
+    total_calories_burned FLOAT NOT NULL DEFAULT 0,
+    exercise_minutes INT NOT NULL DEFAULT 0,
+    exercise_sessions INT NOT NULL DEFAULT 0,
+    total_distance_walked FLOAT NOT NULL DEFAULT 0,
+    total_carbon_saved FLOAT NOT NULL DEFAULT 0,
+    days_logged INT NOT NULL DEFAULT 0,
+    days_active INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    UNIQUE KEY unique_user_period (user_id, period_start),
+    INDEX idx_weekly_summary_user_updated (user_id, updated_at),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE monthly_summary (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    period_start DATE NOT NULL,
+    total_calories_consumed FLOAT NOT NULL DEFAULT 0,
+    food_items INT NOT NULL DEFAULT 0,
+    total_calories_burned FLOAT NOT NULL DEFAULT 0,
+    exercise_minutes INT NOT NULL DEFAULT 0,
+    exercise_sessions INT NOT NULL DEFAULT 0,
+    total_distance_walked FLOAT NOT NULL DEFAULT 0,
+    total_carbon_saved FLOAT NOT NULL DEFAULT 0,
+    days_logged INT NOT NULL DEFAULT 0,
+    days_active INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    UNIQUE KEY unique_user_period (user_id, period_start),
+    INDEX idx_monthly_summary_user_updated (user_id, updated_at),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+-- One row per compaction job: high-water mark, late-change mark and the run lease
+CREATE TABLE rollup_compaction (
+    name VARCHAR(50) PRIMARY KEY,
+    compacted_through DATE NULL,
+    changes_since TIMESTAMP(6) NULL,
+    locked_by VARCHAR(100) NULL,
+    locked_until DATETIME NULL,
+    last_run_at DATETIME NULL,
+    last_run_seconds FLOAT NULL
+);
+
+INSERT INTO rollup_compaction (name) VALUES ('periods');
+
+-- New closed days are found by date, late edits to compacted days by updated_at
+ALTER TABLE daily_summary
+    ADD INDEX idx_daily_summary_date (date),
+    ADD INDEX idx_daily_summary_updated (updated_at);
@@ -0,0 +1,15 @@
+-- Per-user logging streaks, kept up to date by every log write (streaks.py) so the
+-- dashboard reads a streak with one primary-key lookup however long the history is.
+-- current_streak is the run of consecutive active days ending at last_active_date;
+-- readers treat it as broken once last_active_date is before yesterday.
+-- Fill it after migrating with: python streaks.py rebuild
+
+CREATE TABLE user_streaks (
+    user_id INT PRIMARY KEY,
+    current_streak INT NOT NULL DEFAULT 0,
+    longest_streak INT NOT NULL DEFAULT 0,
+    streak_start DATE NULL,
+    last_active_date DATE NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
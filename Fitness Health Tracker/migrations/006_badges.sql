@@ -0,0 +1,26 @@
+-- Badges (badges.py): lifetime counters per user, updated with every log write, and
+-- the badges each user has been awarded. The dashboard reads the awards through the
+-- (user_id, badge) key instead of recomputing badges from the last 7 days.
+-- Fill both from existing logs after migrating with: python badges.py replay
+
+CREATE TABLE user_counters (
+    user_id INT PRIMARY KEY,
+    total_calories_consumed FLOAT NOT NULL DEFAULT 0,
+    food_items INT NOT NULL DEFAULT 0,
+    total_calories_burned FLOAT NOT NULL DEFAULT 0,
+    exercise_minutes INT NOT NULL DEFAULT 0,
+    exercise_sessions INT NOT NULL DEFAULT 0,
+    total_distance_walked FLOAT NOT NULL DEFAULT 0,
+    total_carbon_saved FLOAT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE TABLE user_badges (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NOT NULL,
+    badge VARCHAR(50) NOT NULL,
+    awarded_at DATETIME NOT NULL,
+    UNIQUE KEY unique_user_badge (user_id, badge),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
@@ -0,0 +1,20 @@
+-- Weekly and monthly leaderboard scores per user (leaderboard.py), added to by every
+-- log write. One index per board on (period, period_start, score) serves the top-K
+-- scan and the score list the per-worker rank snapshots are built from.
+-- Fill it for recent periods after migrating with: python leaderboard.py rebuild
+
+CREATE TABLE leaderboard_scores (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    period VARCHAR(10) NOT NULL,
+    period_start DATE NOT NULL,
+    user_id INT NOT NULL,
+    calories_burned FLOAT NOT NULL DEFAULT 0,
+    distance_walked FLOAT NOT NULL DEFAULT 0,
+    carbon_saved FLOAT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY unique_period_user (period, period_start, user_id),
+    INDEX idx_leaderboard_calories_burned (period, period_start, calories_burned),
+    INDEX idx_leaderboard_distance_walked (period, period_start, distance_walked),
+    INDEX idx_leaderboard_carbon_saved (period, period_start, carbon_saved),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
@@ -0,0 +1,21 @@
+-- Manifest of log months moved out of food_log / exercise_log / environment_log into
+-- compressed archive files by partitions.py. Exports read these files for the
+-- archived months; rollups.py rebuild leaves days before the newest range_end alone.
+
+CREATE TABLE log_archives (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    table_name VARCHAR(50) NOT NULL,
+    partition_name VARCHAR(20) NOT NULL,
+    range_start DATE NULL,
+    range_end DATE NOT NULL,
+    path VARCHAR(500) NOT NULL,
+    rows_archived INT NOT NULL,
+    min_id INT NULL,
+    max_id INT NULL,
+    min_log_date DATETIME NULL,
+    max_log_date DATETIME NULL,
+    bytes BIGINT NOT NULL,
+    sha256 CHAR(64) NOT NULL,
+    archived_at DATETIME NOT NULL,
+    INDEX idx_log_archives_table_range (table_name, range_end)
+);
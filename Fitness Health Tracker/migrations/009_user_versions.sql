@@ -0,0 +1,12 @@
+-- Per-user version counters for the caches (versions.py). write_batch bumps
+-- data_version with every log write and update_profile bumps profile_version, in
+-- the same transaction as the change; cached dashboards and profiles are stamped
+-- with the versions they were built from, so every worker process can tell a stale
+-- entry from a current one without a shared cache backend.
+
+CREATE TABLE user_versions (
+    user_id INT PRIMARY KEY,
+    data_version BIGINT NOT NULL DEFAULT 0,
+    profile_version BIGINT NOT NULL DEFAULT 0,
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);